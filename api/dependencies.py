@@ -1,6 +1,8 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
+from core.config import settings
 from core.security import decode_access_token
+from services.face_admission import Deadline
 from models.database import supabase
 import logging
 
@@ -24,4 +26,8 @@ async def get_current_admin(token: str = Depends(oauth2_scheme)):
         return response.data[0]
     except Exception as e:
         logger.error(f"Authentication error: {str(e)}")
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication credentials")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication credentials")
+
+async def get_face_deadline(request: Request) -> Deadline:
+    """Dependency giving a face request REQUEST_TIMEOUT seconds, cut short if the client disconnects."""
+    return Deadline(settings.REQUEST_TIMEOUT, request.is_disconnected)
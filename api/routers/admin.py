@@ -10,6 +10,10 @@ from crud.colleges import get_all_colleges
 from crud.departments import get_all_departments
 from api.dependencies import get_current_admin
 from models.database import supabase
+from services.face_recognition import face_analysis_cache, pipeline_profile, recent_matches
+from services.face_admission import WORKLOAD_PRIORITIES
+from services.face_executor import face_admission
+from services.face_gallery import change_feed
 from typing import List, Optional, Dict
 from uuid import UUID
 from datetime import datetime, timedelta
@@ -367,4 +371,26 @@ async def get_admin_count(_=Depends(get_current_admin)):
         )
     except Exception as e:
         logger.error(f"Error retrieving admin count: {str(e)}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to retrieve admin count")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to retrieve admin count")
+
+@router.get("/analytics/face-pipeline", response_model=HTTPResponse[Dict],
+            summary="Face Pipeline Metrics", description="Get face pipeline profiles, cache, recent-match hot set, admission queue and gallery change feed counters (Admin only)")
+async def get_face_pipeline_metrics(_=Depends(get_current_admin)):
+    """Get face pipeline metrics such as embedding cache hits and misses and queue depths."""
+    profiles = {}
+    for workload in WORKLOAD_PRIORITIES:
+        name, profile = pipeline_profile(workload)
+        profiles[workload] = {"name": name, **profile._asdict()}
+    metrics = {
+        "profiles": profiles,
+        "embedding_cache": face_analysis_cache.stats(),
+        "recent_matches": recent_matches.stats(),
+        "admission": face_admission.stats(),
+        "gallery_change_feed": change_feed.stats() if change_feed is not None else None
+    }
+    return HTTPResponse(
+        message="Face pipeline metrics retrieved successfully",
+        status_code=status.HTTP_200_OK,
+        count=1,
+        data=[metrics]
+    )
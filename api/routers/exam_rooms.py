@@ -1,23 +1,34 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, WebSocket, WebSocketDisconnect
 from schemas.exam_rooms import (
     ExamRoomCreate, ExamRoomUpdate, ExamRoom, 
-    RoomRecognitionRequest, RecognitionValidationResponse
+    RoomRecognitionRequest, RecognitionValidationResponse, BatchRoomRecognitionRequest,
+    RoomVerificationRequest, FaceValidationResponse
 )
+from schemas.students import Student
 from schemas.responses import HTTPResponse
 from crud.exam_rooms import (
     create_exam_room, get_exam_room_by_id, get_all_exam_rooms,
-    update_exam_room, delete_exam_room, validate_student_in_room,
+    update_exam_room, delete_exam_room, validate_student_in_room, check_student_in_room,
     log_room_recognition, get_exam_room_by_code, get_exam_room_with_students,
     get_students_in_index_range
 )
-from crud.students import get_student_by_index_number
-from services.face_recognition import recognize_face_from_base64
-from api.dependencies import get_current_admin
+from crud.students import get_student_by_index_number, get_student_by_id
+from services.face_recognition import (
+    analyze_frame, match_embeddings, recognize_face_candidates, recognize_faces_batch,
+    recognize_faces_in_image, verify_face
+)
+from services.face_admission import Deadline, FaceJobRejected
+from services.face_tracker import FaceTracker
+from api.dependencies import get_current_admin, get_face_deadline
+from core.config import settings
+from typing import Dict, Optional, Tuple
 from uuid import UUID
 from datetime import datetime
 import logging
+import asyncio
 import base64
 import binascii
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -142,145 +153,397 @@ async def delete_room_assignment(room_id: UUID, _=Depends(get_current_admin)):
             detail="Failed to delete room assignment"
         )
 
+def _decode_face_image(face_image: str) -> bytes:
+    """Decode a base64 face image, with or without a data URL prefix."""
+    # Validate face image format
+    if not face_image:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Face image is required"
+        )
+    
+    # Process base64 image
+    try:
+        face_image_data = face_image
+        if face_image_data.startswith('data:image/'):
+            face_image_data = face_image_data.split(',', 1)[-1]
+        
+        image_data = base64.b64decode(face_image_data)
+        if len(image_data) == 0:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Empty image data provided"
+            )
+            
+    except binascii.Error:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid base64 image format"
+        )
+    return image_data
+
+async def _evaluate_room_recognition(room_code: str, room: Optional[ExamRoom],
+                                     recognition: Optional[Dict]) -> Tuple[str, RecognitionValidationResponse, Dict]:
+    """
+    Validate a recognition result against the room and build the kiosk response.
+    
+    room is the exam room fetched once for the request (None if it does not
+    exist). recognition is the dict returned by recognize_face_candidates, or
+    None when recognition itself failed. Returns (response message, validation response,
+    log_room_recognition keyword arguments); nothing is logged here.
+    """
+    if recognition is None:
+        # Failed recognition attempt
+        log_entry = dict(
+            student_id=None,
+            room_code=room_code,
+            status="invalid",
+            beep_type="warning",
+            index_number=None,
+            message="Face recognition failed - no match found"
+        )
+        
+        return "Recognition failed", RecognitionValidationResponse(
+            status="invalid",
+            beep_type="warning",
+            room_code=room_code,
+            message="Face recognition failed - no student match found",
+            timestamp=datetime.utcnow()
+        ), log_entry
+    
+    if recognition["is_ambiguous"]:
+        # Too close to call between the top candidates: ask for a new frame instead of guessing
+        log_entry = dict(
+            student_id=None,
+            room_code=room_code,
+            status="invalid",
+            beep_type="warning",
+            index_number=None,
+            message=f"Ambiguous match (margin {recognition['margin']:.3f}) - retake requested"
+        )
+        
+        return "Retake required", RecognitionValidationResponse(
+            status="invalid",
+            beep_type="warning",
+            room_code=room_code,
+            message="Ambiguous match - please look at the camera and retake",
+            timestamp=datetime.utcnow(),
+            distance=recognition["best_distance"],
+            margin=recognition["margin"],
+            needs_retake=True
+        ), log_entry
+    
+    recognized_student = None
+    if recognition["is_match"]:
+        recognized_student = await get_student_by_id(UUID(recognition["candidates"][0]["student_id"]))
+    
+    if not recognized_student:
+        # Unrecognized face
+        log_entry = dict(
+            student_id=None,
+            room_code=room_code,
+            status="invalid",
+            beep_type="warning",
+            index_number=None,
+            message="Unrecognized face - student not found in database"
+        )
+        
+        return "Student not recognized", RecognitionValidationResponse(
+            status="invalid",
+            beep_type="warning",
+            room_code=room_code,
+            message="Student not recognized - face not found in database",
+            timestamp=datetime.utcnow()
+        ), log_entry
+    
+    return _validate_student_for_room(
+        room_code, room, recognized_student, recognition["best_distance"], recognition["margin"]
+    )
+
+def _validate_student_for_room(room_code: str, room: Optional[ExamRoom], student: Student,
+                               distance: Optional[float], margin: Optional[float] = None,
+                               is_match: Optional[bool] = None) -> Tuple[str, RecognitionValidationResponse, Dict]:
+    """
+    Check an identified student's room assignment and build the kiosk response.
+    
+    Returns (response message, validation response, log_room_recognition keyword arguments).
+    """
+    # Validate room assignment against the room fetched for this request
+    is_valid, validation_message = check_student_in_room(student.index_number, room_code, room)
+    
+    room_name = room.room_name if room else "Unknown Room"
+    
+    # Determine status and beep type
+    if is_valid:
+        status_result = "valid"
+        beep_type = "confirmation"
+        message = f"✅ {student.name} verified in {room_name}"
+    else:
+        status_result = "invalid"
+        beep_type = "warning"
+        message = f"⚠️ {student.name} not assigned to {room_name}"
+    
+    # Log entry for the recognition attempt
+    log_entry = dict(
+        student_id=student.id,
+        room_code=room_code,
+        status=status_result,
+        beep_type=beep_type,
+        index_number=student.index_number,
+        message=validation_message
+    )
+    
+    # Create response
+    return "Recognition completed", RecognitionValidationResponse(
+        status=status_result,
+        beep_type=beep_type,
+        student_id=student.id,
+        student_name=student.name,
+        index_number=student.index_number,
+        room_code=room_code,
+        room_name=room_name,
+        message=message,
+        timestamp=datetime.utcnow(),
+        distance=distance,
+        margin=margin,
+        is_match=is_match
+    ), log_entry
+
+def _room_index_range(room: Optional[ExamRoom]) -> Optional[Tuple[str, str]]:
+    """Index range to scope recognition to, or None to search every student."""
+    if not settings.EXAM_ROOM_SCOPED_RECOGNITION or not room:
+        return None
+    return room.index_start, room.index_end
+
+async def _room_recognition_result(room_code: str, room: Optional[ExamRoom],
+                                   recognition: Optional[Dict]) -> Tuple[str, RecognitionValidationResponse]:
+    """
+    Validate a recognition result against the room, log it, and build the kiosk response.
+    
+    Returns (response message, validation response).
+    """
+    message, response, log_entry = await _evaluate_room_recognition(room_code, room, recognition)
+    await log_room_recognition(**log_entry)
+    return message, response
+
 @router.post("/recognize", response_model=HTTPResponse[RecognitionValidationResponse])
-async def recognize_in_room(request: RoomRecognitionRequest):
+async def recognize_in_room(request: RoomRecognitionRequest, deadline: Deadline = Depends(get_face_deadline)):
     """
     Perform facial recognition with room validation.
     
     Process:
-    1. Recognize the student from face image
+    1. Recognize the student from face image, searching the room's index range
+       first and all students only to report a wrong-room match
     2. Validate if student's index number is assigned to the specified room
     3. Return validation result with beep feedback type
     4. Log the recognition attempt
     """
     try:
-        # Validate face image format
-        if not request.face_image:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="Face image is required"
-            )
-        
-        # Process base64 image
-        try:
-            face_image_data = request.face_image
-            if face_image_data.startswith('data:image/'):
-                face_image_data = face_image_data.split(',', 1)[-1]
-            
-            image_data = base64.b64decode(face_image_data)
-            if len(image_data) == 0:
-                raise HTTPException(
-                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                    detail="Empty image data provided"
-                )
-                
-        except binascii.Error:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="Invalid base64 image format"
-            )
+        image_data = _decode_face_image(request.face_image)
+        room = await get_exam_room_by_code(request.room_code)
         
         # Perform face recognition
         try:
-            recognized_student = await recognize_face_from_base64(image_data)
+            recognition = await recognize_face_candidates(
+                image_data, index_range=_room_index_range(room), workload="room", room_code=request.room_code, deadline=deadline
+            )
+        except FaceJobRejected:
+            raise
         except Exception as e:
             logger.error(f"Face recognition failed: {str(e)}")
-            # Log failed recognition attempt
+            recognition = None
+        
+        message, response = await _room_recognition_result(request.room_code, room, recognition)
+        return HTTPResponse(
+            message=message,
+            status_code=status.HTTP_200_OK,
+            count=1,
+            data=[response]
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in room recognition: {str(e)}")
+        
+        # Log system error
+        await log_room_recognition(
+            student_id=None,
+            room_code=request.room_code,
+            status="invalid",
+            beep_type="warning",
+            index_number=None,
+            message=f"System error: {str(e)}"
+        )
+        
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Recognition system error"
+        )
+
+@router.post("/recognize/batch", response_model=HTTPResponse[RecognitionValidationResponse])
+async def recognize_batch_in_room(request: BatchRoomRecognitionRequest,
+                                  deadline: Deadline = Depends(get_face_deadline)):
+    """
+    Perform facial recognition with room validation for a burst of frames.
+    
+    All frames are decoded and encoded in parallel and matched against the
+    gallery in a single matrix operation. One validation result is returned
+    (and logged) per frame, in the order the frames were sent.
+    """
+    if not request.face_images:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="At least one face image is required"
+        )
+    if len(request.face_images) > settings.FACE_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Too many images. Maximum batch size is {settings.FACE_BATCH_MAX_IMAGES}"
+        )
+    
+    try:
+        images = [_decode_face_image(face_image) for face_image in request.face_images]
+        room = await get_exam_room_by_code(request.room_code)
+        recognitions = await recognize_faces_batch(
+            images, index_range=_room_index_range(room), workload="room", room_code=request.room_code, deadline=deadline
+        )
+        
+        responses = []
+        for recognition in recognitions:
+            if recognition.get("error"):
+                logger.warning(f"Face recognition failed for batch frame: {recognition['error']}")
+                recognition = None
+            _, response = await _room_recognition_result(request.room_code, room, recognition)
+            responses.append(response)
+        
+        return HTTPResponse(
+            message=f"Batch recognition completed for {len(responses)} frame(s)",
+            status_code=status.HTTP_200_OK,
+            count=len(responses),
+            data=responses
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in batch room recognition: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Recognition system error"
+        )
+
+@router.post("/recognize/multi", response_model=HTTPResponse[FaceValidationResponse])
+async def recognize_group_in_room(request: RoomRecognitionRequest, deadline: Deadline = Depends(get_face_deadline)):
+    """
+    Recognize every student in a frame that shows several faces at once.
+    
+    For busy entrances where the camera sees two or three students together.
+    All faces are encoded together and matched against the gallery in one
+    matrix operation; one validation result (with its bounding box) is
+    returned and logged per face, ordered left to right. At most
+    FACE_MULTI_MAX_FACES faces are recognized per frame.
+    """
+    try:
+        image_data = _decode_face_image(request.face_image)
+        room = await get_exam_room_by_code(request.room_code)
+        faces = await recognize_faces_in_image(
+            image_data, index_range=_room_index_range(room), workload="room", room_code=request.room_code, deadline=deadline
+        )
+        
+        responses = []
+        for face in faces:
+            _, response = await _room_recognition_result(request.room_code, room, face)
+            responses.append(FaceValidationResponse(**response.model_dump(), face_location=face["face_location"]))
+        
+        valid = sum(1 for response in responses if response.status == "valid")
+        return HTTPResponse(
+            message=f"Recognized {len(responses)} face(s), {valid} valid for this room",
+            status_code=status.HTTP_200_OK,
+            count=len(responses),
+            data=responses
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in multi-face room recognition: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Recognition system error"
+        )
+
+@router.post("/verify", response_model=HTTPResponse[RecognitionValidationResponse])
+async def verify_in_room(request: RoomVerificationRequest, deadline: Deadline = Depends(get_face_deadline)):
+    """
+    1:1 face verification with room validation, for kiosks that already know who is at the door.
+    
+    The student claims an index number (typically by scanning their ID card)
+    and the face is compared against that student's embedding only, so the
+    cost does not depend on the number of registered students. The response
+    carries is_match and the distance, plus the same room validation and beep
+    feedback as /recognize; the attempt is logged. An index number that is not
+    registered is answered with 404.
+    """
+    try:
+        image_data = _decode_face_image(request.face_image)
+        student = await get_student_by_index_number(request.index_number)
+        if student is None:
+            reason = f"Index number {request.index_number} is not registered"
             await log_room_recognition(
                 student_id=None,
                 room_code=request.room_code,
                 status="invalid",
                 beep_type="warning",
-                index_number=None,
-                message="Face recognition failed - no match found"
+                index_number=request.index_number,
+                message=reason
             )
-            
-            response = RecognitionValidationResponse(
-                status="invalid",
-                beep_type="warning",
-                room_code=request.room_code,
-                message="Face recognition failed - no student match found",
-                timestamp=datetime.utcnow()
-            )
-            
-            return HTTPResponse(
-                message="Recognition failed",
-                status_code=status.HTTP_200_OK,
-                count=1,
-                data=[response]
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=reason)
+        
+        verification = None
+        try:
+            verification = await verify_face(
+                image_data, student.id, room_code=request.room_code, deadline=deadline
             )
+        except FaceJobRejected:
+            raise
+        except Exception as e:
+            logger.error(f"Face verification failed: {str(e)}")
         
-        if not recognized_student:
-            # Log unrecognized face
+        if verification is None or not verification["is_match"]:
+            if verification is None:
+                reason = "Face verification failed - please retake"
+            elif verification["distance"] is None:
+                reason = f"No registered face for index number {request.index_number}"
+            else:
+                reason = f"Face does not match index number {request.index_number}"
             await log_room_recognition(
-                student_id=None,
+                student_id=student.id,
                 room_code=request.room_code,
                 status="invalid",
                 beep_type="warning",
-                index_number=None,
-                message="Unrecognized face - student not found in database"
+                index_number=request.index_number,
+                message=reason
             )
-            
             response = RecognitionValidationResponse(
                 status="invalid",
                 beep_type="warning",
+                index_number=request.index_number,
                 room_code=request.room_code,
-                message="Student not recognized - face not found in database",
-                timestamp=datetime.utcnow()
+                message=reason,
+                timestamp=datetime.utcnow(),
+                distance=verification["distance"] if verification else None,
+                is_match=False
             )
-            
-            return HTTPResponse(
-                message="Student not recognized",
-                status_code=status.HTTP_200_OK,
-                count=1,
-                data=[response]
-            )
-        
-        # Validate room assignment
-        is_valid, validation_message = await validate_student_in_room(
-            recognized_student.index_number, 
-            request.room_code
-        )
+            return HTTPResponse(message="Verification failed", status_code=status.HTTP_200_OK, count=1, data=[response])
         
-        # Get room details for response
         room = await get_exam_room_by_code(request.room_code)
-        room_name = room.room_name if room else "Unknown Room"
-        
-        # Determine status and beep type
-        if is_valid:
-            status_result = "valid"
-            beep_type = "confirmation"
-            message = f"✅ {recognized_student.name} verified in {room_name}"
-        else:
-            status_result = "invalid"
-            beep_type = "warning"
-            message = f"⚠️ {recognized_student.name} not assigned to {room_name}"
-        
-        # Log the recognition attempt
-        await log_room_recognition(
-            student_id=recognized_student.id,
-            room_code=request.room_code,
-            status=status_result,
-            beep_type=beep_type,
-            index_number=recognized_student.index_number,
-            message=validation_message
+        _, response, log_entry = _validate_student_for_room(
+            request.room_code, room, student, verification["distance"], is_match=True
         )
-        
-        # Create response
-        response = RecognitionValidationResponse(
-            status=status_result,
-            beep_type=beep_type,
-            student_id=recognized_student.id,
-            student_name=recognized_student.name,
-            index_number=recognized_student.index_number,
-            room_code=request.room_code,
-            room_name=room_name,
-            message=message,
-            timestamp=datetime.utcnow()
-        )
-        
+        await log_room_recognition(**log_entry)
         return HTTPResponse(
-            message="Recognition completed",
+            message="Verification completed",
             status_code=status.HTTP_200_OK,
             count=1,
             data=[response]
@@ -289,23 +552,162 @@ async def recognize_in_room(request: RoomRecognitionRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in room recognition: {str(e)}")
-        
-        # Log system error
-        await log_room_recognition(
-            student_id=None,
-            room_code=request.room_code,
-            status="invalid",
-            beep_type="warning",
-            index_number=None,
-            message=f"System error: {str(e)}"
-        )
-        
+        logger.error(f"Error in room verification: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Recognition system error"
+            detail="Verification system error"
         )
 
+@router.websocket("/stream/{room_code}")
+async def stream_room_recognition(websocket: WebSocket, room_code: str):
+    """
+    Continuous recognition with room validation for an exam-room camera.
+    
+    The device sends frames as binary JPEG/PNG messages (text messages are
+    treated as base64 images). Frames are processed one at a time; when the
+    server falls behind, only the most recent frame is kept and older ones are
+    dropped (latest-frame-wins). Each result is pushed back as JSON shaped like
+    RecognitionValidationResponse plus the sequence number of the processed
+    frame, the running count of dropped frames, the face's track_id and
+    whether the result was reused from an already identified track.
+    
+    Faces are tracked across frames by box overlap. Until a track is
+    confidently identified every frame is encoded and matched; afterwards
+    frames only run detection and reuse the track's result. One
+    room_recognition_logs row is written per track: when it is identified,
+    or with its last result when it ends without being identified.
+    """
+    await websocket.accept()
+    
+    room = await get_exam_room_by_code(room_code)
+    if not room:
+        await websocket.send_json({"message": f"Exam room '{room_code}' not found", "status": "invalid"})
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    index_range = _room_index_range(room)
+    latest = {"frame": None, "sequence": 0, "dropped": 0, "closed": False}
+    frame_ready = asyncio.Event()
+    tracker = FaceTracker(settings.FACE_TRACK_IOU_THRESHOLD, settings.FACE_TRACK_MAX_AGE)
+    
+    async def stream_closed() -> bool:
+        return latest["closed"]
+    
+    async def log_tracks(tracks):
+        for track in tracks:
+            if not track.logged and track.result is not None:
+                await log_room_recognition(**track.result[1])
+                track.logged = True
+    
+    async def process_frame(frame: bytes) -> Optional[Dict]:
+        deadline = Deadline(settings.REQUEST_TIMEOUT, stream_closed)
+        analysis = await analyze_frame(
+            frame, max_faces=1, skip_boxes=tracker.identified_boxes(), room_code=room_code, deadline=deadline
+        )
+        if analysis["error"]:
+            logger.warning(f"Invalid stream frame for room {room_code}: {analysis['error']}")
+            return None
+        
+        tracks, expired = tracker.update(analysis["face_locations"])
+        await log_tracks(expired)
+        if not tracks:
+            return None
+        if len(tracks) > 1:
+            response = RecognitionValidationResponse(
+                status="invalid",
+                beep_type="warning",
+                room_code=room_code,
+                message="Multiple faces detected - one student at a time please",
+                timestamp=datetime.utcnow()
+            )
+            return {"track_id": None, "tracked": False, **response.model_dump(mode="json")}
+        
+        track = tracks[0]
+        if track.identified:
+            response = track.result[0].model_copy(update={"timestamp": datetime.utcnow()})
+            return {"track_id": track.track_id, "tracked": True, **response.model_dump(mode="json")}
+        
+        encoding = analysis["face_encodings"][0] if analysis["face_encodings"] else None
+        recognition = None
+        if encoding is not None:
+            recognition = (await match_embeddings(
+                encoding[np.newaxis, :], index_range=index_range, deadline=deadline, room_code=room_code
+            ))[0]
+        
+        _, response, log_entry = await _evaluate_room_recognition(room_code, room, recognition)
+        track.result = (response, log_entry)
+        if response.student_id is not None:
+            # A confident match: stop encoding this track and log it once
+            track.identified = True
+            await log_tracks([track])
+        return {"track_id": track.track_id, "tracked": False, **response.model_dump(mode="json")}
+    
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    frame = message["bytes"]
+                else:
+                    try:
+                        frame = _decode_face_image(message.get("text") or "")
+                    except HTTPException as e:
+                        logger.warning(f"Invalid stream frame for room {room_code}: {e.detail}")
+                        continue
+                if latest["frame"] is not None:
+                    latest["dropped"] += 1
+                latest["frame"] = frame
+                latest["sequence"] += 1
+                frame_ready.set()
+        finally:
+            latest["closed"] = True
+            frame_ready.set()
+    
+    receiver = asyncio.create_task(receive_frames())
+    logger.info(f"Recognition stream opened for room {room_code}")
+    try:
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            if latest["closed"]:
+                break
+            if latest["frame"] is None:
+                continue
+            frame, sequence = latest["frame"], latest["sequence"]
+            latest["frame"] = None
+            
+            try:
+                result = await process_frame(frame)
+            except FaceJobRejected as e:
+                # Shed this frame (workers busy, or the camera went away); the next one is processed normally
+                logger.warning(f"Dropping stream frame for room {room_code}: {e.detail}")
+                latest["dropped"] += 1
+                continue
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.error(f"Face recognition failed for stream frame: {str(e)}")
+                continue
+            
+            if result is not None:
+                await websocket.send_json({
+                    "frame": sequence,
+                    "dropped_frames": latest["dropped"],
+                    **result
+                })
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Error in recognition stream for room {room_code}: {str(e)}")
+        if not latest["closed"]:
+            await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+    finally:
+        receiver.cancel()
+        await log_tracks(tracker.flush())
+        logger.info(f"Recognition stream closed for room {room_code} ({latest['sequence']} frames, {latest['dropped']} dropped)")
+
 @router.get("/validate/{room_code}/{index_number}")
 async def validate_student_assignment(room_code: str, index_number: str):
     """
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, status, Depends
-from schemas.students import StudentCreate, StudentUpdate, Student, FaceDetectionRequest
+from fastapi import APIRouter, UploadFile, File, HTTPException, status, Depends, Query
+from schemas.students import (
+    StudentCreate, StudentUpdate, Student, FaceDetectionRequest,
+    RecognitionCandidates, BatchRecognitionResult
+)
 from schemas.responses import HTTPResponse
 from crud.students import create_student, get_student_by_id, get_all_students, update_student, delete_student
-from services.face_recognition import extract_face_embedding, recognize_face, detect_faces_with_bounding_boxes
+from services.face_recognition import (
+    extract_face_embedding, recognize_face, recognize_face_candidates,
+    recognize_faces_batch, detect_faces_with_bounding_boxes
+)
+from services.face_admission import Deadline, FaceJobRejected
 from services.recognition_logs import log_recognition
-from api.dependencies import get_current_admin
+from api.dependencies import get_current_admin, get_face_deadline
+from core.config import settings
 from typing import List
 from uuid import UUID
 import base64
@@ -16,7 +24,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/students", tags=["🎓 Students"])
 
 @router.post("/", response_model=HTTPResponse[Student], status_code=status.HTTP_201_CREATED)
-async def register_student(student: StudentCreate):
+async def register_student(student: StudentCreate, deadline: Deadline = Depends(get_face_deadline)):
     """Register a new student with optional facial embedding."""
     try:
         # Handle face image validation (now optional)
@@ -47,11 +55,14 @@ async def register_student(student: StudentCreate):
                             else:
                                 # Extract face embedding (allow registration without face detection)
                                 try:
-                                    embedding = await extract_face_embedding(image_data)
+                                    embedding = await extract_face_embedding(image_data, deadline=deadline)
                                     if embedding is not None:
                                         logger.info("Face detected and embedding extracted successfully")
                                     else:
                                         logger.warning("No face detected, but allowing registration to proceed")
+                                except FaceJobRejected:
+                                    # Busy or timed-out face workers: let the client retry rather than register without a face
+                                    raise
                                 except HTTPException as he:
                                     # If face detection fails, log but allow registration to continue
                                     logger.warning(f"Face detection failed: {he.detail}, but allowing registration to proceed")
@@ -69,11 +80,14 @@ async def register_student(student: StudentCreate):
                         else:
                             # Extract face embedding (allow registration without face detection)
                             try:
-                                embedding = await extract_face_embedding(image_data)
+                                embedding = await extract_face_embedding(image_data, deadline=deadline)
                                 if embedding is not None:
                                     logger.info("Face detected and embedding extracted successfully")
                                 else:
                                     logger.warning("No face detected, but allowing registration to proceed")
+                            except FaceJobRejected:
+                                # Busy or timed-out face workers: let the client retry rather than register without a face
+                                raise
                             except HTTPException as he:
                                 # If face detection fails, log but allow registration to continue
                                 logger.warning(f"Face detection failed: {he.detail}, but allowing registration to proceed")
@@ -82,6 +96,8 @@ async def register_student(student: StudentCreate):
                     except (binascii.Error, ValueError) as e:
                         logger.warning(f"Invalid base64 image data: {str(e)}, proceeding without face embedding")
                         
+            except FaceJobRejected:
+                raise
             except Exception as e:
                 logger.warning(f"Error processing face image: {str(e)}, proceeding without face embedding")
         else:
@@ -157,7 +173,8 @@ async def register_student(student: StudentCreate):
         )
 
 @router.post("/admin/create", response_model=HTTPResponse[Student], status_code=status.HTTP_201_CREATED)
-async def admin_create_student(student: StudentCreate, _=Depends(get_current_admin)):
+async def admin_create_student(student: StudentCreate, _=Depends(get_current_admin),
+                               deadline: Deadline = Depends(get_face_deadline)):
     """Admin endpoint to register a new student with facial embedding."""
     try:
         # Validate face image
@@ -197,11 +214,14 @@ async def admin_create_student(student: StudentCreate, _=Depends(get_current_adm
         # Extract face embedding (allow creation without face detection)
         embedding = None
         try:
-            embedding = await extract_face_embedding(image_data)
+            embedding = await extract_face_embedding(image_data, deadline=deadline)
             if embedding is not None:
                 logger.info("Face detected and embedding extracted successfully")
             else:
                 logger.warning("No face detected, but allowing creation to proceed")
+        except FaceJobRejected:
+            # Busy or timed-out face workers: let the client retry rather than register without a face
+            raise
         except HTTPException as he:
             # If face detection fails, log but allow creation to continue
             logger.warning(f"Face detection failed: {he.detail}, but allowing creation to proceed")
@@ -297,41 +317,48 @@ async def delete_student_record(student_id: UUID, _=Depends(get_current_admin)):
         data=None
     )
 
-@router.post("/recognize", response_model=HTTPResponse[Student])
-async def recognize_student(image: UploadFile = File(...)):
-    """Recognize a student from an uploaded face image."""
+async def _read_image_upload(image: UploadFile) -> bytes:
+    """Validate an uploaded face image and return its bytes."""
+    # Validate file type
+    if not image.content_type or not image.content_type.startswith('image/'):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid file type. Please upload an image file (JPEG or PNG)"
+        )
+        
+    # Validate file size (max 10MB)
+    if hasattr(image, 'size') and image.size > 10 * 1024 * 1024:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="File too large. Maximum size is 10MB"
+        )
+        
+    # Read image contents
     try:
-        # Validate file type
-        if not image.content_type or not image.content_type.startswith('image/'):
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="Invalid file type. Please upload an image file (JPEG or PNG)"
-            )
-            
-        # Validate file size (max 10MB)
-        if hasattr(image, 'size') and image.size > 10 * 1024 * 1024:
+        contents = await image.read()
+        if not contents or len(contents) == 0:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="File too large. Maximum size is 10MB"
-            )
-            
-        # Read image contents
-        try:
-            contents = await image.read()
-            if not contents or len(contents) == 0:
-                raise HTTPException(
-                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                    detail="Empty image file provided"
-                )
-        except Exception as e:
-            logger.error(f"Error reading image file: {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail=f"Error reading image file: {str(e)}"
+                detail="Empty image file provided"
             )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading image file: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Error reading image file: {str(e)}"
+        )
+    return contents
+
+@router.post("/recognize", response_model=HTTPResponse[Student])
+async def recognize_student(image: UploadFile = File(...), deadline: Deadline = Depends(get_face_deadline)):
+    """Recognize a student from an uploaded face image."""
+    try:
+        contents = await _read_image_upload(image)
 
         # Recognize face
-        student = await recognize_face(contents)
+        student = await recognize_face(contents, deadline)
         if student:
             await log_recognition(student.id, True)
             return HTTPResponse(
@@ -357,6 +384,82 @@ async def recognize_student(image: UploadFile = File(...)):
             detail="Failed to process face recognition. Please try again"
         )
 
+@router.post("/recognize/candidates", response_model=HTTPResponse[RecognitionCandidates])
+async def recognize_student_candidates(image: UploadFile = File(...), k: int = Query(3, ge=1, le=20),
+                                       deadline: Deadline = Depends(get_face_deadline)):
+    """
+    Return the top-k matching students with distances and the margin between the best two.
+    
+    Clear matches (is_match and not is_ambiguous) can be accepted immediately;
+    ambiguous ones should prompt a retake rather than a blind resubmission.
+    """
+    try:
+        contents = await _read_image_upload(image)
+        result = await recognize_face_candidates(contents, k, deadline=deadline)
+        
+        if result["is_ambiguous"]:
+            message = "Ambiguous match. Please retake the photo"
+        elif result["is_match"]:
+            message = "Student recognized successfully"
+        else:
+            message = "No matching student found"
+        
+        return HTTPResponse(
+            message=message,
+            status_code=status.HTTP_200_OK,
+            count=1,
+            data=[RecognitionCandidates(**result)]
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error ranking recognition candidates: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to process face recognition. Please try again"
+        )
+
+@router.post("/recognize/batch", response_model=HTTPResponse[BatchRecognitionResult])
+async def recognize_students_batch(images: List[UploadFile] = File(...), k: int = Query(3, ge=1, le=20),
+                                   deadline: Deadline = Depends(get_face_deadline)):
+    """
+    Recognize students in several uploaded images with one request.
+    
+    Images are processed in parallel and matched against the gallery in a
+    single pass. Results are returned per image, in upload order.
+    """
+    if len(images) > settings.FACE_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Too many images. Maximum batch size is {settings.FACE_BATCH_MAX_IMAGES}"
+        )
+    
+    try:
+        contents = [await _read_image_upload(image) for image in images]
+        results = await recognize_faces_batch(contents, k, deadline=deadline)
+        
+        data = [
+            BatchRecognitionResult(image_index=position, filename=image.filename, **result)
+            for position, (image, result) in enumerate(zip(images, results))
+        ]
+        matched = sum(1 for result in data if result.is_match)
+        return HTTPResponse(
+            message=f"Batch recognition complete. Matched {matched} of {len(data)} image(s)",
+            status_code=status.HTTP_200_OK,
+            count=len(data),
+            data=data
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in batch face recognition: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to process face recognition. Please try again"
+        )
+
 @router.post("/detect-face")
 async def detect_face_preview(request: dict):
     """
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark HOG detection latency against recall at several detection resolutions.
+
+Faces found at full resolution are taken as ground truth. At each reduced
+resolution a ground-truth face counts as recalled when a detected box, mapped
+back to full-resolution coordinates, overlaps it with IoU >= 0.5.
+
+Usage: python benchmark_face_detection.py fixtures/*.jpg [--dimensions 0 1600 1024 800 640 480]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.face_pipeline import box_iou, decode_image, detect_faces, load_models
+
+
+def timed_detect(image: np.ndarray, max_dimension: int, repeat: int):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        locations = detect_faces(image, max_dimension)
+    return locations, (time.perf_counter() - started) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="+", help="fixture JPEG/PNG files containing faces")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[0, 1600, 1024, 800, 640, 480])
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    if not load_models():
+        raise SystemExit("face_recognition is not installed")
+
+    images = []
+    for path in args.images:
+        with open(path, "rb") as f:
+            images.append(decode_image(f.read()).pixels)
+
+    ground_truth = [detect_faces(image, 0) for image in images]
+    total_faces = sum(len(faces) for faces in ground_truth)
+    print(f"{len(images)} images, {total_faces} faces at full resolution")
+    print(f"{'max side':>8} | {'mean ms':>9} | {'p95 ms':>9} | {'recall':>7} | {'extra boxes':>11}")
+    print("-" * 57)
+
+    for max_dimension in args.dimensions:
+        latencies = []
+        recalled = 0
+        extra = 0
+        for image, expected in zip(images, ground_truth):
+            locations, elapsed = timed_detect(image, max_dimension, args.repeat)
+            latencies.append(elapsed)
+            matched = sum(1 for face in expected if any(box_iou(face, box) >= 0.5 for box in locations))
+            recalled += matched
+            extra += max(0, len(locations) - matched)
+        recall = recalled / total_faces * 100 if total_faces else 100.0
+        label = "full" if max_dimension == 0 else str(max_dimension)
+        print(
+            f"{label:>8} | {np.mean(latencies):>9.1f} | {np.percentile(latencies, 95):>9.1f} | "
+            f"{recall:>6.1f}% | {extra:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark the face pipeline on a thread pool against a process pool.
+
+Every image is validated, decoded, detected and encoded through the same
+run_pipeline_job path the API uses, once per executor mode, with all jobs
+submitted concurrently like a burst of camera uploads.
+
+Usage: python benchmark_face_executor.py photos/*.jpg [--workers 16] [--repeat 4]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from services.face_executor import create_pipeline_executor, run_pipeline_job
+from services.face_pipeline import analyze_image, load_models
+
+
+async def run_burst(executor, images) -> float:
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run_pipeline_job(analyze_image, image, executor=executor) for image in images))
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for result in results if result["error"])
+    if failed:
+        print(f"  {failed} image(s) failed validation")
+    return elapsed
+
+
+async def benchmark(mode: str, workers: int, images) -> None:
+    executor = create_pipeline_executor(mode, workers)
+    try:
+        # Warm-up: start the workers and touch the models before timing
+        await asyncio.gather(*(run_pipeline_job(analyze_image, images[0], executor=executor) for _ in range(workers)))
+        elapsed = await run_burst(executor, images)
+    finally:
+        executor.shutdown(wait=True)
+    print(f"{mode:>8} | {workers:>7} | {len(images):>6} | {elapsed * 1000:>10.1f} | {len(images) / elapsed:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="+", help="JPEG/PNG files containing faces")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--repeat", type=int, default=4, help="times to repeat the image list in each burst")
+    parser.add_argument("--modes", nargs="+", default=["thread", "process"])
+    args = parser.parse_args()
+
+    if not load_models():
+        raise SystemExit("face_recognition is not installed")
+
+    images = []
+    for path in args.images:
+        with open(path, "rb") as f:
+            images.append(f.read())
+    images = images * args.repeat
+
+    print(f"{'mode':>8} | {'workers':>7} | {'images':>6} | {'total ms':>10} | {'images/s':>10}")
+    print("-" * 54)
+    for mode in args.modes:
+        asyncio.run(benchmark(mode, args.workers, images))
+
+
+if __name__ == "__main__":
+    main()
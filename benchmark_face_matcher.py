@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vectorized FaceMatcher against the old per-request KDTree path.
+
+The old path built a scipy KDTree over every stored embedding on each request
+and ran a single query. The matcher keeps the gallery as a float32 matrix and
+answers with one BLAS product.
+
+Usage: python benchmark_face_matcher.py [--sizes 1000 10000 100000] [--queries 50]
+"""
+import argparse
+import time
+
+import numpy as np
+from scipy.spatial import KDTree
+
+from services.face_index import EMBEDDING_DIMENSION, FaceMatcher
+
+
+def make_gallery(n: int, rng: np.random.Generator) -> np.ndarray:
+    """Synthetic dlib-like embeddings: roughly unit-norm 128-d vectors."""
+    vectors = rng.normal(size=(n, EMBEDDING_DIMENSION))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def make_queries(gallery: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Noisy copies of random gallery rows, like a fresh photo of a registered student."""
+    picks = rng.integers(0, len(gallery), size=count)
+    return gallery[picks] + rng.normal(scale=0.02, size=(count, EMBEDDING_DIMENSION))
+
+
+def time_ms(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def benchmark(n: int, query_count: int, rng: np.random.Generator) -> None:
+    gallery = make_gallery(n, rng)
+    queries = make_queries(gallery, query_count, rng)
+
+    # Old path: build + single query per request
+    def kdtree_request(query):
+        tree = KDTree(gallery)
+        return tree.query(query, k=1)
+
+    kdtree_ms = time_ms(lambda: [kdtree_request(q) for q in queries], 1) / query_count
+
+    build_ms = time_ms(lambda: FaceMatcher(gallery), 3)
+    matcher = FaceMatcher(gallery)
+    matcher_ms = time_ms(lambda: [matcher.search(q, k=1) for q in queries], 3) / query_count
+    batch_ms = time_ms(lambda: matcher.search(queries, k=1), 3) / query_count
+
+    # Both paths must agree on the nearest neighbour
+    tree = KDTree(gallery)
+    _, expected = tree.query(queries, k=1)
+    indices, _ = matcher.search(queries, k=1)
+    agreement = np.mean(indices[:, 0] == expected) * 100
+
+    print(
+        f"{n:>8} | {kdtree_ms:>14.2f} | {build_ms:>12.2f} | {matcher_ms:>13.3f} | "
+        f"{batch_ms:>15.3f} | {agreement:>8.1f}%"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print("Per-query latency in milliseconds")
+    print(f"{'students':>8} | {'KDTree/request':>14} | {'matcher build':>12} | {'matcher query':>13} | "
+          f"{'matcher batched':>15} | {'agree':>9}")
+    print("-" * 88)
+    for n in args.sizes:
+        benchmark(n, args.queries, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark pipeline profiles: latency of a full analyze_image job against match rate.
+
+Fixture images are grouped by student, one directory per student. The first
+image of each student is enrolled with the "enrollment" profile, as
+registration does. Every other image is then analyzed with each profile and
+counts as matched when its nearest enrolled student is the right one, within
+the recognition threshold. Images where no face is found count as misses.
+
+Usage: python benchmark_face_profiles.py fixtures/students/*/ [--profiles fast balanced enrollment]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from services.face_pipeline import PIPELINE_PROFILES, analyze_image, load_models
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def load_students(directories):
+    students = {}
+    for directory in directories:
+        paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if len(paths) < 2:
+            print(f"skipping {directory}: needs an enrollment image and at least one probe")
+            continue
+        images = []
+        for path in paths:
+            with open(path, "rb") as f:
+                images.append(f.read())
+        students[os.path.basename(os.path.normpath(directory))] = images
+    return students
+
+
+def timed_analyze(image_data: bytes, profile, repeat: int):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        analysis = analyze_image(image_data, **profile._asdict())
+    return analysis, (time.perf_counter() - started) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("students", nargs="+", help="one directory of JPEG/PNG files per student")
+    parser.add_argument("--profiles", nargs="+", default=list(PIPELINE_PROFILES), choices=list(PIPELINE_PROFILES))
+    parser.add_argument("--threshold", type=float, default=0.6, help="recognition distance threshold")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    if not load_models():
+        raise SystemExit("face_recognition is not installed")
+
+    students = load_students(args.students)
+    ids, gallery = [], []
+    for student_id, images in students.items():
+        enrolled = analyze_image(images[0], **PIPELINE_PROFILES["enrollment"]._asdict())
+        if len(enrolled["face_encodings"]) != 1:
+            print(f"skipping {student_id}: enrollment image must contain exactly one face")
+            continue
+        ids.append(student_id)
+        gallery.append(enrolled["face_encodings"][0])
+    if not gallery:
+        raise SystemExit("no student could be enrolled")
+    gallery = np.stack(gallery)
+
+    probes = [(student_id, image) for student_id in ids for image in students[student_id][1:]]
+    print(f"{len(ids)} students enrolled, {len(probes)} probe images")
+    print(f"{'profile':>10} | {'mean ms':>9} | {'p95 ms':>9} | {'match rate':>10} | {'no face':>7} | {'wrong':>5}")
+    print("-" * 66)
+
+    for name in args.profiles:
+        profile = PIPELINE_PROFILES[name]
+        latencies = []
+        matched = missed = wrong = 0
+        for student_id, image_data in probes:
+            analysis, elapsed = timed_analyze(image_data, profile, args.repeat)
+            latencies.append(elapsed)
+            if not analysis["face_encodings"]:
+                missed += 1
+                continue
+            # The largest face is the one in front of the camera
+            areas = [(bottom - top) * (right - left) for top, right, bottom, left in analysis["face_locations"]]
+            encoding = analysis["face_encodings"][int(np.argmax(areas))]
+            distances = np.linalg.norm(gallery - encoding, axis=1)
+            best = int(np.argmin(distances))
+            if distances[best] <= args.threshold and ids[best] == student_id:
+                matched += 1
+            else:
+                wrong += 1
+        match_rate = matched / len(probes) * 100 if probes else 100.0
+        print(
+            f"{name:>10} | {np.mean(latencies):>9.1f} | {np.percentile(latencies, 95):>9.1f} | "
+            f"{match_rate:>9.1f}% | {missed:>7} | {wrong:>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Compare exact float32 gallery search with the float16 and int8 quantized modes.
+
+Each gallery is written to a snapshot file and mapped, as workers do with
+FACE_GALLERY_SNAPSHOT_PATH. For each gallery size and mode this reports the
+private memory the index holds on top of the mapping, the bytes scanned per
+search, the mean and p95 latency of single-query searches, and accuracy against
+exact search: how often the top-1 student agrees, how much of the top-k overlaps,
+and the largest difference in returned distance.
+
+Queries are noisy copies of gallery rows, plus a share of near-duplicate
+pairs (siblings, re-registrations) where the ranking is hardest to keep.
+
+Usage: python benchmark_face_quantization.py [--sizes 10000 100000] [--queries 200] [--k 5] [--rerank 32]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from services.face_index import EMBEDDING_DIMENSION, FaceIndex
+from services.gallery_snapshot import read_snapshot, write_snapshot
+
+
+def make_gallery(n: int, rng: np.random.Generator) -> np.ndarray:
+    """Synthetic dlib-like embeddings with 5% near-duplicate rows."""
+    vectors = rng.normal(size=(n, EMBEDDING_DIMENSION))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    twins = rng.choice(n, size=n // 20, replace=False)
+    vectors[twins] = vectors[rng.integers(0, n, size=len(twins))] + rng.normal(scale=0.03, size=(len(twins), EMBEDDING_DIMENSION))
+    return vectors.astype(np.float32)
+
+
+def make_queries(gallery: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Noisy copies of random gallery rows, like a fresh photo of a registered student."""
+    picks = rng.integers(0, len(gallery), size=count)
+    return (gallery[picks] + rng.normal(scale=0.02, size=(count, EMBEDDING_DIMENSION))).astype(np.float32)
+
+
+def memory_use(index: FaceIndex):
+    """(private bytes held for the mapped base, bytes the first search pass reads)."""
+    base = index.snapshot().matcher.base
+    codes = getattr(base, "codes", None)
+    if codes is None:
+        return base.sq_norms.nbytes, base.matrix.nbytes
+    return codes.nbytes + base.sq_norms.nbytes, codes.nbytes
+
+
+def run(size: int, query_count: int, k: int, rerank: int, rng: np.random.Generator, directory: str):
+    gallery = make_gallery(size, rng)
+    queries = make_queries(gallery, query_count, rng)
+    ids = [str(i) for i in range(size)]
+    path = os.path.join(directory, f"gallery-{size}.snap")
+    write_snapshot(path, ids, gallery, {}, None)
+    mapped = read_snapshot(path)
+
+    print(f"\nGallery of {size:,} embeddings (float64 would be {gallery.astype(np.float64).nbytes / 2**20:.1f} MiB)")
+    print(f"{'mode':>8} {'own MiB':>8} {'scan MiB':>9} {'mean ms':>8} {'p95 ms':>8} {'top-1 agree':>12} {'top-k overlap':>14} {'max |Δd|':>9}")
+
+    reference = None
+    for mode in ("none", "float16", "int8"):
+        index = FaceIndex.from_base(mapped.ids, mapped.matrix, quantization=mode, rerank=rerank)
+        snapshot = index.snapshot()
+        snapshot.search(queries[0], k)  # warm-up
+
+        latencies = []
+        results = []
+        for query in queries:
+            started = time.perf_counter()
+            result_ids, distances = snapshot.search(query, k)
+            latencies.append(time.perf_counter() - started)
+            results.append((list(result_ids[0]), distances[0]))
+
+        if reference is None:
+            reference = results
+        top1 = np.mean([ids_[0] == ref[0][0] for (ids_, _), ref in zip(results, reference)])
+        overlap = np.mean([len(set(ids_) & set(ref[0])) / k for (ids_, _), ref in zip(results, reference)])
+        drift = max(float(np.max(np.abs(d - ref[1]))) for (_, d), ref in zip(results, reference))
+        latencies = np.array(latencies) * 1000
+        private, scanned = memory_use(index)
+        print(
+            f"{mode:>8} {private / 2**20:>8.1f} {scanned / 2**20:>9.1f} {latencies.mean():>8.3f} "
+            f"{np.percentile(latencies, 95):>8.3f} {top1 * 100:>11.1f}% {overlap * 100:>13.1f}% {drift:>9.2e}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rerank", type=int, default=32, help="candidates re-ranked in float32 per query")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            run(size, args.queries, args.k, args.rerank, rng, directory)
+
+
+if __name__ == "__main__":
+    main()
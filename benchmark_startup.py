@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Measure how long each router (and the whole app) takes to import, and which
+heavy dependencies the import pulls in.
+
+Every module is imported in a fresh interpreter, so nothing is shared between
+measurements. The app is imported twice: as a recognition worker and as a
+CRUD-only worker (FACE_RECOGNITION_ENABLED=false), which should never load
+dlib. Heavy modules are reported as loaded if they are in sys.modules once
+the import has finished.
+
+Usage: python benchmark_startup.py [--repeat 3]
+"""
+import argparse
+import json
+import os
+import pkgutil
+import subprocess
+import sys
+
+import api.routers
+
+HEAVY_MODULES = ["face_recognition", "dlib", "numpy", "PIL", "asyncpg"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({{"ms": elapsed, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module: str, env: dict) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, env=env,
+    )
+    if completed.returncode != 0:
+        last_line = completed.stderr.strip().splitlines()[-1:] or ["unknown error"]
+        return {"error": last_line[0]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh imports per module; the fastest is reported")
+    args = parser.parse_args()
+
+    targets = [(f"api.routers.{info.name}", {}) for info in pkgutil.iter_modules(api.routers.__path__)]
+    targets.append(("main", {"FACE_RECOGNITION_ENABLED": "true"}))
+    targets.append(("main", {"FACE_RECOGNITION_ENABLED": "false"}))
+
+    print(f"{'module':<28} {'worker':<12} {'import ms':>10}  heavy modules loaded")
+    for module, overrides in targets:
+        env = {**os.environ, **overrides}
+        runs = [measure(module, env) for _ in range(args.repeat)]
+        worker = "crud-only" if overrides.get("FACE_RECOGNITION_ENABLED") == "false" else "recognition"
+        failed = next((run for run in runs if "error" in run), None)
+        if failed:
+            print(f"{module:<28} {worker:<12} {'-':>10}  failed: {failed['error']}")
+            continue
+        best = min(runs, key=lambda run: run["ms"])
+        print(f"{module:<28} {worker:<12} {best['ms']:>10.1f}  {', '.join(best['loaded']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,8 +27,38 @@ class Settings(BaseSettings):
     EMAIL_PASSWORD: str
     
     # Face Recognition Configuration
+    FACE_RECOGNITION_ENABLED: bool = True  # false runs a CRUD-only worker: dlib is never loaded, recognition endpoints answer 503
     FACE_RECOGNITION_THRESHOLD: float = 0.6
     MAX_FACE_DISTANCE: float = 0.6
+    FACE_RECOGNITION_TOP_K: int = 3
+    FACE_RECOGNITION_MIN_MARGIN: float = 0.05  # best-vs-runner-up distance gap below which a match is ambiguous
+    FACE_BATCH_MAX_IMAGES: int = 16
+    FACE_MULTI_MAX_FACES: int = 5  # faces recognized in one group frame; frames with more are rejected
+    FACE_DETECTION_MAX_DIMENSION: int = 800  # "balanced" profile: longer side of the detection copy in pixels; 0 detects at full resolution
+    FACE_CACHE_MAX_BYTES: int = 16 * 1024 * 1024  # memory budget of the content-hash embedding cache; 0 disables it
+    FACE_DECODE_MAX_DIMENSION: int = 1600  # "balanced" profile: larger JPEGs are decoded at a reduced DCT scale, never below this; 0 decodes at full size
+    # Pipeline profile ("fast", "balanced" or "enrollment", see services/face_pipeline.PIPELINE_PROFILES) per workload class
+    FACE_PROFILE_ROOM: str = "fast"  # exam-room kiosks, room batches and camera streams
+    FACE_PROFILE_RECOGNITION: str = "balanced"  # recognition uploads outside an exam room
+    FACE_PROFILE_REGISTRATION: str = "enrollment"  # embeddings stored when registering or updating a student
+    FACE_PROFILE_PREVIEW: str = "fast"  # face detection previews
+    FACE_PROFILE_OVERRIDES: Dict[str, Dict] = {}  # per-profile field overrides, e.g. {"enrollment": {"num_jitters": 10}} (JSON in the environment)
+    EXAM_ROOM_SCOPED_RECOGNITION: bool = True  # match against the room's index range first, all students only as fallback
+    FACE_HOT_SET_SIZE: int = 32  # recently recognized students per room checked before the gallery; 0 disables
+    FACE_HOT_SET_MAX_DISTANCE: float = 0.45  # a recent match this close skips the full gallery search
+    FACE_TRACK_IOU_THRESHOLD: float = 0.3  # minimum box overlap for a face to continue a stream track
+    FACE_TRACK_MAX_AGE: float = 2.0  # seconds an unidentified stream track survives without a matching detection; identified tracks end at once
+    FACE_EMBEDDING_FORMAT: str = "json"  # "json" (legacy float list) or "base64" (face_embedding_b64 float32 column; needs face_embedding_b64_migration.sql)
+    FACE_GALLERY_QUANTIZATION: str = "none"  # "none", "float16" or "int8" codes kept in memory for the mapped snapshot (needs FACE_GALLERY_SNAPSHOT_PATH), re-ranked from the file; saves memory, not latency
+    FACE_QUANTIZED_RERANK: int = 32  # candidates per query re-ranked in float32 when quantized
+    FACE_GALLERY_SYNC_INTERVAL: int = 30  # seconds between updated_at delta syncs
+    FACE_GALLERY_FULL_RELOAD_INTERVAL: int = 3600  # full reload reconciles deletes made by other processes
+    FACE_GALLERY_SNAPSHOT_PATH: str = ""  # memory-mapped gallery file shared by workers on a host; empty disables
+    FACE_GALLERY_SNAPSHOT_INTERVAL: int = 300  # seconds between snapshot rewrites and re-maps
+    FACE_GALLERY_CHANGE_FEED: str = ""  # "postgres" (LISTEN/NOTIFY), "file" (single-host stand-in) or "" to disable
+    FACE_GALLERY_CHANGE_FEED_DSN: str = ""  # Postgres connection string for LISTEN/NOTIFY (Supabase direct connection URL)
+    FACE_GALLERY_CHANGE_FEED_CHANNEL: str = "face_gallery"
+    FACE_GALLERY_CHANGE_FEED_PATH: str = "face_gallery_events.jsonl"  # shared event file for the "file" backend
     
     # API Configuration
     API_V1_STR: str = "/api/v1"
@@ -36,7 +66,14 @@ class Settings(BaseSettings):
     
     # Performance Configuration
     MAX_WORKERS: int = 4
+    FACE_EXECUTOR_MODE: str = "thread"  # "thread" or "process" for decode/detect/encode
     REQUEST_TIMEOUT: int = 300  # 5 minutes for face processing
+    # Face jobs allowed to wait for a pipeline worker, per workload class; more are rejected with 503
+    FACE_QUEUE_ROOM_LIMIT: int = 64
+    FACE_QUEUE_BATCH_LIMIT: int = 32
+    FACE_QUEUE_REGISTRATION_LIMIT: int = 16
+    FACE_QUEUE_PREVIEW_LIMIT: int = 8
+    FACE_QUEUE_MAX_WAIT: float = 10.0  # seconds; jobs whose estimated wait is longer are rejected, 0 disables
     
     class Config:
         env_file = ".env"
@@ -223,19 +223,25 @@ async def validate_student_in_room(index_number: str, room_code: str) -> tuple[b
     """
     try:
         room = await get_exam_room_by_code(room_code)
-        if not room:
-            return False, f"Room '{room_code}' not found"
-        
-        # Check if index number falls within the room's assigned range
-        if room.index_start <= index_number <= room.index_end:
-            return True, f"Student {index_number} is correctly assigned to {room.room_name}"
-        else:
-            return False, f"Student {index_number} is not assigned to {room.room_name}. Assigned range: {room.index_start}-{room.index_end}"
+        return check_student_in_room(index_number, room_code, room)
     
     except Exception as e:
         logger.error(f"Error validating student in room: {str(e)}")
         return False, "Validation error occurred"
 
+def check_student_in_room(index_number: str, room_code: str, room: Optional[ExamRoom]) -> tuple[bool, str]:
+    """
+    validate_student_in_room against an already fetched room (None if it does not exist).
+    Returns (is_valid, message).
+    """
+    if not room:
+        return False, f"Room '{room_code}' not found"
+    
+    # Check if index number falls within the room's assigned range
+    if room.index_start <= index_number <= room.index_end:
+        return True, f"Student {index_number} is correctly assigned to {room.room_name}"
+    return False, f"Student {index_number} is not assigned to {room.room_name}. Assigned range: {room.index_start}-{room.index_end}"
+
 async def log_room_recognition(student_id: Optional[UUID], room_code: str, status: str, 
                               beep_type: str, index_number: Optional[str], message: str) -> None:
     """Log a room recognition attempt."""
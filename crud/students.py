@@ -1,5 +1,7 @@
 from models.database import supabase
 from schemas.students import StudentCreate, StudentUpdate, Student
+from services.face_gallery import embedding_columns, refresh_gallery_student, remove_gallery_student
+from core.config import settings
 from fastapi import HTTPException, status
 from typing import Optional, List
 from uuid import UUID
@@ -26,13 +28,12 @@ async def create_student(student: StudentCreate, face_embedding: Optional[List[f
             data["department_id"] = str(data["department_id"])
             
         # CRITICAL: face_embedding is NOT NULL in database
-        # If no face embedding provided, use an empty array instead of None
+        # embedding_columns() stores an empty array instead of None when there is no embedding
+        data.update(embedding_columns(face_embedding))
         if face_embedding is None:
-            data["face_embedding"] = []  # Empty array instead of None
             logger.info("No face embedding provided, using empty array")
         else:
-            data["face_embedding"] = face_embedding
-            logger.info("Face embedding provided, using actual embedding")
+            logger.info(f"Face embedding provided, storing as {settings.FACE_EMBEDDING_FORMAT}")
         
         logger.info(f"Creating student with data: {data}")
         response = supabase.table("students").insert(data).execute()
@@ -40,6 +41,7 @@ async def create_student(student: StudentCreate, face_embedding: Optional[List[f
         if not response.data:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to create student")
         logger.info(f"Created student with ID: {response.data[0]['id']} {'with' if face_embedding else 'without'} face embedding")
+        refresh_gallery_student(response.data[0])
         return Student(**response.data[0])
     except Exception as e:
         error_str = str(e)
@@ -112,6 +114,7 @@ async def update_student(student_id: UUID, student: StudentUpdate) -> Student:
         if not response.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Student not found")
         logger.info(f"Updated student with ID: {student_id}")
+        refresh_gallery_student(response.data[0])
         return Student(**response.data[0])
     except Exception as e:
         logger.error(f"Error updating student {student_id}: {str(e)}")
@@ -124,6 +127,7 @@ async def delete_student(student_id: UUID) -> None:
         if not response.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Student not found")
         logger.info(f"Deleted student with ID: {student_id}")
+        remove_gallery_student(student_id)
     except Exception as e:
         logger.error(f"Error deleting student {student_id}: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
\ No newline at end of file
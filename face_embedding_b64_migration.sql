@@ -0,0 +1,10 @@
+-- Migration to store face embeddings compactly as base64-encoded float32 bytes
+-- Run this on your Supabase database, then backfill existing rows with:
+--     python migrate_face_embeddings.py
+-- and only then set FACE_EMBEDDING_FORMAT to "base64" on the API workers (the default is "json").
+
+-- 128 little-endian float32 values = 512 bytes = 684 base64 characters,
+-- roughly a quarter of the same embedding serialized as a JSON float list
+ALTER TABLE students ADD COLUMN IF NOT EXISTS face_embedding_b64 TEXT;
+
+COMMENT ON COLUMN students.face_embedding_b64 IS 'Face embedding as base64 of 128 little-endian float32 values; face_embedding keeps an empty array once this is set';
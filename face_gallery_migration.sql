@@ -0,0 +1,26 @@
+-- Migration to support the in-memory face gallery delta sync
+-- Run this on your Supabase database
+
+-- Track when each student row last changed so API workers can fetch only new or updated embeddings
+ALTER TABLE students ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+UPDATE students SET updated_at = COALESCE(created_at, NOW()) WHERE updated_at IS NULL;
+
+-- Delta syncs filter and order on updated_at
+CREATE INDEX IF NOT EXISTS idx_students_updated_at ON students(updated_at);
+
+COMMENT ON COLUMN students.updated_at IS 'Last modification time; watermark for face gallery delta syncs';
+
+-- Function to update updated_at timestamp (shared with exam_rooms)
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+-- Trigger to automatically update updated_at
+DROP TRIGGER IF EXISTS update_students_updated_at ON students;
+CREATE TRIGGER update_students_updated_at
+    BEFORE UPDATE ON students
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -3,9 +3,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from fastapi.security import HTTPBearer
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from api.routers import students, auth, admin, colleges, departments, exam_rooms
+from services.face_recognition import cleanup_face_recognition
+from services.warmup import warm_up, warmup_state
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 # Configure logging
@@ -15,8 +18,18 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Application startup")
+    # Warm up in the background so liveness checks answer at once; /ready reports when it is done
+    warmup_task = asyncio.create_task(warm_up())
     yield
-    # You can add shutdown logic here if needed
+    for task in (warmup_task, warmup_state.gallery_task):
+        if task is None:
+            continue
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    cleanup_face_recognition()
 
 # Custom OpenAPI schema
 def custom_openapi():
@@ -93,6 +106,7 @@ Format: `Bearer <your-access-token>`
             # Public endpoints (no auth required)
             public_endpoints = [
                 ("/", "get"),
+                ("/ready", "get"),
                 ("/auth/register", "post"),
                 ("/auth/verify-otp", "post"),
                 ("/auth/login", "post"),
@@ -334,3 +348,11 @@ async def root():
     """Root endpoint for health check."""
     logger.info("Root endpoint accessed")
     return {"message": "🎓 KNUST Student Registration and Recognition System - API is running! 🚀"}
+
+@app.get("/ready", tags=["❤️ Health"])
+async def ready():
+    """Readiness probe: 503 until the startup warm-up has finished, then the warm-up timings."""
+    report = warmup_state.report()
+    if not report["ready"]:
+        return JSONResponse(status_code=503, content={"message": "Warming up", **report})
+    return {"message": "Ready", **report}
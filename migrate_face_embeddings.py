@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Backfill face_embedding_b64 from the legacy JSON face_embedding column.
+
+Run after face_embedding_b64_migration.sql and before switching the API to
+FACE_EMBEDDING_FORMAT="base64". Each converted row stores its embedding as
+base64 float32 and keeps an empty array in face_embedding (the column is NOT
+NULL). Rows that already have face_embedding_b64 are left alone, so the script
+can be re-run safely.
+
+Usage: python migrate_face_embeddings.py [--dry-run] [--keep-json]
+"""
+import argparse
+import json
+from typing import Optional
+
+from core.supabase import supabase
+from services.face_gallery import GALLERY_PAGE_SIZE, parse_embedding
+from services.face_index import encode_embedding
+
+
+def fetch_pending(after_id: Optional[str] = None):
+    """The next page of students, by id, that still only have the JSON embedding."""
+    query = supabase.table("students").select("id, face_embedding").is_("face_embedding_b64", "null")
+    if after_id is not None:
+        # Keyset pagination: converted rows leave the filter and skipped ones stay, so offsets would drift
+        query = query.gt("id", after_id)
+    return query.order("id").limit(GALLERY_PAGE_SIZE).execute().data or []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--keep-json", action="store_true", help="leave the JSON face_embedding in place")
+    args = parser.parse_args()
+
+    converted = skipped = json_bytes = b64_bytes = 0
+    last_id = None
+    while True:
+        rows = fetch_pending(last_id)
+        if not rows:
+            break
+        for row in rows:
+            vector = parse_embedding(row.get("face_embedding"))
+            if vector is None:
+                skipped += 1
+                continue
+            encoded = encode_embedding(vector)
+            json_bytes += len(json.dumps(row["face_embedding"]))
+            b64_bytes += len(encoded)
+            converted += 1
+            if args.dry_run:
+                continue
+            update = {"face_embedding_b64": encoded}
+            if not args.keep_json:
+                update["face_embedding"] = []
+            supabase.table("students").update(update).eq("id", row["id"]).execute()
+        if len(rows) < GALLERY_PAGE_SIZE:
+            break
+        last_id = rows[-1]["id"]
+
+    print(f"{'Would convert' if args.dry_run else 'Converted'} {converted} embeddings, "
+          f"skipped {skipped} rows without a usable embedding")
+    if converted:
+        print(f"Embedding payload: {json_bytes:,} bytes as JSON -> {b64_bytes:,} bytes as base64 "
+              f"({json_bytes / b64_bytes:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
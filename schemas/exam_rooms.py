@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 from uuid import UUID
 from datetime import datetime
 
@@ -47,6 +47,17 @@ class RoomRecognitionRequest(BaseModel):
     face_image: str  # Base64 encoded image
     room_code: str   # Room identifier
 
+class BatchRoomRecognitionRequest(BaseModel):
+    """Schema for recognizing a burst of frames captured in one room."""
+    face_images: List[str]  # Base64 encoded images, in capture order
+    room_code: str   # Room identifier
+
+class RoomVerificationRequest(BaseModel):
+    """Schema for 1:1 verification of a face against a claimed index number."""
+    face_image: str  # Base64 encoded image
+    room_code: str   # Room identifier
+    index_number: str  # Index number the student claims, e.g. from an ID card scan
+
 class RecognitionValidationResponse(BaseModel):
     """Schema for recognition validation response."""
     status: str  # "valid" or "invalid"
@@ -58,3 +69,11 @@ class RecognitionValidationResponse(BaseModel):
     room_name: Optional[str] = None
     message: str
     timestamp: datetime
+    distance: Optional[float] = None  # Face distance to the matched student
+    margin: Optional[float] = None  # Distance gap to the runner-up candidate
+    needs_retake: bool = False  # Ambiguous match; kiosk should capture a new frame
+    is_match: Optional[bool] = None  # 1:1 verification only: whether the face matches the claimed student
+
+class FaceValidationResponse(RecognitionValidationResponse):
+    """Validation result for one face of a multi-face frame."""
+    face_location: List[int]  # [top, right, bottom, left] in image coordinates
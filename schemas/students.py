@@ -85,4 +85,25 @@ class FaceDetectionResponse(BaseModel):
     face_locations: List[List[int]]  # [(top, right, bottom, left), ...]
     image_dimensions: Tuple[int, int]  # (width, height)
     face_encodings: Optional[List[List[float]]] = None
-    error: Optional[str] = None
\ No newline at end of file
+    error: Optional[str] = None
+
+class RecognitionCandidate(BaseModel):
+    """Schema for a single gallery match."""
+    student_id: UUID
+    index_number: Optional[str] = None
+    distance: float
+    confidence: float
+
+class RecognitionCandidates(BaseModel):
+    """Schema for top-k recognition results from one gallery pass."""
+    candidates: List[RecognitionCandidate] = []
+    best_distance: Optional[float] = None
+    margin: Optional[float] = None  # Distance gap between the first and second candidates
+    is_match: bool = False
+    is_ambiguous: bool = False  # Matched, but too close to the runner-up; ask for a retake
+
+class BatchRecognitionResult(RecognitionCandidates):
+    """Schema for one image's result in a batch recognition request."""
+    image_index: int
+    filename: Optional[str] = None
+    error: Optional[str] = None
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Replay a directory of frames against the exam-room recognition stream.
+
+Frames are sent as binary messages at a fixed rate, like a camera would, while
+results are printed as the server pushes them back. Sending faster than the
+server can recognize shows latest-frame-wins dropping in action.
+
+Usage: python scripts/replay_exam_room_stream.py ROOM_CODE FRAME_DIR [--fps 10] [--url ws://localhost:8000]
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import websockets
+
+FRAME_SUFFIXES = {".jpg", ".jpeg", ".png"}
+
+
+async def send_frames(websocket, frames, fps: float):
+    interval = 1.0 / fps if fps > 0 else 0
+    for path in frames:
+        await websocket.send(path.read_bytes())
+        print(f"→ sent {path.name}")
+        await asyncio.sleep(interval)
+
+
+async def receive_results(websocket, started: float):
+    async for message in websocket:
+        result = json.loads(message)
+        elapsed = time.perf_counter() - started
+        student = result.get("student_name") or result.get("index_number") or "-"
+        print(
+            f"← [{elapsed:6.2f}s] frame {result.get('frame')}: {result.get('status')} "
+            f"({result.get('beep_type')}) {student} - {result.get('message')} "
+            f"[dropped so far: {result.get('dropped_frames')}]"
+        )
+
+
+async def replay(url: str, room_code: str, frames, fps: float, linger: float):
+    async with websockets.connect(f"{url}/exam-room/stream/{room_code}", max_size=None) as websocket:
+        started = time.perf_counter()
+        receiver = asyncio.create_task(receive_results(websocket, started))
+        await send_frames(websocket, frames, fps)
+        # Give the server time to push the result for the last frame
+        try:
+            await asyncio.wait_for(asyncio.shield(receiver), timeout=linger)
+        except asyncio.TimeoutError:
+            pass
+        receiver.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("room_code")
+    parser.add_argument("frame_dir", type=Path)
+    parser.add_argument("--fps", type=float, default=10.0, help="frames per second to send (0 sends as fast as possible)")
+    parser.add_argument("--url", default="ws://localhost:8000")
+    parser.add_argument("--linger", type=float, default=5.0, help="seconds to wait for results after the last frame")
+    args = parser.parse_args()
+
+    frames = sorted(path for path in args.frame_dir.iterdir() if path.suffix.lower() in FRAME_SUFFIXES)
+    if not frames:
+        raise SystemExit(f"No JPEG/PNG frames found in {args.frame_dir}")
+
+    print(f"Replaying {len(frames)} frames to room {args.room_code} at {args.fps} fps")
+    asyncio.run(replay(args.url, args.room_code, frames, args.fps, args.linger))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, status
+
+# Workload classes and their priority (lower runs first), one bounded waiting line each:
+# - room: exam-room recognition (kiosk requests, room batches and camera streams)
+# - batch: recognition outside an exam room, single or batch uploads
+# - registration: embeddings extracted while registering or creating a student
+# - preview: face detection previews shown before registration
+WORKLOAD_PRIORITIES = {"room": 0, "batch": 1, "registration": 1, "preview": 2}
+
+# Recent waits kept per class for the wait-time gauges
+WAIT_SAMPLES = 1024
+
+# Smoothing factor of the moving average of job run time used for wait estimates
+SERVICE_TIME_SMOOTHING = 0.2
+
+
+class FaceJobRejected(HTTPException):
+    """A face job that was not run, or not run to completion, for lack of capacity or time."""
+
+
+class FaceQueueFull(FaceJobRejected):
+    """503 raised when a workload class has no room left for another face job."""
+
+    def __init__(self, workload: str, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Face processing is busy ({workload} queue full). Please retry in {retry_after}s",
+            headers={"Retry-After": str(retry_after)},
+        )
+        self.workload = workload
+        self.retry_after = retry_after
+
+
+class FaceJobExpired(FaceJobRejected):
+    """504 raised when a face job's deadline passes, or its client leaves, before it finishes."""
+
+    def __init__(self, stage: str):
+        super().__init__(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Face processing timed out ({stage}). Please try again",
+        )
+        self.stage = stage
+
+
+class Deadline:
+    """
+    Time budget of one request, passed along with each of its face jobs.
+
+    expires_at is a time.time() timestamp so it can be handed to worker
+    processes. is_disconnected, when given, is polled to drop the work of
+    clients that have already gone (Request.is_disconnected for HTTP routes).
+    """
+
+    def __init__(self, timeout: float, is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None):
+        self.expires_at = time.time() + timeout
+        self.is_disconnected = is_disconnected
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.time())
+
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    async def abandoned(self) -> Optional[str]:
+        """Why nobody is waiting for this work any more ("expired" or "disconnected"), or None."""
+        if self.expired():
+            return "expired"
+        if self.is_disconnected is not None and await self.is_disconnected():
+            return "disconnected"
+        return None
+
+
+class WorkloadQueue:
+    """Limit and gauges of one workload class."""
+
+    def __init__(self, name: str, limit: int, priority: int):
+        self.name = name
+        self.limit = limit
+        self.priority = priority
+        self.waiting = 0
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+    def stats(self) -> Dict:
+        waits_ms = sorted(wait * 1000 for wait in self.waits)
+        return {
+            "limit": self.limit,
+            "priority": self.priority,
+            "queue_depth": self.waiting,
+            "running": self.running,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "mean_wait_ms": round(sum(waits_ms) / len(waits_ms), 2) if waits_ms else None,
+            "p50_wait_ms": _percentile(waits_ms, 50),
+            "p99_wait_ms": _percentile(waits_ms, 99),
+            "max_wait_ms": round(waits_ms[-1], 2) if waits_ms else None,
+        }
+
+
+class AdmissionController:
+    """
+    Bounded per-class waiting lines in front of `slots` worker slots.
+
+    limits caps how many jobs of each class may wait for a slot; a job that
+    finds a free slot is always admitted. max_wait (seconds, 0 disables)
+    additionally rejects jobs whose estimated wait is already too long.
+    priorities maps each class to its level (lower runs first, default
+    WORKLOAD_PRIORITIES); waiting jobs are started most urgent level first and
+    round-robin per room within a level.
+    """
+
+    def __init__(self, slots: int, limits: Dict[str, int], max_wait: float = 0.0,
+                 initial_service_time: float = 0.25, priorities: Optional[Dict[str, int]] = None):
+        priorities = priorities or WORKLOAD_PRIORITIES
+        self.slots = slots
+        self.max_wait = max_wait
+        self.queues = {name: WorkloadQueue(name, limit, priorities[name]) for name, limit in limits.items()}
+        self._free = slots
+        # priority level -> fairness key -> waiting futures; keys rotate to the back once served
+        self._waiters: Dict[int, "OrderedDict[str, deque]"] = {
+            level: OrderedDict() for level in sorted(set(priorities[name] for name in limits))
+        }
+        self.service_time = initial_service_time
+        # Wasted-work counters: jobs dropped before they started, aborted per stage, finished too late
+        self.dropped = {"expired": 0, "disconnected": 0}
+        self.aborted: Dict[str, int] = {}
+        self.completed_late = 0
+        self.wasted_seconds = 0.0
+
+    def _waiting_ahead(self, priority: int) -> int:
+        """Jobs that would start before a new job of the given priority."""
+        return sum(queue.waiting for queue in self.queues.values() if queue.priority <= priority)
+
+    def estimated_wait(self, priority: Optional[int] = None) -> float:
+        """Seconds a job submitted now would wait for a slot (at the lowest priority if none is given)."""
+        if self._free > 0:
+            return 0.0
+        if priority is None:
+            priority = max(self._waiters)
+        # Everyone ahead goes first, then one of the running jobs has to finish
+        return (self._waiting_ahead(priority) // self.slots + 1) * self.service_time
+
+    def _check(self, queue: WorkloadQueue) -> None:
+        if self._free > 0:
+            return
+        estimate = self.estimated_wait(queue.priority)
+        if queue.waiting >= queue.limit or (self.max_wait and estimate > self.max_wait):
+            queue.rejected += 1
+            raise FaceQueueFull(queue.name, max(1, math.ceil(estimate)))
+
+    async def _acquire(self, priority: int, key: str) -> None:
+        if self._free > 0:
+            self._free -= 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        lines = self._waiters[priority]
+        lines.setdefault(key, deque()).append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the caller gave up; pass it on
+                self._release()
+            else:
+                line = lines.get(key)
+                if line is not None and waiter in line:
+                    line.remove(waiter)
+                    if not line:
+                        del lines[key]
+            raise
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        for lines in self._waiters.values():
+            while lines:
+                key, line = next(iter(lines.items()))
+                waiter = line.popleft()
+                if line:
+                    lines.move_to_end(key)
+                else:
+                    del lines[key]
+                if not waiter.done():
+                    return waiter
+        return None
+
+    def _release(self) -> None:
+        waiter = self._next_waiter()
+        if waiter is not None:
+            waiter.set_result(None)
+        else:
+            self._free += 1
+
+    def record_dropped(self, reason: str) -> None:
+        self.dropped[reason] = self.dropped.get(reason, 0) + 1
+
+    def record_aborted(self, stage: str, seconds: float) -> None:
+        """A job stopped part-way because its deadline passed; seconds is the time it had already run."""
+        self.aborted[stage] = self.aborted.get(stage, 0) + 1
+        self.wasted_seconds += seconds
+
+    def record_late(self, seconds: float) -> None:
+        """A job ran to completion for a request that had already expired or disconnected."""
+        self.completed_late += 1
+        self.wasted_seconds += seconds
+
+    @asynccontextmanager
+    async def admit(self, workload: str, room_code: Optional[str] = None,
+                    deadline: Optional[Deadline] = None) -> AsyncIterator[None]:
+        """
+        Hold a worker slot for the body, or raise FaceQueueFull when the class is over budget.
+
+        room_code is the fairness key within the class's priority level; work
+        outside a room shares one key per class. With a deadline the job is
+        dropped with FaceJobExpired if it expires while waiting, or if it has
+        expired or its client has disconnected by the time a slot is free.
+        """
+        queue = self.queues[workload]
+        if deadline is not None and deadline.expired():
+            self.record_dropped("expired")
+            raise FaceJobExpired("queued")
+        self._check(queue)
+
+        queue.waiting += 1
+        queued_at = time.perf_counter()
+        try:
+            acquire = self._acquire(queue.priority, f"{workload}:{room_code or ''}")
+            if deadline is not None:
+                await asyncio.wait_for(acquire, deadline.remaining())
+            else:
+                await acquire
+        except asyncio.TimeoutError:
+            self.record_dropped("expired")
+            raise FaceJobExpired("queued")
+        finally:
+            queue.waiting -= 1
+        started = time.perf_counter()
+        queue.waits.append(started - queued_at)
+
+        try:
+            reason = await deadline.abandoned() if deadline is not None else None
+        except BaseException:
+            self._release()
+            raise
+        if reason is not None:
+            self.record_dropped(reason)
+            self._release()
+            raise FaceJobExpired("queued")
+
+        queue.admitted += 1
+        queue.running += 1
+        try:
+            yield
+        finally:
+            queue.running -= 1
+            self.service_time += SERVICE_TIME_SMOOTHING * (time.perf_counter() - started - self.service_time)
+            self._release()
+
+    def stats(self) -> Dict:
+        return {
+            "slots": self.slots,
+            "free_slots": self._free,
+            "estimated_wait_ms": round(self.estimated_wait() * 1000, 1),
+            "mean_service_ms": round(self.service_time * 1000, 1),
+            "classes": {name: queue.stats() for name, queue in self.queues.items()},
+            "wasted_work": {
+                "dropped_before_start": dict(self.dropped),
+                "aborted_by_stage": dict(self.aborted),
+                "completed_late": self.completed_late,
+                "wasted_ms": round(self.wasted_seconds * 1000, 1),
+            },
+        }
+
+
+def _percentile(sorted_values: List[float], percent: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list, rounded for reporting."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return round(sorted_values[rank - 1], 2)
@@ -0,0 +1,102 @@
+"""
+Content-hash cache of face pipeline results.
+
+Kiosks and the registration page often resubmit identical bytes (retries,
+double-clicks, a detection preview followed by registration with the same
+photo). Caching the detection boxes and embeddings per upload lets those
+submissions skip decoding, HOG detection and the ResNet encoder entirely.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+# Rough per-entry cost of the dict, tuples and key besides the embeddings themselves
+ENTRY_OVERHEAD_BYTES = 512
+
+
+class EmbeddingCache:
+    """
+    LRU cache of pipeline analyses keyed by a blake2b hash of the upload bytes.
+
+    The cache is bounded by an estimated memory budget rather than an entry
+    count: least recently used entries are evicted until the new entry fits.
+    Cached embeddings are made read-only, since every hit shares them.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(image_data: bytes, *options) -> str:
+        """Hash the upload bytes together with the pipeline options that shaped the result."""
+        digest = hashlib.blake2b(image_data, digest_size=16).hexdigest()
+        return f"{digest}:{':'.join(str(option) for option in options)}" if options else digest
+
+    @staticmethod
+    def entry_size(analysis: Dict) -> int:
+        encodings = sum(np.asarray(encoding).nbytes for encoding in analysis.get("face_encodings", []))
+        return ENTRY_OVERHEAD_BYTES + encodings + 64 * len(analysis.get("face_locations", []))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a cached analysis and mark it most recently used, counting the hit or miss."""
+        with self._lock:
+            analysis = self._entries.get(key)
+            if analysis is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return analysis
+
+    def put(self, key: str, analysis: Dict) -> None:
+        """Store an analysis, evicting least recently used entries to stay within the budget."""
+        size = self.entry_size(analysis)
+        if size > self.max_bytes:
+            return
+        for encoding in analysis.get("face_encodings", []):
+            if isinstance(encoding, np.ndarray):
+                encoding.setflags(write=False)
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._sizes.pop(key)
+                del self._entries[key]
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                self.current_bytes -= self._sizes.pop(evicted)
+                self.evictions += 1
+            self._entries[key] = analysis
+            self._sizes[key] = size
+            self.current_bytes += size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict:
+        """Counters for the admin dashboard."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "current_bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0,
+        }
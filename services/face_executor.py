@@ -0,0 +1,169 @@
+"""
+Executors for CPU-bound face work.
+
+The image pipeline (validation, decode, detection, encoding) runs either on a
+thread pool or on a process pool, selected by FACE_EXECUTOR_MODE. Gallery
+matching always stays on the thread pool: numpy releases the GIL during the
+matrix product, and shipping the gallery to other processes would cost more
+than the search itself.
+
+In process mode workers are forked from a forkserver that has already imported
+the face pipeline, so the dlib models are loaded once and shared copy-on-write.
+Image bytes reach the workers through shared memory instead of being pickled.
+"""
+import asyncio
+import functools
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Optional
+
+from core.config import settings
+from services import face_pipeline
+from services.face_admission import AdmissionController, Deadline, FaceJobExpired
+
+logger = logging.getLogger(__name__)
+
+# face_recognition is listed explicitly since face_pipeline only imports it on first use
+PIPELINE_MODULES = ["services.face_pipeline", "face_recognition"]
+
+
+def _init_worker() -> None:
+    """Process-pool initializer; a no-op when the models were preloaded by the forkserver."""
+    face_pipeline.load_models()
+
+
+def create_pipeline_executor(mode: str, max_workers: int) -> Executor:
+    """Create the executor for image pipeline jobs: a thread pool or a process pool."""
+    if mode == "process":
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            # Import the pipeline (and with it the dlib models) once in the forkserver
+            context.set_forkserver_preload(PIPELINE_MODULES)
+        else:
+            context = multiprocessing.get_context("spawn")
+        logger.info(f"Face pipeline running on a process pool with {max_workers} workers ({context.get_start_method()})")
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=_init_worker)
+    if mode != "thread":
+        logger.warning(f"Unknown FACE_EXECUTOR_MODE '{mode}', falling back to threads")
+    return ThreadPoolExecutor(max_workers=max_workers)
+
+
+# Thread pool for CPU-intensive face recognition tasks
+face_recognition_executor = ThreadPoolExecutor(max_workers=settings.MAX_WORKERS)
+
+if settings.FACE_EXECUTOR_MODE == "process":
+    face_pipeline_executor = create_pipeline_executor("process", settings.MAX_WORKERS)
+else:
+    face_pipeline_executor = face_recognition_executor
+
+
+# Bounded per-class waiting lines and the priority scheduler in front of the pipeline workers
+face_admission = AdmissionController(
+    settings.MAX_WORKERS,
+    {
+        "room": settings.FACE_QUEUE_ROOM_LIMIT,
+        "batch": settings.FACE_QUEUE_BATCH_LIMIT,
+        "registration": settings.FACE_QUEUE_REGISTRATION_LIMIT,
+        "preview": settings.FACE_QUEUE_PREVIEW_LIMIT,
+    },
+    settings.FACE_QUEUE_MAX_WAIT,
+)
+
+
+def _run_from_shared_memory(fn: Callable, name: str, size: int, *args) -> Any:
+    """
+    Worker side of run_pipeline_job: read the image from shared memory and run fn on it.
+
+    Workers share the parent's resource tracker, so attaching here does not take
+    ownership; the parent unlinks the block once the job finishes.
+    """
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        image_data = bytes(block.buf[:size])
+    finally:
+        block.close()
+    return fn(image_data, *args)
+
+
+async def run_pipeline_job(fn: Callable, image_data: bytes, *args, executor: Executor = None,
+                           workload: Optional[str] = None, room_code: Optional[str] = None,
+                           deadline: Optional[Deadline] = None, **kwargs) -> Any:
+    """
+    Run fn(image_data, *args, **kwargs) on the pipeline executor.
+
+    fn must be a module-level function from services.face_pipeline so that it
+    can be sent to worker processes by reference. With a workload class the job
+    first goes through admission control (see face_admission): it waits for a
+    worker slot by priority, fairly across rooms, or is rejected with
+    FaceQueueFull instead of queueing on the executor.
+
+    With a deadline, fn also receives deadline= as a time.time() timestamp and
+    may raise face_pipeline.DeadlineExceeded between stages; that, or a job
+    dropped before it started, surfaces as FaceJobExpired.
+    """
+    if workload is None or executor is not None:
+        return await _run_pipeline_job(fn, image_data, *args, executor=executor, **kwargs)
+
+    async with face_admission.admit(workload, room_code, deadline):
+        if deadline is None:
+            return await _run_pipeline_job(fn, image_data, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            result = await _run_pipeline_job(fn, image_data, *args, deadline=deadline.expires_at, **kwargs)
+        except face_pipeline.DeadlineExceeded as e:
+            face_admission.record_aborted(e.stage, time.perf_counter() - started)
+            raise FaceJobExpired(e.stage)
+        if await deadline.abandoned():
+            face_admission.record_late(time.perf_counter() - started)
+        return result
+
+
+async def _run_pipeline_job(fn: Callable, image_data: bytes, *args, executor: Executor = None, **kwargs) -> Any:
+    executor = executor or face_pipeline_executor
+    if kwargs:
+        fn = functools.partial(fn, **kwargs)
+    loop = asyncio.get_event_loop()
+    if not isinstance(executor, ProcessPoolExecutor):
+        return await loop.run_in_executor(executor, fn, image_data, *args)
+
+    block = shared_memory.SharedMemory(create=True, size=max(1, len(image_data)))
+    try:
+        block.buf[:len(image_data)] = image_data
+        return await loop.run_in_executor(
+            executor, _run_from_shared_memory, fn, block.name, len(image_data), *args
+        )
+    finally:
+        block.close()
+        block.unlink()
+
+
+async def warm_up_executors() -> bool:
+    """
+    Start every executor worker and run one dummy inference in each pipeline worker.
+
+    Both pools create their threads or processes lazily, so without this the
+    first requests after a deploy also pay for worker start-up. Returns False
+    if the face models are unavailable.
+    """
+    loop = asyncio.get_event_loop()
+    # One job per worker, submitted together, so each starts its own thread or process
+    results = await asyncio.gather(*[
+        loop.run_in_executor(face_pipeline_executor, face_pipeline.warm_up_models)
+        for _ in range(settings.MAX_WORKERS)
+    ])
+    if face_pipeline_executor is not face_recognition_executor:
+        await asyncio.gather(*[
+            loop.run_in_executor(face_recognition_executor, face_pipeline.load_models)
+            for _ in range(settings.MAX_WORKERS)
+        ])
+    return all(results)
+
+
+def shutdown_face_executors() -> None:
+    """Shut down the pipeline and matching executors."""
+    if face_pipeline_executor is not face_recognition_executor:
+        face_pipeline_executor.shutdown(wait=True)
+    face_recognition_executor.shutdown(wait=True)
@@ -0,0 +1,495 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.supabase import supabase
+from services.face_index import EMBEDDING_DIMENSION, FaceIndex, IndexSnapshot, decode_embedding, encode_embedding
+from services.gallery_events import GalleryEvent, create_change_feed
+from services.gallery_snapshot import (
+    SnapshotError, read_snapshot, snapshot_generation, snapshot_write_lock, write_snapshot
+)
+
+logger = logging.getLogger(__name__)
+
+# Supabase/PostgREST caps a single select at 1000 rows by default, so the
+# gallery is always fetched page by page.
+GALLERY_PAGE_SIZE = 1000
+
+
+def gallery_columns() -> str:
+    """
+    Columns fetched for the gallery.
+
+    base64 mode also fetches the JSON column, so a row the backfill has not
+    converted yet still reaches recognition through row_embedding's fallback;
+    converted rows keep an empty array there, which costs a few bytes each.
+    """
+    if settings.FACE_EMBEDDING_FORMAT == "base64":
+        return "id, index_number, face_embedding_b64, face_embedding, updated_at"
+    return "id, index_number, face_embedding, updated_at"
+
+
+def index_options() -> dict:
+    """FaceIndex settings for the gallery's search precision."""
+    return {"quantization": settings.FACE_GALLERY_QUANTIZATION, "rerank": settings.FACE_QUANTIZED_RERANK}
+
+
+def parse_embedding(raw) -> Optional[np.ndarray]:
+    """Convert a stored face_embedding JSON list into a float32 vector, or None if unusable."""
+    if raw is None or len(raw) == 0:
+        return None
+    try:
+        vector = np.asarray(raw, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None
+    if vector.shape != (EMBEDDING_DIMENSION,):
+        return None
+    return vector
+
+
+def row_embedding(row: dict) -> Optional[np.ndarray]:
+    """Embedding of a student row in the configured storage format, falling back to the JSON list."""
+    if settings.FACE_EMBEDDING_FORMAT == "base64":
+        vector = decode_embedding(row.get("face_embedding_b64"))
+        if vector is not None:
+            return vector
+    return parse_embedding(row.get("face_embedding"))
+
+
+def embedding_columns(embedding) -> dict:
+    """Column values that store an embedding in the configured format. None or empty clears it."""
+    empty = embedding is None or len(embedding) == 0
+    if settings.FACE_EMBEDDING_FORMAT == "base64":
+        # face_embedding is NOT NULL in the database, so the legacy JSON column keeps an empty array
+        return {"face_embedding": [], "face_embedding_b64": None if empty else encode_embedding(embedding)}
+    return {"face_embedding": [] if empty else [float(value) for value in embedding]}
+
+
+class FaceGallery:
+    """
+    Process-resident copy of every registered face embedding.
+
+    Embeddings live in a FaceIndex (contiguous float32 buffers plus an id array)
+    that absorbs single-student writes in O(1) amortized time. Recognition threads
+    search an IndexSnapshot, so they never observe a half-applied write.
+
+    With FACE_GALLERY_SNAPSHOT_PATH set, the bulk of the gallery is a memory-mapped
+    snapshot file shared by every worker on the host, and only changes since the
+    file's watermark live in private memory.
+    """
+
+    def __init__(self):
+        self._write_lock = threading.Lock()
+        self._index = FaceIndex(**index_options())
+        self._index_numbers: Dict[str, str] = {}
+        self._watermark: Optional[str] = None
+        self._loaded = False
+        self._last_full_load = 0.0
+        # Serializes the first load, so concurrent first requests share one fetch
+        self._load_lock = asyncio.Lock()
+        # Bumped on every change; room sub-galleries are rebuilt when it moves
+        self._version = 0
+        self._room_snapshots: Dict[Tuple[str, str], Tuple[int, IndexSnapshot]] = {}
+        # Identity, watermark and size of the snapshot file last mapped or written
+        self._snapshot_generation: Optional[Tuple[int, int]] = None
+        self._snapshot_watermark: Optional[str] = None
+        self._snapshot_count = -1
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def is_memory_mapped(self) -> bool:
+        return self._index.has_base
+
+    @property
+    def watermark(self) -> Optional[str]:
+        """Latest students.updated_at value applied to the gallery."""
+        return self._watermark
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def snapshot(self) -> IndexSnapshot:
+        """Capture a consistent view of the gallery for searching."""
+        return self._index.snapshot()
+
+    def room_snapshot(self, index_start: str, index_end: str) -> IndexSnapshot:
+        """
+        Snapshot of only the students whose index numbers fall in [index_start, index_end].
+
+        Index numbers compare as strings, like validate_student_in_room; they are the
+        index's row labels, so rows are selected without a per-row lookup. The
+        sub-gallery is cached per range until the gallery next changes.
+        """
+        key = (index_start, index_end)
+        version = self._version
+        cached = self._room_snapshots.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        snapshot = self._index.snapshot()
+        labels = snapshot.labels
+        room = snapshot.subset(np.flatnonzero(snapshot.alive & (labels >= index_start) & (labels <= index_end)))
+        self._room_snapshots[key] = (version, room)
+        return room
+
+    def get_embedding(self, student_id) -> Optional[np.ndarray]:
+        return self._index.get(student_id)
+
+    async def lookup_embedding(self, student_id) -> Optional[np.ndarray]:
+        """
+        One student's embedding for 1:1 verification.
+
+        Served from the gallery when it holds the student; otherwise the single
+        row is read from the database (the gallery may not be loaded yet, or not
+        have caught up with a fresh registration) without loading the gallery.
+        """
+        vector = self._index.get(student_id)
+        if vector is not None:
+            return vector
+        response = await asyncio.get_event_loop().run_in_executor(
+            None, lambda: supabase.table("students").select(gallery_columns()).eq("id", str(student_id)).execute()
+        )
+        return row_embedding(response.data[0]) if response.data else None
+
+    def get_index_number(self, student_id: str) -> Optional[str]:
+        return self._index_numbers.get(str(student_id))
+
+    def _advance_watermark(self, updated_at: Optional[str]) -> None:
+        if updated_at and (self._watermark is None or updated_at > self._watermark):
+            self._watermark = updated_at
+
+    def apply_rows(self, rows: Iterable[dict]) -> int:
+        """
+        Apply student rows (id, index_number, face_embedding[_b64], updated_at) to the gallery.
+
+        Rows with a usable embedding are inserted or replaced; rows whose embedding is
+        missing or invalid are removed. Rows that match what the gallery already holds
+        are skipped, so re-applying a row neither grows the index nor invalidates the
+        room sub-galleries. Returns the number of rows that changed the gallery.
+        """
+        changed = 0
+        with self._write_lock:
+            for row in rows:
+                student_id = str(row["id"])
+                self._advance_watermark(row.get("updated_at"))
+                vector = row_embedding(row)
+                if vector is None:
+                    self._index_numbers.pop(student_id, None)
+                    if self._index.remove(student_id):
+                        changed += 1
+                    continue
+                index_number = row.get("index_number") or self._index_numbers.get(student_id)
+                current = self._index.get(student_id)
+                if (current is not None and np.array_equal(current, vector)
+                        and index_number == self._index_numbers.get(student_id)):
+                    continue
+                if index_number:
+                    self._index_numbers[student_id] = index_number
+                self._index.add(student_id, vector, index_number or "")
+                changed += 1
+            if changed:
+                self._version += 1
+        return changed
+
+    def upsert(self, student_id, embedding, index_number: Optional[str] = None,
+               updated_at: Optional[str] = None) -> bool:
+        """Insert or replace one student's embedding. An empty embedding removes the student."""
+        return self.apply_rows([{
+            "id": student_id,
+            "index_number": index_number,
+            "face_embedding": embedding,
+            "updated_at": updated_at,
+        }]) > 0
+
+    def remove(self, student_id) -> bool:
+        """Drop a student from the gallery."""
+        with self._write_lock:
+            self._index_numbers.pop(str(student_id), None)
+            removed = self._index.remove(student_id)
+            if removed:
+                self._version += 1
+            return removed
+
+    def _fetch_rows(self, since: Optional[str] = None) -> List[dict]:
+        """Fetch gallery rows page by page, optionally only those updated since a watermark."""
+        rows: List[dict] = []
+        start = 0
+        while True:
+            query = supabase.table("students").select(gallery_columns())
+            if since:
+                # gte rather than gt so rows sharing the watermark timestamp are not missed; the
+                # watermark rows come back on every sync and apply_rows skips them as unchanged
+                query = query.gte("updated_at", since)
+            response = query.order("updated_at").order("id").range(start, start + GALLERY_PAGE_SIZE - 1).execute()
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < GALLERY_PAGE_SIZE:
+                return rows
+            start += GALLERY_PAGE_SIZE
+
+    async def load(self) -> int:
+        """Load the whole gallery from the database, replacing the current contents."""
+        started = time.perf_counter()
+        rows = await asyncio.get_event_loop().run_in_executor(None, self._fetch_rows)
+
+        ids: List[str] = []
+        labels: List[str] = []
+        matrix = np.empty((len(rows), EMBEDDING_DIMENSION), dtype=np.float32)
+        index_numbers: Dict[str, str] = {}
+        watermark: Optional[str] = None
+        base64_format = settings.FACE_EMBEDDING_FORMAT == "base64"
+        for row in rows:
+            updated_at = row.get("updated_at")
+            if updated_at and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+            vector = None
+            if base64_format:
+                # np.frombuffer over the decoded bytes, copied straight into the next matrix row
+                vector = decode_embedding(row.get("face_embedding_b64"), out=matrix[len(ids)])
+            if vector is None:
+                vector = parse_embedding(row.get("face_embedding"))
+                if vector is not None:
+                    matrix[len(ids)] = vector
+            if vector is None:
+                continue
+            student_id = str(row["id"])
+            ids.append(student_id)
+            labels.append(row.get("index_number") or "")
+            if row.get("index_number"):
+                index_numbers[student_id] = row["index_number"]
+
+        index = FaceIndex.from_vectors(ids, matrix[:len(ids)], labels, **index_options())
+        with self._write_lock:
+            self._index = index
+            self._index_numbers = index_numbers
+            self._watermark = watermark
+            self._loaded = True
+            self._last_full_load = time.monotonic()
+            self._version += 1
+            self._room_snapshots = {}
+
+        logger.info(
+            f"Face gallery loaded: {len(ids)} embeddings from {len(rows)} students "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        return len(ids)
+
+    async def load_snapshot(self, path: str) -> bool:
+        """Map a snapshot file in place of a full load. Returns False if there is no usable file."""
+        started = time.perf_counter()
+        loop = asyncio.get_event_loop()
+        generation = snapshot_generation(path)
+        try:
+            snapshot = await loop.run_in_executor(None, read_snapshot, path)
+        except FileNotFoundError:
+            return False
+        except SnapshotError as e:
+            logger.warning(f"Ignoring face gallery snapshot: {str(e)}")
+            return False
+
+        labels = [snapshot.index_numbers.get(student_id) or "" for student_id in snapshot.ids]
+        index = await loop.run_in_executor(
+            None, functools.partial(FaceIndex.from_base, snapshot.ids, snapshot.matrix, labels, **index_options())
+        )
+        with self._write_lock:
+            self._index = index
+            self._index_numbers = dict(snapshot.index_numbers)
+            self._watermark = snapshot.watermark
+            self._loaded = True
+            self._last_full_load = time.monotonic()
+            self._version += 1
+            self._room_snapshots = {}
+            self._snapshot_generation = generation
+            self._snapshot_watermark = snapshot.watermark
+            self._snapshot_count = len(index)
+
+        logger.info(
+            f"Face gallery mapped from snapshot: {len(index)} embeddings, watermark {snapshot.watermark}, "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        return True
+
+    def _write_snapshot(self, path: str) -> Optional[Tuple[int, int]]:
+        """Write the live gallery to path; returns (embeddings, bytes), or None if another worker holds the lock."""
+        with snapshot_write_lock(path) as acquired:
+            if not acquired:
+                return None
+            with self._write_lock:
+                snapshot = self._index.snapshot()
+                index_numbers = dict(self._index_numbers)
+                watermark = self._watermark
+            live = snapshot.subset(np.flatnonzero(snapshot.alive))
+            size = write_snapshot(path, list(live.ids), live.matcher.matrix, index_numbers, watermark)
+            self._snapshot_watermark = watermark
+            self._snapshot_count = len(live)
+            return len(live), size
+
+    async def save_snapshot(self, path: str) -> bool:
+        """Write the gallery to a snapshot file unless another worker is already doing so."""
+        written = await asyncio.get_event_loop().run_in_executor(None, self._write_snapshot, path)
+        if written is None:
+            return False
+        logger.info(f"Face gallery snapshot written: {written[0]} embeddings, {written[1]} bytes to {path}")
+        return True
+
+    async def refresh_snapshot(self, path: str) -> None:
+        """
+        Rewrite the snapshot if the gallery has moved past it, then map the newest file.
+
+        Mapping swaps a private copy (after a full reload or many delta syncs) for the
+        shared page-cache copy; changes since the file's watermark are synced on top.
+        """
+        if not self._loaded:
+            return
+        if (snapshot_generation(path) is None or self._watermark != self._snapshot_watermark
+                or len(self) != self._snapshot_count):
+            await self.save_snapshot(path)
+        generation = snapshot_generation(path)
+        if generation is not None and (generation != self._snapshot_generation or not self.is_memory_mapped):
+            if await self.load_snapshot(path):
+                await self.sync()
+
+    async def sync(self) -> int:
+        """Apply rows changed since the last watermark. Falls back to a full load if never loaded."""
+        if not self._loaded or self._watermark is None:
+            return await self.load()
+        rows = await asyncio.get_event_loop().run_in_executor(None, self._fetch_rows, self._watermark)
+        changed = self.apply_rows(rows)
+        if changed:
+            logger.info(f"Face gallery delta sync applied {changed} change(s); watermark {self._watermark}")
+        return changed
+
+    async def ensure_loaded(self) -> None:
+        """Load the gallery if it has not been loaded yet; concurrent callers wait for the same load."""
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if not self._loaded:
+                await self.load()
+
+    async def run_sync_loop(self, interval: int, full_reload_interval: int) -> None:
+        """
+        Keep the gallery fresh in the background.
+
+        Delta syncs on updated_at pick up inserts and updates from other processes.
+        Deletes leave no row behind, so a periodic full reload reconciles them.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if time.monotonic() - self._last_full_load >= full_reload_interval:
+                    await self.load()
+                else:
+                    await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Face gallery sync failed: {str(e)}")
+
+    async def run_snapshot_loop(self, path: str, interval: int) -> None:
+        """Periodically rewrite and re-map the shared snapshot file."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh_snapshot(path)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Face gallery snapshot refresh failed: {str(e)}")
+
+
+# Global gallery shared by all requests in this process
+face_gallery = FaceGallery()
+
+
+def apply_gallery_event(event: GalleryEvent) -> None:
+    """Apply another worker's change to the local gallery."""
+    if not settings.FACE_RECOGNITION_ENABLED:
+        # A CRUD-only worker never searches, so it keeps no gallery to update
+        return
+    if event.op == "delete":
+        face_gallery.remove(event.student_id)
+        return
+    # No updated_at: an event must not move the delta sync watermark past rows this worker has not seen
+    face_gallery.upsert(event.student_id, decode_embedding(event.embedding), event.index_number)
+
+
+# Publishes this worker's gallery writes and applies everyone else's; None when disabled
+change_feed = create_change_feed(
+    settings.FACE_GALLERY_CHANGE_FEED,
+    apply_gallery_event,
+    dsn=settings.FACE_GALLERY_CHANGE_FEED_DSN,
+    channel=settings.FACE_GALLERY_CHANGE_FEED_CHANNEL,
+    path=settings.FACE_GALLERY_CHANGE_FEED_PATH,
+)
+
+
+def refresh_gallery_student(row: dict) -> None:
+    """Apply a freshly written student row to the gallery and publish it to other workers, without failing the caller."""
+    try:
+        if settings.FACE_RECOGNITION_ENABLED:
+            # Without updated_at: only sync and load may move the delta sync watermark, or another
+            # worker's earlier write would be skipped until the next full reload
+            face_gallery.apply_rows([{**row, "updated_at": None}])
+        if change_feed is not None:
+            vector = row_embedding(row)
+            change_feed.publish(GalleryEvent(
+                op="upsert",
+                student_id=str(row["id"]),
+                index_number=row.get("index_number"),
+                embedding=encode_embedding(vector) if vector is not None else None,
+                updated_at=row.get("updated_at"),
+            ))
+    except Exception as e:
+        logger.warning(f"Could not refresh face gallery for student {row.get('id')}: {str(e)}")
+
+
+def remove_gallery_student(student_id) -> None:
+    """Remove a deleted student from the gallery and publish the removal, without failing the caller."""
+    try:
+        face_gallery.remove(student_id)
+        if change_feed is not None:
+            change_feed.publish(GalleryEvent(op="delete", student_id=str(student_id)))
+    except Exception as e:
+        logger.warning(f"Could not remove student {student_id} from face gallery: {str(e)}")
+
+
+async def _run_gallery_tasks(snapshot_path: str) -> None:
+    loops = []
+    if settings.FACE_RECOGNITION_ENABLED:
+        loops.append(face_gallery.run_sync_loop(settings.FACE_GALLERY_SYNC_INTERVAL,
+                                                settings.FACE_GALLERY_FULL_RELOAD_INTERVAL))
+        if snapshot_path:
+            loops.append(face_gallery.run_snapshot_loop(snapshot_path, settings.FACE_GALLERY_SNAPSHOT_INTERVAL))
+    # CRUD-only workers keep no gallery but still publish their student writes
+    if change_feed is not None:
+        loops.append(change_feed.run_forever())
+    if loops:
+        await asyncio.gather(*loops)
+
+
+async def start_gallery_sync() -> asyncio.Task:
+    """Preload the gallery, from the snapshot file when there is one, and start the background tasks."""
+    snapshot_path = settings.FACE_GALLERY_SNAPSHOT_PATH
+    if not settings.FACE_RECOGNITION_ENABLED:
+        return asyncio.create_task(_run_gallery_tasks(snapshot_path))
+    try:
+        if snapshot_path and await face_gallery.load_snapshot(snapshot_path):
+            await face_gallery.sync()
+        else:
+            await face_gallery.load()
+            if snapshot_path:
+                # First worker up writes the snapshot; everyone maps it
+                await face_gallery.refresh_snapshot(snapshot_path)
+    except Exception as e:
+        logger.error(f"Face gallery preload failed, will load on first recognition: {str(e)}")
+    return asyncio.create_task(_run_gallery_tasks(snapshot_path))
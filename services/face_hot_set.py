@@ -0,0 +1,104 @@
+"""
+Per-room hot set of recently recognized students.
+
+Students who were just recognized in a room are the most likely next
+matches: they re-enter after a break or linger in front of the camera. Each
+room keeps the gallery embeddings of its last few confident matches, and
+these are compared before the full gallery search. A hit close enough to be
+confident on its own skips that search entirely.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class RecentMatches:
+    """
+    LRU sets of the last `capacity` confirmed students per room key.
+
+    A lookup is a hit when the nearest recent student is within max_distance
+    and, if the room holds other recent students, at least min_margin closer
+    than the runner-up among them. max_distance should be tighter than the
+    recognition threshold, since a hit is never checked against the rest of
+    the gallery. Work outside a room shares the "" key.
+    """
+
+    def __init__(self, capacity: int, max_distance: float, min_margin: float, max_rooms: int = 1024):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self.min_margin = min_margin
+        self.max_rooms = max_rooms
+        self._rooms: "OrderedDict[str, OrderedDict[str, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def record(self, room: str, student_id: str, embedding: np.ndarray) -> None:
+        """Remember a confident match as the room's most recent one."""
+        if self.capacity <= 0:
+            return
+        embedding = np.asarray(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        with self._lock:
+            recent = self._rooms.get(room)
+            if recent is None:
+                recent = self._rooms[room] = OrderedDict()
+                while len(self._rooms) > self.max_rooms:
+                    self._rooms.popitem(last=False)
+            self._rooms.move_to_end(room)
+            recent[str(student_id)] = embedding
+            recent.move_to_end(str(student_id))
+            while len(recent) > self.capacity:
+                recent.popitem(last=False)
+
+    def lookup(self, room: str, embeddings: np.ndarray,
+               is_current: Optional[Callable[[str], bool]] = None) -> List[Optional[Tuple[str, float]]]:
+        """
+        (student_id, distance) of a confident recent match for each row of embeddings, or None.
+
+        is_current, when given, drops recent students that are no longer in
+        the gallery before comparing.
+        """
+        embeddings = np.atleast_2d(embeddings)
+        with self._lock:
+            self.lookups += len(embeddings)
+            recent = self._rooms.get(room)
+            if not recent:
+                return [None] * len(embeddings)
+            if is_current is not None:
+                for student_id in [student_id for student_id in recent if not is_current(student_id)]:
+                    del recent[student_id]
+            ids = list(recent)
+            matrix = np.stack(list(recent.values())) if ids else None
+        if matrix is None:
+            return [None] * len(embeddings)
+
+        distances = np.linalg.norm(matrix[np.newaxis, :, :] - embeddings[:, np.newaxis, :], axis=2)
+        results: List[Optional[Tuple[str, float]]] = []
+        for row in distances:
+            order = np.argsort(row)[:2]
+            best = float(row[order[0]])
+            confident = best < self.max_distance and (len(order) < 2 or row[order[1]] - best >= self.min_margin)
+            results.append((ids[order[0]], best) if confident else None)
+
+        hits = sum(result is not None for result in results)
+        with self._lock:
+            self.hits += hits
+            for student_id, _ in filter(None, results):
+                if student_id in recent:
+                    recent.move_to_end(student_id)
+        return results
+
+    def stats(self) -> Dict:
+        """Counters for the admin dashboard; hit_rate is a percentage of looked-up faces."""
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "rooms": len(self._rooms),
+                "entries": sum(len(recent) for recent in self._rooms.values()),
+                "hits": self.hits,
+                "misses": self.lookups - self.hits,
+                "hit_rate": round(self.hits / self.lookups * 100, 2) if self.lookups else 0.0,
+            }
@@ -0,0 +1,520 @@
+import base64
+import binascii
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+EMBEDDING_DIMENSION = 128
+
+# Stored embeddings are little-endian float32: 512 bytes, 684 base64 characters
+EMBEDDING_DTYPE = np.dtype("<f4")
+
+# "none" searches the float32 rows directly; the others scan compressed codes of a mapped base first
+QUANTIZATION_MODES = ("none", "float16", "int8")
+
+
+def encode_embedding(vector) -> str:
+    """Serialize an embedding as base64 of its float32 bytes (about 4x smaller than a JSON float list)."""
+    return base64.b64encode(np.asarray(vector, dtype=EMBEDDING_DTYPE).tobytes()).decode("ascii")
+
+
+def decode_embedding(encoded: Optional[str], out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """
+    Decode a base64 float32 embedding, or return None if it is missing or malformed.
+
+    With out, the vector is copied straight into that preallocated row.
+    """
+    if not encoded:
+        return None
+    try:
+        raw = base64.b64decode(encoded, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    if len(raw) != EMBEDDING_DIMENSION * EMBEDDING_DTYPE.itemsize:
+        return None
+    vector = np.frombuffer(raw, dtype=EMBEDDING_DTYPE)
+    if out is None:
+        return vector.astype(np.float32)
+    out[:] = vector
+    return out
+
+
+class FaceMatcher:
+    """
+    Exact Euclidean top-k search with one BLAS product per query batch.
+
+    Embeddings are stored as a C-contiguous float32 matrix together with their
+    precomputed squared norms, so that
+
+        ||q - x||^2 = ||q||^2 + ||x||^2 - 2 q.x
+
+    needs only a matrix-vector (one query) or matrix-matrix (many queries)
+    product. Distances stay true Euclidean distances, so they compare directly
+    against FACE_RECOGNITION_THRESHOLD.
+    """
+
+    def __init__(self, vectors: np.ndarray, sq_norms: Optional[np.ndarray] = None):
+        matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(-1, EMBEDDING_DIMENSION)
+        self.matrix = matrix
+        self.sq_norms = squared_norms(matrix) if sq_norms is None else sq_norms
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def squared_distances(self, queries: np.ndarray) -> np.ndarray:
+        """Squared distances from each query row (m, d) to every stored row; returns (m, n)."""
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        query_norms = squared_norms(queries)
+        if queries.shape[0] == 1:
+            dots = (self.matrix @ queries[0])[np.newaxis, :]
+        else:
+            dots = queries @ self.matrix.T
+        distances = self.sq_norms[np.newaxis, :] - 2.0 * dots
+        distances += query_norms[:, np.newaxis]
+        # Rounding in the expanded form can dip just below zero for identical vectors
+        np.maximum(distances, 0.0, out=distances)
+        return distances
+
+    def nearest(self, queries: np.ndarray, k: int, alive: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (indices, distances) over stored rows, skipping rows whose alive flag is False."""
+        squared = self.squared_distances(queries)
+        if alive is not None:
+            squared[:, ~alive] = np.inf
+        return top_k(squared, k)
+
+    def subset(self, rows: np.ndarray) -> "FaceMatcher":
+        """Matcher over a copy of the given rows."""
+        return FaceMatcher(self.matrix[rows], self.sq_norms[rows])
+
+    def search(self, queries: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest stored rows for one query (d,) or many queries (m, d).
+
+        Returns (indices, distances), each shaped (m, k) and sorted by ascending
+        distance. k is clipped to the number of stored rows.
+        """
+        queries = np.atleast_2d(queries)
+        n = len(self)
+        k = min(k, n)
+        if k <= 0:
+            empty = np.empty((queries.shape[0], 0))
+            return empty.astype(np.intp), empty.astype(np.float32)
+
+        return self.nearest(queries, k)
+
+
+class QuantizedMatcher(FaceMatcher):
+    """
+    Two-pass search over a memory-mapped matrix: scan compressed codes, then re-rank in float32.
+
+    Only the float16 (half the bytes) or int8 (a quarter) codes and the squared
+    norms are held in process memory. matrix stays the mapped file and is read
+    only for the rerank nearest candidates per query, so searches touch a
+    fraction of its pages. Returned distances are exact, and results only differ
+    from exact search if a true neighbour falls outside the candidates.
+
+    numpy has no int8 or float16 BLAS, so the scan is slower than the float32
+    product: up to about 2x for int8 and 10x for float16 (see
+    benchmark_face_quantization.py). The modes save memory, not latency.
+    """
+
+    def __init__(self, vectors: np.ndarray, codes: np.ndarray, scale: Optional[np.ndarray] = None,
+                 sq_norms: Optional[np.ndarray] = None, rerank: int = 32):
+        super().__init__(vectors, sq_norms)
+        self.codes = codes
+        self.scale = scale
+        self.rerank = rerank
+
+    def approximate_squared_distances(self, queries: np.ndarray) -> np.ndarray:
+        """Squared distances (m, n) computed against the codes instead of the float32 rows."""
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        # int8 codes are x / scale, so q.x = (q * scale).codes
+        weighted = queries * self.scale if self.scale is not None else queries
+        dots = np.empty((queries.shape[0], len(self)), dtype=np.float32)
+        for row, query in enumerate(weighted):
+            # einsum upcasts the codes through small internal buffers, never as a whole float32 copy
+            np.einsum("nd,d->n", self.codes, query, out=dots[row])
+        distances = self.sq_norms[np.newaxis, :] - 2.0 * dots
+        distances += squared_norms(queries)[:, np.newaxis]
+        return distances
+
+    def nearest(self, queries: np.ndarray, k: int, alive: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        approximate = self.approximate_squared_distances(queries)
+        if alive is not None:
+            approximate[:, ~alive] = np.inf
+        n = len(self)
+        count = min(n, max(k, self.rerank))
+        if count < n:
+            candidates = np.argpartition(approximate, count - 1, axis=1)[:, :count]
+        else:
+            candidates = np.broadcast_to(np.arange(n), approximate.shape).copy()
+
+        differences = self.matrix[candidates] - queries[:, np.newaxis, :]
+        exact = np.einsum("mcd,mcd->mc", differences, differences)
+        if alive is not None:
+            exact[~alive[candidates]] = np.inf
+        order, distances = top_k(exact, k)
+        return np.take_along_axis(candidates, order, axis=1), distances
+
+
+class SegmentedMatcher:
+    """
+    A read-only base matcher and a delta matcher searched as one row space.
+
+    Rows [0, len(base)) belong to the base, the rest to the delta. Each segment
+    is searched on its own and the per-segment top-k lists are merged, so a
+    memory-mapped base is scanned in place and never copied.
+    """
+
+    def __init__(self, base: FaceMatcher, delta: FaceMatcher):
+        self.base = base
+        self.delta = delta
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.delta)
+
+    def nearest(self, queries: np.ndarray, k: int, alive: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        base_size = len(self.base)
+        found_indices, found_distances = [], []
+        for matcher, offset in ((self.base, 0), (self.delta, base_size)):
+            mask = None if alive is None else alive[offset:offset + len(matcher)]
+            segment_k = min(k, len(matcher) if mask is None else int(mask.sum()))
+            if segment_k <= 0:
+                continue
+            indices, distances = matcher.nearest(queries, segment_k, mask)
+            found_indices.append(indices + offset)
+            found_distances.append(distances)
+        indices = np.concatenate(found_indices, axis=1)
+        distances = np.concatenate(found_distances, axis=1)
+        order = np.argsort(distances, axis=1)[:, :k]
+        return np.take_along_axis(indices, order, axis=1), np.take_along_axis(distances, order, axis=1)
+
+    def subset(self, rows: np.ndarray) -> FaceMatcher:
+        """Exact matcher over a copy of the given rows, gathered from both segments."""
+        base_size = len(self.base)
+        rows = np.asarray(rows, dtype=np.intp)
+        in_base = rows < base_size
+        matrix = np.empty((len(rows), self.base.matrix.shape[1]), dtype=np.float32)
+        matrix[in_base] = self.base.matrix[rows[in_base]]
+        matrix[~in_base] = self.delta.matrix[rows[~in_base] - base_size]
+        return FaceMatcher(matrix)
+
+
+def int8_scale(matrix: np.ndarray) -> np.ndarray:
+    """Per-dimension int8 step: the largest magnitude in the (read-only) rows over 127."""
+    peak = np.abs(matrix).max(axis=0) if len(matrix) else np.ones(matrix.shape[1], dtype=np.float32)
+    return (np.maximum(peak, 1e-6) / 127.0).astype(np.float32)
+
+
+def quantize(matrix: np.ndarray, mode: str, scale: Optional[np.ndarray] = None) -> np.ndarray:
+    """Compress float32 rows to float16, or to int8 codes on the given per-dimension scale."""
+    if mode == "float16":
+        return matrix.astype(np.float16)
+    if mode == "int8":
+        return np.clip(np.rint(matrix / scale), -127, 127).astype(np.int8)
+    raise ValueError(f"Unknown quantization mode: {mode}")
+
+
+def squared_norms(matrix: np.ndarray) -> np.ndarray:
+    return np.einsum("ij,ij->i", matrix, matrix)
+
+
+def top_k(squared: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Select the k smallest entries per row of a (m, n) squared-distance matrix, sorted."""
+    n = squared.shape[1]
+    if k < n:
+        candidates = np.argpartition(squared, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), squared.shape).copy()
+    candidate_distances = np.take_along_axis(squared, candidates, axis=1)
+    order = np.argsort(candidate_distances, axis=1)
+    indices = np.take_along_axis(candidates, order, axis=1)
+    distances = np.sqrt(np.take_along_axis(candidate_distances, order, axis=1))
+    return indices, distances
+
+
+class IndexSnapshot(NamedTuple):
+    """
+    Point-in-time view of a FaceIndex.
+
+    labels holds each row's label (the gallery stores index numbers there), so
+    callers can select rows with vectorized comparisons. Rows [0, len(alive)) of the index buffers are frozen for the snapshot's
+    lifetime: the index only appends past them or swaps in new buffers, and the
+    tombstone mask is copied. Searches therefore never see a half-applied write.
+    """
+    ids: np.ndarray
+    labels: np.ndarray
+    matcher: FaceMatcher
+    alive: np.ndarray
+    count: int
+
+    def __len__(self) -> int:
+        return self.count
+
+    def search(self, queries: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest live rows for one query (d,) or many queries (m, d).
+
+        Returns (student_ids, distances), each shaped (m, k) and sorted by ascending
+        distance. k is clipped to the number of live rows.
+        """
+        queries = np.atleast_2d(queries)
+        k = min(k, self.count)
+        if k <= 0:
+            return np.empty((queries.shape[0], 0), dtype=object), np.empty((queries.shape[0], 0), dtype=np.float32)
+
+        alive = self.alive if self.count < len(self.alive) else None
+        indices, distances = self.matcher.nearest(queries, k, alive)
+        return self.ids[indices], distances
+
+    def subset(self, rows: np.ndarray) -> "IndexSnapshot":
+        """Copy the given live rows into a compact snapshot, e.g. one exam room's roster."""
+        rows = np.asarray(rows, dtype=np.intp)
+        return IndexSnapshot(
+            ids=self.ids[rows],
+            labels=self.labels[rows],
+            matcher=self.matcher.subset(rows),
+            alive=np.ones(len(rows), dtype=bool),
+            count=len(rows),
+        )
+
+
+class FaceIndex:
+    """
+    Incrementally updatable nearest-neighbour index keyed by student ID.
+
+    Rows live in preallocated buffers that double when full, so add() is O(1)
+    amortized. remove() only clears the row's alive flag (a tombstone); once
+    tombstones exceed compaction_ratio of the used rows the live rows are copied
+    into fresh buffers, which keeps that cost O(1) amortized as well. Replacing
+    an existing student tombstones the old row and appends a new one, so rows
+    visible to a snapshot are never overwritten. Each row also carries a string
+    label, "" unless given.
+
+    An index built with from_base() also has a read-only base segment, e.g. a
+    memory-mapped gallery snapshot, that is searched in place. Replacing or
+    removing a base student only clears its base alive flag; new rows always go
+    to the private buffers. With quantization "float16" or "int8" the base is
+    searched with a QuantizedMatcher; the private buffers only hold the rows
+    changed since and are always searched exactly, so an index without a base
+    is unaffected by quantization.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIMENSION, initial_capacity: int = 1024,
+                 compaction_ratio: float = 0.25, min_compaction: int = 64,
+                 quantization: str = "none", rerank: int = 32):
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {quantization}")
+        self.dim = dim
+        self.initial_capacity = max(1, initial_capacity)
+        self.compaction_ratio = compaction_ratio
+        self.min_compaction = min_compaction
+        self.quantization = quantization
+        self.rerank = rerank
+        self._base: Optional[FaceMatcher] = None
+        self._base_ids = np.empty(0, dtype=object)
+        self._base_labels = np.empty(0, dtype=object)
+        self._base_positions: Dict[str, int] = {}
+        self._base_alive = np.zeros(0, dtype=bool)
+        # (delta id buffer, delta size, base + delta ids, base + delta labels), rebuilt only when the delta grows
+        self._joined_ids: Optional[Tuple[np.ndarray, int, np.ndarray, np.ndarray]] = None
+        self._lock = threading.Lock()
+        self._positions: Dict[str, int] = {}
+        self._size = 0
+        self._tombstones = 0
+        self._allocate(self.initial_capacity)
+
+    @classmethod
+    def from_vectors(cls, ids: List[str], vectors: Iterable[np.ndarray], labels: Optional[List[str]] = None,
+                     **kwargs) -> "FaceIndex":
+        """Build an index in one pass from parallel id, vector (or an (n, d) matrix) and label sequences."""
+        if not isinstance(vectors, np.ndarray):
+            vectors = list(vectors)
+        initial_capacity = max(len(ids), kwargs.pop("initial_capacity", 1024))
+        index = cls(initial_capacity=initial_capacity, **kwargs)
+        if len(vectors):
+            matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), index.dim)
+            index._matrix[:len(vectors)] = matrix
+            index._sq_norms[:len(vectors)] = squared_norms(matrix)
+        for position, student_id in enumerate(ids):
+            student_id = str(student_id)
+            previous = index._positions.get(student_id)
+            if previous is not None:
+                index._alive[previous] = False
+                index._tombstones += 1
+            index._ids[position] = student_id
+            index._alive[position] = True
+            index._positions[student_id] = position
+        index._labels[:len(ids)] = "" if labels is None else labels
+        index._size = len(ids)
+        return index
+
+    @classmethod
+    def from_base(cls, ids: List[str], matrix: np.ndarray, labels: Optional[List[str]] = None,
+                  **kwargs) -> "FaceIndex":
+        """Build an index over existing rows that are searched in place and never written."""
+        index = cls(**kwargs)
+        if index.quantization == "none":
+            index._base = FaceMatcher(matrix)
+        else:
+            scale = int8_scale(matrix) if index.quantization == "int8" else None
+            codes = quantize(np.asarray(matrix), index.quantization, scale)
+            index._base = QuantizedMatcher(matrix, codes, scale, rerank=index.rerank)
+        index._base_ids = np.array([str(student_id) for student_id in ids], dtype=object)
+        index._base_labels = np.empty(len(ids), dtype=object)
+        index._base_labels[:] = "" if labels is None else labels
+        index._base_alive = np.ones(len(ids), dtype=bool)
+        for position, student_id in enumerate(index._base_ids):
+            previous = index._base_positions.get(student_id)
+            if previous is not None:
+                index._base_alive[previous] = False
+            index._base_positions[student_id] = position
+        return index
+
+    def _allocate(self, capacity: int) -> None:
+        self._matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        self._sq_norms = np.zeros(capacity, dtype=np.float32)
+        self._ids = np.empty(capacity, dtype=object)
+        self._labels = np.empty(capacity, dtype=object)
+        self._alive = np.zeros(capacity, dtype=bool)
+
+    @property
+    def capacity(self) -> int:
+        return self._matrix.shape[0]
+
+    @property
+    def tombstones(self) -> int:
+        return self._tombstones
+
+    @property
+    def has_base(self) -> bool:
+        return self._base is not None
+
+    def __len__(self) -> int:
+        return len(self._positions) + len(self._base_positions)
+
+    def __contains__(self, student_id) -> bool:
+        return str(student_id) in self._positions or str(student_id) in self._base_positions
+
+    def get(self, student_id) -> Optional[np.ndarray]:
+        """Return a copy of a student's stored embedding, or None."""
+        with self._lock:
+            position = self._positions.get(str(student_id))
+            if position is not None:
+                return self._matrix[position].copy()
+            position = self._base_positions.get(str(student_id))
+            return None if position is None else np.array(self._base.matrix[position], dtype=np.float32)
+
+    def _drop_base(self, student_id: str) -> bool:
+        position = self._base_positions.pop(student_id, None)
+        if position is None:
+            return False
+        self._base_alive[position] = False
+        return True
+
+    def _grow(self) -> None:
+        """Move rows into buffers of double capacity. Old buffers stay valid for existing snapshots."""
+        matrix, sq_norms, ids, labels, alive = self._matrix, self._sq_norms, self._ids, self._labels, self._alive
+        self._allocate(max(self.initial_capacity, 2 * self.capacity))
+        self._matrix[:self._size] = matrix[:self._size]
+        self._sq_norms[:self._size] = sq_norms[:self._size]
+        self._ids[:self._size] = ids[:self._size]
+        self._labels[:self._size] = labels[:self._size]
+        self._alive[:self._size] = alive[:self._size]
+
+    def _compact(self) -> None:
+        """Copy live rows into fresh buffers, dropping tombstones."""
+        live = np.flatnonzero(self._alive[:self._size])
+        matrix, sq_norms, ids, labels = self._matrix[live], self._sq_norms[live], self._ids[live], self._labels[live]
+        capacity = self.initial_capacity
+        while capacity < 2 * len(live):
+            capacity *= 2
+        self._allocate(capacity)
+        count = len(live)
+        self._matrix[:count] = matrix
+        self._sq_norms[:count] = sq_norms
+        self._ids[:count] = ids
+        self._labels[:count] = labels
+        self._alive[:count] = True
+        self._positions = {student_id: position for position, student_id in enumerate(ids)}
+        self._size = count
+        self._tombstones = 0
+
+    def _tombstone(self, position: int) -> None:
+        self._alive[position] = False
+        self._tombstones += 1
+        if self._tombstones >= self.min_compaction and self._tombstones > self.compaction_ratio * self._size:
+            self._compact()
+
+    def add(self, student_id, vector: np.ndarray, label: str = "") -> None:
+        """Insert or replace a student's embedding and row label."""
+        student_id = str(student_id)
+        vector = np.asarray(vector, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            previous = self._positions.pop(student_id, None)
+            if previous is not None:
+                self._tombstone(previous)
+            else:
+                self._drop_base(student_id)
+            if self._size == self.capacity:
+                self._grow()
+            position = self._size
+            self._matrix[position] = vector
+            self._sq_norms[position] = float(vector @ vector)
+            self._ids[position] = student_id
+            self._labels[position] = label
+            self._alive[position] = True
+            self._positions[student_id] = position
+            # Publish the row last: snapshots only read rows below _size
+            self._size = position + 1
+
+    def remove(self, student_id) -> bool:
+        """Remove a student's embedding. Returns False if the student was not indexed."""
+        with self._lock:
+            position = self._positions.pop(str(student_id), None)
+            if position is None:
+                return self._drop_base(str(student_id))
+            self._tombstone(position)
+            return True
+
+    def snapshot(self) -> IndexSnapshot:
+        """Capture a consistent view for searching outside the lock."""
+        with self._lock:
+            size = self._size
+            matcher = FaceMatcher(self._matrix[:size], self._sq_norms[:size])
+            if self._base is None:
+                return IndexSnapshot(
+                    ids=self._ids[:size],
+                    labels=self._labels[:size],
+                    matcher=matcher,
+                    alive=self._alive[:size].copy(),
+                    count=len(self._positions),
+                )
+            joined = self._joined_ids
+            if joined is None or joined[0] is not self._ids or joined[1] != size:
+                joined = (self._ids, size, np.concatenate([self._base_ids, self._ids[:size]]),
+                          np.concatenate([self._base_labels, self._labels[:size]]))
+                self._joined_ids = joined
+            return IndexSnapshot(
+                ids=joined[2],
+                labels=joined[3],
+                matcher=SegmentedMatcher(self._base, matcher),
+                alive=np.concatenate([self._base_alive, self._alive[:size]]),
+                count=len(self),
+            )
+
+    def query(self, vector: np.ndarray, k: int = 1) -> List[Tuple[str, float]]:
+        """Return up to k (student_id, distance) pairs nearest to one embedding."""
+        return self.query_batch(np.atleast_2d(vector), k)[0]
+
+    def query_batch(self, vectors: np.ndarray, k: int = 1) -> List[List[Tuple[str, float]]]:
+        """Return up to k (student_id, distance) pairs per query row, from one matrix product."""
+        ids, distances = self.snapshot().search(vectors, k)
+        return [
+            [(student_id, float(distance)) for student_id, distance in zip(row_ids, row_distances)]
+            for row_ids, row_distances in zip(ids, distances)
+        ]
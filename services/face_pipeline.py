@@ -0,0 +1,290 @@
+"""
+CPU-bound face pipeline stages.
+
+Everything here runs on the face executor, either on a worker thread or inside
+a worker process. The module deliberately avoids importing application settings
+or the database client so that process-pool workers can import it cheaply, and
+it imports face_recognition (dlib and its models) only on first use, so that
+routers and CRUD-only workers can import it without loading dlib.
+"""
+import importlib.util
+import logging
+import threading
+import time
+from io import BytesIO
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# The face_recognition module once load_models() has imported it. Importing
+# face_recognition.api loads the dlib detector, shape predictor and encoder.
+face_recognition = None
+_models_error: Optional[str] = None
+_models_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+# Synthetic face box for warm-up encoding: (top, right, bottom, left) inside a 160x160 image
+WARMUP_FACE_BOX = (40, 120, 120, 40)
+
+
+class PipelineProfile(NamedTuple):
+    """Accuracy/latency settings of one face pipeline job, passed to analyze_image as keyword arguments."""
+    detection_max_dimension: int  # longer side of the detection copy; 0 detects at decode resolution
+    decode_max_dimension: int  # JPEG draft-decode floor; 0 decodes at full size
+    upsample: int  # HOG upsampling passes; each finds faces half the size at four times the cost
+    landmark_model: str  # "small" (5-point) or "large" (68-point) alignment before encoding
+    num_jitters: int  # re-sampled encodings averaged per face; cost grows linearly
+
+
+# Named profiles, selected per workload class in core/config.Settings:
+# - fast: kiosk and camera frames, where the face fills much of the picture
+# - balanced: uploads of unknown framing (the pipeline's behaviour before profiles)
+# - enrollment: the stored reference embedding, computed once per student
+PIPELINE_PROFILES = {
+    "fast": PipelineProfile(640, 1280, 0, "small", 1),
+    "balanced": PipelineProfile(800, 1600, 1, "small", 1),
+    "enrollment": PipelineProfile(1600, 0, 1, "large", 5),
+}
+
+
+def resolve_profile(name: str, overrides: Optional[Dict] = None) -> PipelineProfile:
+    """The named profile with any overridden fields replaced; ValueError for unknown names or fields."""
+    if name not in PIPELINE_PROFILES:
+        raise ValueError(f"Unknown face pipeline profile {name!r}; expected one of {sorted(PIPELINE_PROFILES)}")
+    unknown = set(overrides or {}) - set(PipelineProfile._fields)
+    if unknown:
+        raise ValueError(f"Unknown face pipeline profile fields {sorted(unknown)}")
+    profile = PIPELINE_PROFILES[name]._replace(**(overrides or {}))
+    if profile.landmark_model not in ("small", "large"):
+        raise ValueError(f"landmark_model must be 'small' or 'large', got {profile.landmark_model!r}")
+    return profile
+
+
+def face_models_available() -> bool:
+    """Whether face_recognition can be used, answered without importing it if it is not loaded yet."""
+    if face_recognition is not None:
+        return True
+    return _models_error is None and importlib.util.find_spec("face_recognition") is not None
+
+
+def load_models() -> bool:
+    """Import face_recognition so the dlib models are resident in this process. Used as the process-pool initializer."""
+    global face_recognition, _models_error
+    if face_recognition is not None:
+        return True
+    with _models_lock:
+        if face_recognition is None and _models_error is None:
+            try:
+                import face_recognition as models
+                face_recognition = models
+            except ImportError as e:
+                _models_error = str(e)
+                logger.error(f"Face recognition import failed: {str(e)}")
+                logger.error("Please install face_recognition_models: pip install git+https://github.com/ageitgey/face_recognition_models")
+    return face_recognition is not None
+
+
+def warm_up_models() -> bool:
+    """
+    Run the detector, shape predictor and encoder once on a blank image.
+
+    dlib allocates its working buffers on first use, so this moves that cost
+    from the first real request to startup. Returns False without the models.
+    """
+    if not load_models():
+        return False
+    image = np.full((160, 160, 3), 128, dtype=np.uint8)
+    face_recognition.face_locations(image, model="hog")
+    for landmark_model in ("small", "large"):
+        face_recognition.face_encodings(image, [WARMUP_FACE_BOX], model=landmark_model)
+    return True
+
+
+class DeadlineExceeded(Exception):
+    """Raised by analyze_image when the job's deadline passes before a stage starts."""
+
+    def __init__(self, stage: str):
+        super().__init__(stage)
+        self.stage = stage
+
+
+def _check_deadline(deadline: Optional[float], stage: str) -> None:
+    """Abort before a stage once the wall-clock deadline (time.time()) has passed."""
+    if deadline is not None and time.time() >= deadline:
+        raise DeadlineExceeded(stage)
+
+
+class DecodedImage(NamedTuple):
+    """An upload decoded once into the RGB array shared by detection and encoding."""
+    pixels: Optional[np.ndarray]
+    original_size: Tuple[int, int]
+    error: Optional[str] = None
+
+    @property
+    def scale(self) -> float:
+        """Ratio of upload pixels to decoded pixels (1.0 unless draft mode reduced the decode)."""
+        return self.original_size[0] / self.pixels.shape[1] if self.pixels is not None else 1.0
+
+
+def _check_image(img: Image.Image, size_bytes: int) -> str:
+    """Check an opened (not yet decoded) image against the upload rules. Returns an error message or ''."""
+    # Check if image is too large (> 10MB)
+    if size_bytes > 10 * 1024 * 1024:
+        return "Image size too large. Maximum size is 10MB"
+    # Check minimum dimensions - face_recognition works well with images as small as 50x50
+    if img.size[0] < 50 or img.size[1] < 50:
+        return "Image dimensions too small. Minimum size is 50x50 pixels"
+    # Validate image format
+    if img.format and img.format.lower() not in ['jpeg', 'jpg', 'png']:
+        return "Invalid image format. Only JPEG and PNG are supported"
+    return ""
+
+
+def decode_image(image_data: bytes, max_dimension: int = 0) -> DecodedImage:
+    """
+    Validate and decode an upload exactly once into an RGB uint8 array.
+
+    Validation only reads the header. When max_dimension is set and the upload
+    is a JPEG whose longer side exceeds it, PIL draft mode lets libjpeg decode
+    directly at 1/2, 1/4 or 1/8 scale, never going below max_dimension. PNGs
+    are always decoded at full resolution.
+    """
+    if not image_data:
+        return DecodedImage(None, (0, 0), "Empty image data provided")
+
+    try:
+        with Image.open(BytesIO(image_data)) as img:
+            original_size = img.size
+            error_message = _check_image(img, len(image_data))
+            if error_message:
+                return DecodedImage(None, original_size, error_message)
+
+            width, height = original_size
+            if max_dimension and img.format == "JPEG" and max(width, height) > max_dimension:
+                ratio = max_dimension / max(width, height)
+                img.draft("RGB", (int(np.ceil(width * ratio)), int(np.ceil(height * ratio))))
+
+            pixels = np.asarray(img.convert("RGB"))
+    except Exception as e:
+        return DecodedImage(None, (0, 0), f"Invalid image format: {str(e)}")
+
+    return DecodedImage(pixels, original_size)
+
+
+def scale_box(box: Tuple[int, int, int, int], factor: float, width: int, height: int) -> Tuple[int, int, int, int]:
+    """Scale a (top, right, bottom, left) box by factor and clip it to a width x height image."""
+    top, right, bottom, left = box
+    return (
+        max(0, int(round(top * factor))),
+        min(width, int(round(right * factor))),
+        min(height, int(round(bottom * factor))),
+        max(0, int(round(left * factor)))
+    )
+
+
+def box_iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    intersection = max(0, bottom - top) * max(0, right - left)
+    union = (a[2] - a[0]) * (a[1] - a[3]) + (b[2] - b[0]) * (b[1] - b[3]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def detect_faces(image: np.ndarray, max_dimension: int = 0, upsample: int = 1) -> List[Tuple[int, int, int, int]]:
+    """
+    Run HOG detection on a copy of the image whose longer side is at most max_dimension.
+
+    Boxes are mapped back to the coordinates of the full-resolution image, so
+    encodings can be computed from the original pixels. A max_dimension of 0,
+    or an image already small enough, detects at full resolution. upsample is
+    the number of times the detector doubles the image to find smaller faces.
+    """
+    if not load_models():
+        raise RuntimeError("face_recognition is not available")
+    height, width = image.shape[:2]
+    scale = max_dimension / max(height, width) if max_dimension else 1.0
+    if scale >= 1.0:
+        return face_recognition.face_locations(image, number_of_times_to_upsample=upsample, model="hog")
+
+    small_size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    small = np.asarray(Image.fromarray(image).resize(small_size, Image.BILINEAR))
+    face_locations = face_recognition.face_locations(small, number_of_times_to_upsample=upsample, model="hog")
+    return [scale_box(box, 1.0 / scale, width, height) for box in face_locations]
+
+
+def analyze_image(image_data: bytes, encode: bool = True, max_faces: Optional[int] = None,
+                  detection_max_dimension: int = 0, decode_max_dimension: int = 0,
+                  skip_boxes: Optional[List[Tuple[int, int, int, int]]] = None, skip_iou: float = 0.3,
+                  deadline: Optional[float] = None, upsample: int = 1, landmark_model: str = "small",
+                  num_jitters: int = 1) -> Dict:
+    """
+    Decode, detect and encode faces in a single executor hop.
+
+    The upload is decoded once (see decode_image) and the resulting array is
+    shared by detection (see detect_faces) and encoding. Encoding is skipped
+    when encode is False or when more than max_faces faces are found, since
+    the caller will reject the image anyway.
+
+    skip_boxes lets a tracker avoid re-encoding faces it has already
+    identified: a face whose box overlaps one of them (upload coordinates,
+    IoU >= skip_iou) is not encoded and gets None in face_encodings.
+
+    The resolutions, upsample, landmark_model and num_jitters are usually
+    filled in from a PipelineProfile (profile._asdict()).
+
+    deadline is a time.time() timestamp. It is checked before decoding,
+    detection and encoding, and DeadlineExceeded(stage) is raised instead of
+    starting a stage nobody will wait for.
+
+    Returns:
+        Dict containing:
+        - error: validation error message, or None
+        - face_locations: [(top, right, bottom, left), ...] in upload coordinates
+        - face_encodings: list of 128-d numpy embeddings, one per face when encoded
+        - image_dimensions: (width, height) of the upload
+    """
+    _check_deadline(deadline, "decode")
+    decoded = decode_image(image_data, decode_max_dimension)
+    if decoded.error:
+        return {
+            "error": decoded.error,
+            "face_locations": [],
+            "face_encodings": [],
+            "image_dimensions": (0, 0)
+        }
+
+    _check_deadline(deadline, "detect")
+    detected = detect_faces(decoded.pixels, detection_max_dimension, upsample)
+    face_locations = detected
+    if decoded.scale != 1.0:
+        face_locations = [scale_box(box, decoded.scale, *decoded.original_size) for box in detected]
+
+    face_encodings = []
+    if encode and detected and (max_faces is None or len(detected) <= max_faces):
+        _check_deadline(deadline, "encode")
+
+        def encode(boxes):
+            return face_recognition.face_encodings(decoded.pixels, boxes, num_jitters=num_jitters, model=landmark_model)
+
+        if skip_boxes:
+            wanted = [
+                position for position, box in enumerate(face_locations)
+                if max(box_iou(box, skip_box) for skip_box in skip_boxes) < skip_iou
+            ]
+            encoded = encode([detected[i] for i in wanted]) if wanted else []
+            face_encodings = [None] * len(detected)
+            for position, encoding in zip(wanted, encoded):
+                face_encodings[position] = encoding
+        else:
+            face_encodings = encode(detected)
+
+    return {
+        "error": None,
+        "face_locations": face_locations,
+        "face_encodings": face_encodings,
+        "image_dimensions": decoded.original_size
+    }
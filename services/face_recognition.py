@@ -1,120 +1,114 @@
 import logging
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple, List, Dict
-from io import BytesIO
 from uuid import UUID
 import numpy as np
-from scipy.spatial import KDTree
 from fastapi import HTTPException, status
-from PIL import Image
-
-# Import face_recognition with proper error handling
-try:
-    import face_recognition
-    FACE_RECOGNITION_AVAILABLE = True
-except ImportError as e:
-    logging.error(f"Face recognition import failed: {str(e)}")
-    logging.error("Please install face_recognition_models: pip install git+https://github.com/ageitgey/face_recognition_models")
-    FACE_RECOGNITION_AVAILABLE = False
 
 from core.config import settings
 from core.supabase import supabase
 from crud.students import get_student_by_id
+from services.face_admission import Deadline, FaceJobExpired, FaceJobRejected
+from services.face_cache import EmbeddingCache
+from services.face_hot_set import RecentMatches
+from services.face_executor import face_admission, face_recognition_executor, run_pipeline_job, shutdown_face_executors
+from services.face_gallery import embedding_columns, face_gallery, refresh_gallery_student
+from services.face_index import IndexSnapshot
+from services.face_pipeline import PipelineProfile, analyze_image, face_models_available, resolve_profile
 
 logger = logging.getLogger(__name__)
 
-# Thread pool for CPU-intensive face recognition tasks
-face_recognition_executor = ThreadPoolExecutor(max_workers=settings.MAX_WORKERS)
+# Detection boxes and embeddings of recent uploads, keyed by content hash
+face_analysis_cache = EmbeddingCache(settings.FACE_CACHE_MAX_BYTES)
+
+# Students recently recognized per room, checked before the full gallery search
+recent_matches = RecentMatches(
+    settings.FACE_HOT_SET_SIZE,
+    min(settings.FACE_HOT_SET_MAX_DISTANCE, settings.FACE_RECOGNITION_THRESHOLD),
+    settings.FACE_RECOGNITION_MIN_MARGIN,
+)
 
 def _check_face_recognition_availability():
-    """Check if face recognition is properly installed."""
-    if not FACE_RECOGNITION_AVAILABLE:
+    """Check if face recognition is enabled on this worker and properly installed."""
+    if not settings.FACE_RECOGNITION_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Face recognition is disabled on this worker (FACE_RECOGNITION_ENABLED=false)."
+        )
+    if not face_models_available():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Face recognition service is not available. Please install face_recognition_models."
         )
 
-def _validate_image_data(image_data: bytes) -> Tuple[bool, str]:
-    """Validate image data format and size."""
-    try:
-        if not image_data:
-            return False, "Empty image data provided"
-        
-        # Try to open the image with PIL to validate format
-        try:
-            with Image.open(BytesIO(image_data)) as img:
-                # Check if image is too large (> 10MB)
-                if len(image_data) > 10 * 1024 * 1024:
-                    return False, "Image size too large. Maximum size is 10MB"
-                # Check minimum dimensions - face_recognition works well with images as small as 50x50
-                if img.size[0] < 50 or img.size[1] < 50:
-                    return False, "Image dimensions too small. Minimum size is 50x50 pixels"
-                # Validate image format
-                if hasattr(img, 'format') and img.format and img.format.lower() not in ['jpeg', 'jpg', 'png']:
-                    return False, "Invalid image format. Only JPEG and PNG are supported"
-                return True, ""
-        except Exception as e:
-            return False, f"Invalid image format: {str(e)}"
-            
-    except Exception as e:
-        logger.warning(f"Invalid image data: {str(e)}")
-        return False, "Invalid image data provided"
+def pipeline_profile(workload: str) -> Tuple[str, PipelineProfile]:
+    """Name and settings of the pipeline profile configured for a workload class, with overrides applied."""
+    name = {
+        "room": settings.FACE_PROFILE_ROOM,
+        "batch": settings.FACE_PROFILE_RECOGNITION,
+        "registration": settings.FACE_PROFILE_REGISTRATION,
+        "preview": settings.FACE_PROFILE_PREVIEW,
+    }[workload]
+    overrides = {}
+    if name == "balanced":
+        overrides["detection_max_dimension"] = settings.FACE_DETECTION_MAX_DIMENSION
+        overrides["decode_max_dimension"] = settings.FACE_DECODE_MAX_DIMENSION
+    overrides.update(settings.FACE_PROFILE_OVERRIDES.get(name, {}))
+    return name, resolve_profile(name, overrides)
 
-def _extract_face_embedding_sync(image_data: bytes) -> Optional[np.ndarray]:
-    """Synchronous face embedding extraction (runs in thread pool)."""
-    try:
-        is_valid, error_message = _validate_image_data(image_data)
-        if not is_valid:
-            logger.warning(f"Invalid image data: {error_message}")
-            return None
-            
-        # Load image from bytes
-        image = face_recognition.load_image_file(BytesIO(image_data))
-        
-        # Get face locations first for better performance
-        face_locations = face_recognition.face_locations(image, model="hog")
-        
-        if not face_locations:
-            logger.warning("No face detected in provided image")
-            return None
-            
-        if len(face_locations) > 1:
-            logger.warning(f"Multiple faces detected ({len(face_locations)}), using the first one")
-        
-        # Extract encodings for detected faces
-        encodings = face_recognition.face_encodings(image, face_locations)
-        
-        if not encodings:
-            logger.warning("No face encodings could be generated")
-            return None
-            
-        logger.info("Face embedding extracted successfully")
-        return encodings[0]
-        
-    except Exception as e:
-        logger.error(f"Error extracting face embedding: {str(e)}")
-        raise
+def _pipeline_options(workload: str) -> Dict:
+    """Profile settings passed to a face pipeline job of the given workload class."""
+    return pipeline_profile(workload)[1]._asdict()
+
+async def _analyze_face_image(image_data: bytes, max_faces: Optional[int] = None,
+                              workload: str = "batch", room_code: Optional[str] = None,
+                              deadline: Optional[Deadline] = None) -> Dict:
+    """
+    Run the face pipeline on an upload, reusing the cached result for identical bytes.
+    
+    A cached analysis is reused when it encoded every face, or when the caller
+    would reject it anyway because it holds more than max_faces faces. Cache
+    misses are scheduled as the given workload class, fairly per room_code,
+    and abandoned once the request's deadline passes (see face_admission).
+    The class also selects the pipeline profile, which is part of the cache
+    key: the same bytes give different boxes and embeddings per profile.
+    """
+    options = _pipeline_options(workload)
+    use_cache = settings.FACE_CACHE_MAX_BYTES > 0
+    if use_cache:
+        key = EmbeddingCache.make_key(image_data, *options.values())
+        cached = face_analysis_cache.get(key)
+        if cached is not None:
+            locations = cached["face_locations"]
+            if len(cached["face_encodings"]) == len(locations) or (max_faces is not None and len(locations) > max_faces):
+                return cached
+    
+    # Decode once, detect and encode in one hop on the pipeline executor
+    analysis = await run_pipeline_job(
+        analyze_image, image_data, workload=workload, room_code=room_code, deadline=deadline,
+        max_faces=max_faces, **options
+    )
+    if use_cache and not analysis["error"]:
+        face_analysis_cache.put(key, analysis)
+    return analysis
 
-async def extract_face_embedding(image_data: bytes) -> Optional[np.ndarray]:
+async def extract_face_embedding(image_data: bytes, workload: str = "registration",
+                                 room_code: Optional[str] = None,
+                                 deadline: Optional[Deadline] = None) -> Optional[np.ndarray]:
     """Extract facial embedding from image data."""
     _check_face_recognition_availability()
     
-    # Validate image data
-    is_valid, error_message = _validate_image_data(image_data)
-    if not is_valid:
-        logger.warning(f"Invalid image data: {error_message}")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=error_message
-        )
-
     try:
-        # Load the image and get face encoding
-        img = face_recognition.load_image_file(BytesIO(image_data))
-        face_locations = await asyncio.get_event_loop().run_in_executor(
-            face_recognition_executor, face_recognition.face_locations, img
+        analysis = await _analyze_face_image(
+            image_data, max_faces=1, workload=workload, room_code=room_code, deadline=deadline
         )
+        if analysis["error"]:
+            logger.warning(f"Invalid image data: {analysis['error']}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=analysis["error"]
+            )
+        face_locations = analysis["face_locations"]
         
         if not face_locations:
             raise HTTPException(
@@ -128,10 +122,7 @@ async def extract_face_embedding(image_data: bytes) -> Optional[np.ndarray]:
                 detail="Multiple faces detected in the image. Please provide an image with a single face"
             )
 
-        face_encodings = await asyncio.get_event_loop().run_in_executor(
-            face_recognition_executor, face_recognition.face_encodings, img, face_locations
-        )
-        
+        face_encodings = analysis["face_encodings"]
         if not face_encodings:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -149,98 +140,391 @@ async def extract_face_embedding(image_data: bytes) -> Optional[np.ndarray]:
             detail="Failed to process the image. Please try again with a different image"
         )
 
-def _recognize_face_sync(embedding: np.ndarray, stored_embeddings: list) -> Optional[Tuple[int, float]]:
-    """Synchronous face recognition (runs in thread pool)."""
+def _summarize_candidates(ids: np.ndarray, distances: np.ndarray, k: int) -> Dict:
+    """Turn one row of gallery search results into candidates, margin and match flags."""
+    candidates = [
+        {
+            "student_id": student_id,
+            "index_number": face_gallery.get_index_number(student_id),
+            "distance": float(distance),
+            "confidence": 1 - float(distance),
+        }
+        for student_id, distance in zip(ids, distances)
+    ]
+    best_distance = candidates[0]["distance"] if candidates else None
+    margin = candidates[1]["distance"] - best_distance if len(candidates) > 1 else None
+    is_match = best_distance is not None and best_distance < settings.FACE_RECOGNITION_THRESHOLD
+    return {
+        "candidates": candidates[:k],
+        "best_distance": best_distance,
+        "margin": margin,
+        "is_match": is_match,
+        "is_ambiguous": is_match and margin is not None and margin < settings.FACE_RECOGNITION_MIN_MARGIN,
+    }
+
+def _rank_candidates_sync(embeddings: np.ndarray, gallery: IndexSnapshot, k: int) -> List[Dict]:
+    """Rank gallery candidates for one or more embeddings in a single matrix pass (runs in thread pool)."""
     try:
-        if not stored_embeddings:
-            logger.info("No stored embeddings for comparison")
-            return None
-            
-        # Prepare data for KDTree
-        ids, vectors = zip(*stored_embeddings)
-        vectors_array = np.array(vectors)
+        embeddings = np.atleast_2d(embeddings)
+        # Always fetch a runner-up so the margin is available even when k == 1
+        ids, distances = gallery.search(embeddings, k=max(k, 2))
+        results = [_summarize_candidates(row_ids, row_distances, k) for row_ids, row_distances in zip(ids, distances)]
         
-        # Use KDTree for efficient nearest neighbor search
-        kdtree = KDTree(vectors_array)
-        distance, index = kdtree.query(embedding, k=1)
+        for result in results:
+            if result["is_match"]:
+                best = result["candidates"][0]
+                logger.info(
+                    f"Face recognized for student ID: {best['student_id']} with confidence: {best['confidence']:.3f}"
+                    + (f" (margin {result['margin']:.3f})" if result["margin"] is not None else "")
+                )
+            elif result["best_distance"] is not None:
+                logger.info(
+                    f"No matching face found. Best match distance: {result['best_distance']:.3f} "
+                    f"(threshold: {settings.FACE_RECOGNITION_THRESHOLD})"
+                )
+        return results
         
-        confidence_threshold = settings.FACE_RECOGNITION_THRESHOLD
-        
-        if distance < confidence_threshold:
-            student_id = ids[index]
-            confidence = 1 - distance
-            logger.info(f"Face recognized for student ID: {student_id} with confidence: {confidence:.3f}")
-            return student_id, distance
-        else:
-            logger.info(f"No matching face found. Best match distance: {distance:.3f} (threshold: {confidence_threshold})")
-            return None
-            
     except Exception as e:
         logger.error(f"Error during face recognition comparison: {str(e)}")
         raise
 
-async def recognize_face(image_data: bytes):
-    """Recognize a face by comparing it to stored embeddings and return the student."""
+async def recognize_face_candidates(image_data: bytes, k: Optional[int] = None,
+                                    index_range: Optional[Tuple[str, str]] = None,
+                                    workload: str = "batch", room_code: Optional[str] = None,
+                                    deadline: Optional[Deadline] = None) -> Dict:
+    """
+    Recognize a face and return the top-k gallery candidates.
+    
+    With index_range the search is room-scoped; see match_embeddings. workload
+    is the admission class of the face job ("room" for exam-room kiosks),
+    room_code its fairness key and deadline the request's time budget.
+    
+    Returns:
+        Dict containing:
+        - candidates: [{student_id, index_number, distance, confidence}, ...] nearest first
+        - best_distance: distance to the nearest student, or None if the gallery is empty
+        - margin: distance gap between the first and second candidates, or None
+        - is_match: whether the nearest student is within FACE_RECOGNITION_THRESHOLD
+        - is_ambiguous: a match whose margin is below FACE_RECOGNITION_MIN_MARGIN
+        - scope: "recent" if answered from the room's recently recognized students,
+          "room" if from the room's roster, otherwise "global"
+    """
     _check_face_recognition_availability()
+    k = k or settings.FACE_RECOGNITION_TOP_K
     
     try:
         # Extract embedding from input image
-        embedding = await extract_face_embedding(image_data)
+        embedding = await extract_face_embedding(image_data, workload, room_code, deadline)
         if embedding is None:
-            return None
-        
-        # Fetch stored embeddings from database
-        logger.debug("Fetching stored face embeddings from database")
-        response = supabase.table("students").select("id, face_embedding").execute()
-        
-        if not response.data:
-            logger.info("No students found in database for recognition")
-            return None
+            return _summarize_candidates(np.empty(0, dtype=object), np.empty(0), k)
         
-        # Filter out students without face embeddings
-        stored_embeddings = []
-        for record in response.data:
-            if record.get("face_embedding"):
-                try:
-                    embedding_array = np.array(record["face_embedding"])
-                    if embedding_array.shape == (128,):  # Standard face_recognition embedding size
-                        stored_embeddings.append((record["id"], embedding_array))
-                except Exception as e:
-                    logger.warning(f"Invalid embedding for student ID {record['id']}: {str(e)}")
-                    continue
+        results = await match_embeddings(embedding, k, index_range, deadline, room_code)
+        return results[0]
         
-        if not stored_embeddings:
-            logger.info("No valid face embeddings found in database")
-            return None
-        
-        logger.info(f"Comparing against {len(stored_embeddings)} stored face embeddings")
-        
-        # Run face recognition in thread pool
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            face_recognition_executor,
-            _recognize_face_sync,
-            embedding,
-            stored_embeddings
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error during face recognition: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Face recognition service temporarily unavailable"
         )
+
+async def _rank(embeddings: np.ndarray, gallery: IndexSnapshot, k: int, scope: str,
+                deadline: Optional[Deadline] = None) -> List[Dict]:
+    """Rank embeddings against one gallery snapshot on the thread pool, unless the deadline has passed."""
+    if deadline is not None and deadline.expired():
+        face_admission.record_aborted("match", 0.0)
+        raise FaceJobExpired("match")
+    loop = asyncio.get_event_loop()
+    results = await loop.run_in_executor(
+        face_recognition_executor,
+        _rank_candidates_sync,
+        embeddings,
+        gallery,
+        k
+    )
+    return [{**result, "scope": scope} for result in results]
+
+async def match_embeddings(embeddings: np.ndarray, k: Optional[int] = None,
+                           index_range: Optional[Tuple[str, str]] = None,
+                           deadline: Optional[Deadline] = None,
+                           room_code: Optional[str] = None) -> List[Dict]:
+    """
+    Match one or more embeddings (m, 128) against the gallery with a single matrix product.
+    
+    Each row is first compared with the students recently recognized in the
+    same room (room_code, or a shared set outside rooms); a confident hit there
+    is returned with scope "recent" without searching the gallery. Confident
+    gallery matches are added to that hot set.
+    
+    With index_range (an exam room's index_start/index_end), embeddings are first
+    matched against only the students in that range. Rows without a match there
+    fall back to the whole gallery, so a student in the wrong room is still
+    identified and reported as such.
+    
+    Returns one result per row, shaped like recognize_face_candidates.
+    """
+    k = k or settings.FACE_RECOGNITION_TOP_K
+    embeddings = np.atleast_2d(embeddings)
+    hot_key = room_code or ""
+    
+    results: List[Optional[Dict]] = [None] * len(embeddings)
+    if recent_matches.capacity > 0:
+        hits = recent_matches.lookup(
+            hot_key, embeddings, lambda student_id: face_gallery.get_index_number(student_id) is not None
+        )
+        for position, hit in enumerate(hits):
+            if hit is not None:
+                student_id, distance = hit
+                logger.info(f"Face recognized from recent matches for student ID: {student_id} (distance {distance:.3f})")
+                results[position] = {
+                    **_summarize_candidates(np.array([student_id], dtype=object), np.array([distance]), k),
+                    "scope": "recent",
+                }
+    
+    pending = [position for position, result in enumerate(results) if result is None]
+    if pending:
+        searched = await _search_gallery(embeddings[pending], k, index_range, deadline)
+        for position, result in zip(pending, searched):
+            results[position] = result
+            if recent_matches.capacity > 0 and result["is_match"] and not result["is_ambiguous"]:
+                student_id = result["candidates"][0]["student_id"]
+                stored = face_gallery.get_embedding(student_id)
+                if stored is not None:
+                    recent_matches.record(hot_key, student_id, stored)
+    return results
+
+async def _search_gallery(embeddings: np.ndarray, k: int, index_range: Optional[Tuple[str, str]],
+                          deadline: Optional[Deadline]) -> List[Dict]:
+    """Full gallery search behind match_embeddings: room-scoped first when index_range is given."""
+    # Search the process-resident gallery; it is only fetched from the database on first use
+    await face_gallery.ensure_loaded()
+    if index_range is None:
+        gallery = face_gallery.snapshot()
+        if len(gallery) == 0:
+            logger.info("No valid face embeddings found in gallery")
+        logger.info(f"Comparing {len(embeddings)} face(s) against {len(gallery)} stored face embeddings")
+        return await _rank(embeddings, gallery, k, "global", deadline)
+    
+    room_gallery = face_gallery.room_snapshot(*index_range)
+    logger.info(
+        f"Comparing {len(embeddings)} face(s) against {len(room_gallery)} embeddings "
+        f"in index range {index_range[0]}-{index_range[1]}"
+    )
+    results = await _rank(embeddings, room_gallery, k, "room", deadline)
+    
+    fallback = [position for position, result in enumerate(results) if not result["is_match"]]
+    if fallback:
+        gallery = face_gallery.snapshot()
+        logger.info(f"No in-room match for {len(fallback)} face(s); searching all {len(gallery)} stored face embeddings")
+        for position, result in zip(fallback, await _rank(embeddings[fallback], gallery, k, "global", deadline)):
+            results[position] = result
+    return results
+
+async def recognize_faces_in_image(image_data: bytes, k: Optional[int] = None,
+                                   index_range: Optional[Tuple[str, str]] = None,
+                                   workload: str = "room", room_code: Optional[str] = None,
+                                   deadline: Optional[Deadline] = None) -> List[Dict]:
+    """
+    Recognize every face in a group frame, up to FACE_MULTI_MAX_FACES.
+    
+    All faces are encoded in one face_encodings call and matched against the
+    gallery with a single matrix product (see match_embeddings). Returns one
+    result per face, left to right, shaped like recognize_face_candidates plus
+    "face_location" (top, right, bottom, left) in image coordinates. An image
+    without faces gives an empty list.
+    """
+    _check_face_recognition_availability()
+    max_faces = settings.FACE_MULTI_MAX_FACES
+    
+    analysis = await _analyze_face_image(
+        image_data, max_faces=max_faces, workload=workload, room_code=room_code, deadline=deadline
+    )
+    if analysis["error"]:
+        logger.warning(f"Invalid image data: {analysis['error']}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=analysis["error"])
+    
+    face_locations = analysis["face_locations"]
+    if len(face_locations) > max_faces:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many faces detected ({len(face_locations)}). At most {max_faces} can be recognized at once"
+        )
+    if not face_locations:
+        return []
+    
+    try:
+        ranked = await match_embeddings(np.vstack(analysis["face_encodings"]), k, index_range, deadline, room_code)
+    except FaceJobRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error during multi-face recognition: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Face recognition service temporarily unavailable"
+        )
+    logger.info(f"Recognized {len(ranked)} face(s) in one frame")
+    
+    faces = [{**result, "face_location": list(box)} for box, result in zip(face_locations, ranked)]
+    return sorted(faces, key=lambda face: face["face_location"][3])
+
+async def verify_face(image_data: bytes, student_id, room_code: Optional[str] = None,
+                      deadline: Optional[Deadline] = None) -> Dict:
+    """
+    1:1 verification of a face against one claimed student.
+    
+    Used when the student has already identified themselves (an ID card scan
+    at the exam door): only that student's embedding is compared, so the cost
+    does not grow with the gallery. A student without a stored embedding is
+    answered before the image is processed, without taking a pipeline slot.
+    
+    Returns:
+        Dict containing:
+        - student_id: the claimed student
+        - distance: face distance to the student's embedding, or None if they have none
+        - is_match: whether the distance is within FACE_RECOGNITION_THRESHOLD
+    """
+    _check_face_recognition_availability()
+    
+    try:
+        reference = await face_gallery.lookup_embedding(student_id)
+        if reference is None:
+            logger.info(f"No stored face embedding to verify student ID: {student_id} against")
+            return {"student_id": str(student_id), "distance": None, "is_match": False}
         
-        if result:
-            student_id, distance = result
-            # Get the full student record
-            student = await get_student_by_id(UUID(student_id))
-            return student
-        
-        return None
+        embedding = await extract_face_embedding(image_data, "room", room_code, deadline)
+        distance = float(np.linalg.norm(np.asarray(embedding, dtype=np.float32) - reference))
+        is_match = distance < settings.FACE_RECOGNITION_THRESHOLD
+        logger.info(
+            f"Face {'verified' if is_match else 'rejected'} for student ID: {student_id} "
+            f"(distance {distance:.3f}, threshold: {settings.FACE_RECOGNITION_THRESHOLD})"
+        )
+        return {"student_id": str(student_id), "distance": distance, "is_match": is_match}
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error during face recognition: {str(e)}")
+        logger.error(f"Error during face verification: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Face recognition service temporarily unavailable"
         )
 
+async def analyze_frame(image_data: bytes, max_faces: Optional[int] = None,
+                        skip_boxes: Optional[List[Tuple[int, int, int, int]]] = None,
+                        room_code: Optional[str] = None, deadline: Optional[Deadline] = None) -> Dict:
+    """
+    Run the face pipeline on a camera frame, bypassing the upload cache.
+    
+    Faces overlapping skip_boxes (already identified by a tracker) are detected
+    but not encoded; see analyze_image.
+    """
+    _check_face_recognition_availability()
+    return await run_pipeline_job(
+        analyze_image, image_data,
+        workload="room",
+        room_code=room_code,
+        deadline=deadline,
+        max_faces=max_faces,
+        skip_boxes=skip_boxes,
+        skip_iou=settings.FACE_TRACK_IOU_THRESHOLD,
+        **_pipeline_options("room")
+    )
+
+def _failed_recognition(error: str) -> Dict:
+    """Recognition result for an image that produced no usable embedding."""
+    return {**_summarize_candidates(np.empty(0, dtype=object), np.empty(0), 0), "error": error}
+
+async def _analyze_batch(images: List[bytes], workload: str, room_code: Optional[str],
+                         deadline: Optional[Deadline]) -> List:
+    """
+    Analyze every image concurrently; returns one analysis or exception per image, in order.
+    
+    The first FaceJobRejected cancels the jobs still queued or running and is raised.
+    """
+    tasks = [
+        asyncio.ensure_future(_analyze_face_image(image, workload=workload, room_code=room_code, deadline=deadline))
+        for image in images
+    ]
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if isinstance(task.exception(), FaceJobRejected):
+                    raise task.exception()
+    finally:
+        unfinished = [task for task in tasks if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.gather(*unfinished, return_exceptions=True)
+    return [task.exception() or task.result() for task in tasks]
+
+async def recognize_faces_batch(images: List[bytes], k: Optional[int] = None,
+                                index_range: Optional[Tuple[str, str]] = None,
+                                workload: str = "batch", room_code: Optional[str] = None,
+                                deadline: Optional[Deadline] = None) -> List[Dict]:
+    """
+    Recognize several images in one call.
+    
+    Images are decoded, detected and encoded in parallel on the face executor,
+    then every resulting embedding is matched against the gallery with a single
+    matrix-matrix product. Returns one result per image, in input order, shaped
+    like recognize_face_candidates plus an "error" key (None on success).
+    
+    If admission control turns away any image, or the deadline passes, the
+    whole batch is rejected (FaceJobRejected), so the client retries it as a unit;
+    the other images' jobs are cancelled rather than left to run for nothing.
+    """
+    _check_face_recognition_availability()
+    k = k or settings.FACE_RECOGNITION_TOP_K
+    
+    analyses = await _analyze_batch(images, workload, room_code, deadline)
+    
+    results: List[Optional[Dict]] = [None] * len(images)
+    embeddings = []
+    positions = []
+    for position, analysis in enumerate(analyses):
+        if isinstance(analysis, Exception):
+            logger.warning(f"Face extraction failed for batch image {position}: {str(analysis)}")
+            results[position] = _failed_recognition("Failed to process the image")
+        elif analysis["error"]:
+            results[position] = _failed_recognition(analysis["error"])
+        elif not analysis["face_encodings"]:
+            results[position] = _failed_recognition("No face detected in the image")
+        else:
+            if len(analysis["face_encodings"]) > 1:
+                logger.warning(f"Multiple faces detected in batch image {position}, using the first one")
+            embeddings.append(analysis["face_encodings"][0])
+            positions.append(position)
+    
+    if embeddings:
+        try:
+            ranked = await match_embeddings(np.vstack(embeddings), k, index_range, deadline, room_code)
+        except FaceJobRejected:
+            raise
+        except Exception as e:
+            logger.error(f"Error during batch face recognition: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Face recognition service temporarily unavailable"
+            )
+        for position, result in zip(positions, ranked):
+            results[position] = {**result, "error": None}
+    
+    return results
+
+async def recognize_face(image_data: bytes, deadline: Optional[Deadline] = None):
+    """Recognize a face by comparing it to the in-memory gallery and return the student."""
+    result = await recognize_face_candidates(image_data, k=1, deadline=deadline)
+    if not result["is_match"]:
+        return None
+    
+    # Get the full student record
+    return await get_student_by_id(UUID(result["candidates"][0]["student_id"]))
+
 async def store_face_embedding(student_id: UUID, image_data: bytes) -> bool:
     """Store face embedding for a student."""
     try:
@@ -248,15 +532,13 @@ async def store_face_embedding(student_id: UUID, image_data: bytes) -> bool:
         if embedding is None:
             return False
         
-        # Convert numpy array to list for JSON storage
-        embedding_list = embedding.tolist()
-        
-        # Update student record with face embedding
-        response = supabase.table("students").update({
-            "face_embedding": embedding_list
-        }).eq("id", str(student_id)).execute()
+        # Update student record with face embedding in the configured storage format
+        response = supabase.table("students").update(
+            embedding_columns(embedding)
+        ).eq("id", str(student_id)).execute()
         
         if response.data:
+            refresh_gallery_student(response.data[0])
             logger.info(f"Face embedding stored successfully for student ID: {student_id}")
             return True
         else:
@@ -267,7 +549,7 @@ async def store_face_embedding(student_id: UUID, image_data: bytes) -> bool:
         logger.error(f"Error storing face embedding: {str(e)}")
         return False
 
-async def detect_faces_with_bounding_boxes(image_data: bytes) -> Dict:
+async def detect_faces_with_bounding_boxes(image_data: bytes, workload: str = "preview") -> Dict:
     """
     Detect faces in image and return bounding box coordinates.
     
@@ -280,36 +562,21 @@ async def detect_faces_with_bounding_boxes(image_data: bytes) -> Dict:
     """
     _check_face_recognition_availability()
     
-    # Validate image data
-    is_valid, error_message = _validate_image_data(image_data)
-    if not is_valid:
-        logger.warning(f"Invalid image data: {error_message}")
-        return {
-            "faces_detected": 0,
-            "face_locations": [],
-            "image_dimensions": (0, 0),
-            "face_encodings": [],
-            "error": error_message
-        }
-
     try:
-        # Load the image
-        img = face_recognition.load_image_file(BytesIO(image_data))
+        analysis = await _analyze_face_image(image_data, workload=workload)
+        if analysis["error"]:
+            logger.warning(f"Invalid image data: {analysis['error']}")
+            return {
+                "faces_detected": 0,
+                "face_locations": [],
+                "image_dimensions": (0, 0),
+                "face_encodings": [],
+                "error": analysis["error"]
+            }
         
-        # Get image dimensions
-        height, width = img.shape[:2]
-        
-        # Find face locations
-        face_locations = await asyncio.get_event_loop().run_in_executor(
-            face_recognition_executor, face_recognition.face_locations, img
-        )
-        
-        # Get face encodings if faces are found
-        face_encodings = []
-        if face_locations:
-            face_encodings = await asyncio.get_event_loop().run_in_executor(
-                face_recognition_executor, face_recognition.face_encodings, img, face_locations
-            )
+        face_locations = analysis["face_locations"]
+        face_encodings = analysis["face_encodings"]
+        width, height = analysis["image_dimensions"]
         
         # Convert face_encodings to lists for JSON serialization
         face_encodings_list = [encoding.tolist() for encoding in face_encodings]
@@ -321,6 +588,8 @@ async def detect_faces_with_bounding_boxes(image_data: bytes) -> Dict:
             "face_encodings": face_encodings_list
         }
         
+    except FaceJobRejected:
+        raise
     except Exception as e:
         logger.error(f"Face detection error: {str(e)}")
         return {
@@ -358,8 +627,8 @@ async def extract_face_embedding_with_bbox(image_data: bytes) -> Tuple[Optional[
 def cleanup_face_recognition():
     """Cleanup face recognition resources."""
     try:
-        face_recognition_executor.shutdown(wait=True)
-        logger.info("Face recognition executor shut down successfully")
+        shutdown_face_executors()
+        logger.info("Face recognition executors shut down successfully")
     except Exception as e:
         logger.error(f"Error during face recognition cleanup: {str(e)}")
 
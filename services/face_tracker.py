@@ -0,0 +1,111 @@
+"""
+IoU tracker for faces in a camera stream.
+
+A student standing in front of an exam-room camera produces many near-identical
+frames. Linking detections across frames into tracks lets the stream encode and
+match a face only until its track is confidently identified, and write one
+recognition log entry per track instead of one per frame.
+"""
+import itertools
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.face_pipeline import box_iou
+
+Box = Tuple[int, int, int, int]
+
+
+class Track:
+    """One face followed across frames."""
+
+    def __init__(self, track_id: int, box: Box, now: float):
+        self.track_id = track_id
+        self.box = box
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+        self.identified = False
+        # Latest recognition outcome for the track, owned by the caller
+        self.result: Any = None
+        self.logged = False
+
+
+class FaceTracker:
+    """
+    Greedy IoU tracker.
+
+    Each frame's boxes are matched to live tracks by descending IoU; pairs
+    below iou_threshold never match, and unmatched boxes start new tracks.
+    Tracks not seen for max_age seconds expire. An identified track ends on
+    the first frame it is not detected in: its result is reused without
+    encoding, so it must not be inherited by the next student to step into
+    the same spot in front of a fixed camera.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: float = 2.0):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self._tracks: Dict[int, Track] = {}
+        self._ids = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    def update(self, boxes: List[Box], now: Optional[float] = None) -> Tuple[List[Track], List[Track]]:
+        """
+        Assign one frame's boxes to tracks.
+
+        Returns (tracks, expired): the track for each box in input order, and
+        the tracks that ended with this frame (expired, or identified and not
+        detected in it).
+        """
+        now = time.monotonic() if now is None else now
+        expired = [track for track in self._tracks.values() if now - track.last_seen > self.max_age]
+        for track in expired:
+            del self._tracks[track.track_id]
+
+        pairs = sorted(
+            (
+                (box_iou(box, track.box), position, track.track_id)
+                for position, box in enumerate(boxes)
+                for track in self._tracks.values()
+            ),
+            reverse=True
+        )
+        assigned: Dict[int, int] = {}
+        taken = set()
+        for iou, position, track_id in pairs:
+            if iou < self.iou_threshold:
+                break
+            if position in assigned or track_id in taken:
+                continue
+            assigned[position] = track_id
+            taken.add(track_id)
+
+        lost = [track for track in self._tracks.values() if track.identified and track.track_id not in taken]
+        for track in lost:
+            del self._tracks[track.track_id]
+        expired.extend(lost)
+
+        tracks = []
+        for position, box in enumerate(boxes):
+            if position in assigned:
+                track = self._tracks[assigned[position]]
+                track.box = box
+                track.last_seen = now
+                track.hits += 1
+            else:
+                track = Track(next(self._ids), box, now)
+                self._tracks[track.track_id] = track
+            tracks.append(track)
+        return tracks, expired
+
+    def identified_boxes(self) -> List[Box]:
+        """Last boxes of identified tracks; faces overlapping them need not be re-encoded."""
+        return [track.box for track in self._tracks.values() if track.identified]
+
+    def flush(self) -> List[Track]:
+        """Remove and return every live track, e.g. when the stream closes."""
+        tracks = list(self._tracks.values())
+        self._tracks.clear()
+        return tracks
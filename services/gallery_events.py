@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process so it can skip its own events, which it applied locally
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Seconds to wait before reconnecting a feed that failed
+RECONNECT_DELAY = 5.0
+
+
+class GalleryEvent(NamedTuple):
+    op: str  # "upsert" or "delete"
+    student_id: str
+    index_number: Optional[str] = None
+    embedding: Optional[str] = None  # base64 float32, see encode_embedding
+    updated_at: Optional[str] = None
+    origin: str = WORKER_ID
+    sent_at: float = 0.0
+
+    def to_json(self) -> str:
+        return json.dumps(self._asdict(), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, payload: str) -> "GalleryEvent":
+        data = json.loads(payload)
+        return cls(**{field: data.get(field) for field in cls._fields if field in data})
+
+
+class ChangeFeed(ABC):
+    """
+    Publishes local gallery changes and delivers other workers' changes to on_event.
+
+    Events carry the new embedding, so a worker applies another's write without a
+    reload or a database round trip; delta syncs and full reloads still catch
+    events that are missed.
+
+    publish() only queues the event, so it is safe to call from request handlers
+    and executor threads alike; run() sends the queue and receives until cancelled.
+    """
+
+    def __init__(self, on_event: Callable[[GalleryEvent], None]):
+        self.on_event = on_event
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self.published = 0
+        self.received = 0
+        self.failed = 0
+        self.last_lag_ms: Optional[float] = None
+        self.max_lag_ms = 0.0
+
+    @property
+    @abstractmethod
+    def backend(self) -> str:
+        """Name of the backend reported in stats."""
+
+    def publish(self, event: GalleryEvent) -> None:
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._outbox.put_nowait, event._replace(sent_at=time.time()))
+
+    def _deliver(self, payload: str) -> None:
+        try:
+            event = GalleryEvent.from_json(payload)
+            if event.origin == WORKER_ID:
+                return
+            self.on_event(event)
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Could not apply gallery change event: {str(e)}")
+            return
+        self.received += 1
+        if event.sent_at:
+            self.last_lag_ms = max(0.0, (time.time() - event.sent_at) * 1000)
+            self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+
+    async def _connect(self) -> None:
+        pass
+
+    async def _close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def _send(self, payload: str) -> None:
+        """Send one serialized event to the other workers."""
+
+    async def _receive(self) -> None:
+        """Deliver incoming events until cancelled."""
+        await asyncio.Future()
+
+    async def _send_loop(self) -> None:
+        while True:
+            event = await self._outbox.get()
+            await self._send(event.to_json())
+            self.published += 1
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if self._outbox is None:
+            self._outbox = asyncio.Queue()
+        await self._connect()
+        try:
+            await asyncio.gather(self._send_loop(), self._receive())
+        finally:
+            await self._close()
+
+    async def run_forever(self) -> None:
+        """run(), reconnecting after failures. Events published while disconnected wait in the queue."""
+        while True:
+            try:
+                await self.run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Gallery change feed ({self.backend}) failed, reconnecting: {str(e)}")
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "published": self.published,
+            "received": self.received,
+            "failed": self.failed,
+            "pending": self._outbox.qsize() if self._outbox is not None else 0,
+            "last_lag_ms": round(self.last_lag_ms, 2) if self.last_lag_ms is not None else None,
+            "max_lag_ms": round(self.max_lag_ms, 2),
+        }
+
+
+class PostgresChangeFeed(ChangeFeed):
+    """LISTEN/NOTIFY on one channel over a dedicated asyncpg connection."""
+
+    def __init__(self, on_event: Callable[[GalleryEvent], None], dsn: str, channel: str):
+        super().__init__(on_event)
+        try:
+            # Imported here so workers without a postgres feed never load it
+            import asyncpg
+        except ImportError:
+            raise RuntimeError("The postgres gallery change feed requires asyncpg (pip install asyncpg)")
+        self._asyncpg = asyncpg
+        self.dsn = dsn
+        self.channel = channel
+        self._connection = None
+
+    @property
+    def backend(self) -> str:
+        return "postgres"
+
+    async def _connect(self) -> None:
+        self._connection = await self._asyncpg.connect(self.dsn)
+        await self._connection.add_listener(self.channel, self._on_notify)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self._deliver(payload)
+
+    async def _close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def _send(self, payload: str) -> None:
+        await self._connection.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+
+    async def _receive(self) -> None:
+        # Notifications arrive through the listener callback; fail over when the connection drops
+        while not self._connection.is_closed():
+            await asyncio.sleep(1.0)
+        raise ConnectionError("LISTEN connection closed")
+
+
+class FileChangeFeed(ChangeFeed):
+    """
+    Events appended as JSON lines to a shared file that every worker tails.
+
+    Each event is one O_APPEND write, so concurrent writers never interleave.
+    The file is not rotated; it is meant for tests and local runs.
+    """
+
+    def __init__(self, on_event: Callable[[GalleryEvent], None], path: str, poll_interval: float = 0.02):
+        super().__init__(on_event)
+        self.path = path
+        self.poll_interval = poll_interval
+        self._fd: Optional[int] = None
+        self._offset = 0
+
+    @property
+    def backend(self) -> str:
+        return "file"
+
+    async def _connect(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        # Only events written from now on are of interest
+        self._offset = os.path.getsize(self.path)
+
+    async def _close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    async def _send(self, payload: str) -> None:
+        os.write(self._fd, (payload + "\n").encode("utf-8"))
+
+    async def _receive(self) -> None:
+        while True:
+            with open(self.path, "rb") as file:
+                file.seek(self._offset)
+                chunk = file.read()
+            # Leave a partially written last line for the next poll
+            complete = chunk[:chunk.rfind(b"\n") + 1]
+            self._offset += len(complete)
+            for line in complete.splitlines():
+                if line.strip():
+                    self._deliver(line.decode("utf-8"))
+            await asyncio.sleep(self.poll_interval)
+
+
+def create_change_feed(backend: str, on_event: Callable[[GalleryEvent], None], dsn: str = "",
+                       channel: str = "face_gallery", path: str = "") -> Optional[ChangeFeed]:
+    """Build the configured feed, or None when backend is empty."""
+    if not backend:
+        return None
+    if backend == "postgres":
+        return PostgresChangeFeed(on_event, dsn, channel)
+    if backend == "file":
+        return FileChangeFeed(on_event, path)
+    raise ValueError(f"Unknown gallery change feed backend: {backend}")
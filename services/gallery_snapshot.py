@@ -0,0 +1,152 @@
+"""
+On-disk face gallery snapshot that API workers memory-map instead of reading every student row.
+
+Layout (little-endian):
+
+    0       header  magic "FGSNAP01", format version, dimension, row count,
+                    matrix offset, table offset, table length
+    4096    matrix  count x dimension float32, page aligned
+    ...     table   UTF-8 JSON with the student ids (one per matrix row),
+                    their index numbers and the updated_at watermark
+
+The matrix is mapped read-only with np.memmap, so every worker on the host
+shares one page-cache copy and a restart only has to parse the id table.
+Snapshots are written to a temporary file and renamed into place: readers see
+either the old or the new file, and a file that is already mapped stays valid.
+"""
+import json
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from services.face_index import EMBEDDING_DIMENSION, EMBEDDING_DTYPE
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, every worker may write
+    fcntl = None
+
+SNAPSHOT_MAGIC = b"FGSNAP01"
+SNAPSHOT_FORMAT = 1
+HEADER = struct.Struct("<8sIIQQQQ")
+MATRIX_ALIGNMENT = 4096
+
+
+class SnapshotError(ValueError):
+    """Raised for a snapshot file that is truncated, corrupt or in another format."""
+
+
+class GallerySnapshot(NamedTuple):
+    ids: List[str]
+    matrix: np.ndarray
+    index_numbers: Dict[str, str]
+    watermark: Optional[str]
+
+
+def snapshot_generation(path: str) -> Optional[Tuple[int, int]]:
+    """Identity of the file currently at path (inode, mtime), or None if there is none."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def write_snapshot(path: str, ids: List[str], matrix: np.ndarray,
+                   index_numbers: Dict[str, str], watermark: Optional[str]) -> int:
+    """Atomically write a snapshot and return its size in bytes."""
+    matrix = np.ascontiguousarray(matrix, dtype=EMBEDDING_DTYPE).reshape(-1, EMBEDDING_DIMENSION)
+    if matrix.shape[0] != len(ids):
+        raise SnapshotError(f"{len(ids)} ids for {matrix.shape[0]} embeddings")
+    table = json.dumps({
+        "ids": [str(student_id) for student_id in ids],
+        "index_numbers": {str(student_id): number for student_id, number in index_numbers.items()},
+        "watermark": watermark,
+    }).encode("utf-8")
+    table_offset = MATRIX_ALIGNMENT + matrix.nbytes
+    header = HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, EMBEDDING_DIMENSION, len(ids),
+                         MATRIX_ALIGNMENT, table_offset, len(table))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(prefix=".face_gallery.", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(header)
+            file.seek(MATRIX_ALIGNMENT)
+            file.write(matrix.tobytes())
+            file.write(table)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.unlink(temporary)
+        except FileNotFoundError:
+            pass
+        raise
+    return table_offset + len(table)
+
+
+def read_snapshot(path: str) -> GallerySnapshot:
+    """Map a snapshot read-only. Raises FileNotFoundError or SnapshotError."""
+    with open(path, "rb") as file:
+        header = file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise SnapshotError(f"{path} is truncated")
+        magic, file_format, dimension, count, matrix_offset, table_offset, table_length = HEADER.unpack(header)
+        if magic != SNAPSHOT_MAGIC or file_format != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"{path} is not a format {SNAPSHOT_FORMAT} face gallery snapshot")
+        if dimension != EMBEDDING_DIMENSION:
+            raise SnapshotError(f"{path} holds {dimension}-d embeddings, expected {EMBEDDING_DIMENSION}")
+        if table_offset != matrix_offset + count * dimension * EMBEDDING_DTYPE.itemsize:
+            raise SnapshotError(f"{path} has an inconsistent header")
+
+        file.seek(table_offset)
+        table = file.read(table_length)
+        if len(table) != table_length:
+            raise SnapshotError(f"{path} is truncated")
+        try:
+            meta = json.loads(table)
+        except ValueError as e:
+            raise SnapshotError(f"{path} has an unreadable id table: {str(e)}")
+        ids = meta.get("ids", [])
+        if len(ids) != count:
+            raise SnapshotError(f"{path} lists {len(ids)} ids for {count} embeddings")
+
+        if count:
+            # Mapped from the open descriptor, so a concurrent rename cannot swap the file underneath
+            matrix = np.memmap(file, dtype=EMBEDDING_DTYPE, mode="r", offset=matrix_offset,
+                               shape=(count, dimension)).view(np.ndarray)
+        else:
+            matrix = np.empty((0, dimension), dtype=EMBEDDING_DTYPE)
+
+    return GallerySnapshot(
+        ids=ids,
+        matrix=matrix,
+        index_numbers=meta.get("index_numbers") or {},
+        watermark=meta.get("watermark"),
+    )
+
+
+@contextmanager
+def snapshot_write_lock(path: str) -> Iterator[bool]:
+    """Try to become the one worker rewriting the snapshot; yields whether the lock was taken."""
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
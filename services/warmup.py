@@ -0,0 +1,85 @@
+"""
+Startup warm-up of the face stack.
+
+The first recognition after a deploy used to pay for dlib's first inference,
+executor worker start-up and the gallery fetch, right when an exam hall starts
+queueing. The lifespan handler runs warm_up() in the background instead and
+/ready reports 503 until it has finished, so a load balancer only routes
+traffic to warm workers.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from core.config import settings
+from core.supabase import supabase
+from services.face_executor import warm_up_executors
+from services.face_gallery import face_gallery, start_gallery_sync
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupState:
+    """Progress and timings of the startup warm-up, reported by /ready."""
+
+    def __init__(self):
+        self.ready = False
+        self.total_ms: Optional[float] = None
+        self.steps_ms: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.gallery_task: Optional[asyncio.Task] = None
+
+    def report(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "total_ms": self.total_ms,
+            "steps_ms": dict(self.steps_ms),
+            "errors": dict(self.errors),
+        }
+
+
+warmup_state = WarmupState()
+
+
+async def _timed(name: str, step):
+    """Await one warm-up step, recording its duration and any failure without aborting the warm-up."""
+    started = time.perf_counter()
+    result = None
+    try:
+        result = await step
+    except Exception as e:
+        warmup_state.errors[name] = str(e)
+        logger.error(f"Warm-up step {name} failed: {str(e)}")
+    warmup_state.steps_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+async def prime_room_galleries() -> int:
+    """Build the per-room sub-galleries that room-scoped recognition would otherwise build on first use."""
+    if not settings.EXAM_ROOM_SCOPED_RECOGNITION:
+        return 0
+    response = await asyncio.get_event_loop().run_in_executor(
+        None, lambda: supabase.table("exam_rooms").select("index_start, index_end").execute()
+    )
+    rooms = response.data or []
+    for room in rooms:
+        face_gallery.room_snapshot(room["index_start"], room["index_end"])
+    return len(rooms)
+
+
+async def warm_up() -> None:
+    """Load and exercise the face models, prime the gallery caches, then mark the service ready."""
+    started = time.perf_counter()
+    if settings.FACE_RECOGNITION_ENABLED:
+        models_ready = await _timed("face_models", warm_up_executors())
+        if models_ready is False:
+            warmup_state.errors["face_models"] = "face_recognition is not available"
+    # On a CRUD-only worker this only starts the change feed
+    warmup_state.gallery_task = await _timed("gallery", start_gallery_sync())
+    if settings.FACE_RECOGNITION_ENABLED:
+        await _timed("room_galleries", prime_room_galleries())
+
+    warmup_state.total_ms = round((time.perf_counter() - started) * 1000, 1)
+    warmup_state.ready = True
+    logger.info(f"Warm-up finished in {warmup_state.total_ms} ms: {warmup_state.steps_ms}")
@@ -0,0 +1,152 @@
+import asyncio
+import base64
+import threading
+import types
+import uuid
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from api.routers import exam_rooms
+from main import app
+from schemas.exam_rooms import ExamRoom
+
+client = TestClient(app)
+
+IMAGE = base64.b64encode(b"kiosk frame").decode("utf-8")
+
+@pytest.fixture
+def room_log(monkeypatch):
+    """Capture log_room_recognition calls instead of writing them to the database."""
+    entries = []
+
+    async def log_room_recognition(**entry):
+        entries.append(entry)
+
+    monkeypatch.setattr(exam_rooms, "log_room_recognition", log_room_recognition)
+    return entries
+
+@pytest.fixture
+def room(monkeypatch):
+    """Exam room A1 for index numbers 8551500-8551599; counts how often it is fetched."""
+    room = ExamRoom(id=uuid.uuid4(), room_code="A1", room_name="Great Hall", index_start="8551500", index_end="8551599",
+                    created_at="2024-05-01T08:00:00")
+    fetches = []
+
+    async def get_exam_room_by_code(room_code):
+        fetches.append(room_code)
+        return room if room_code == "A1" else None
+
+    monkeypatch.setattr(exam_rooms, "get_exam_room_by_code", get_exam_room_by_code)
+    return fetches
+
+def test_recognize_fetches_the_room_once(room, room_log, monkeypatch):
+    student_id = uuid.uuid4()
+    calls = []
+
+    async def recognize_face_candidates(image_data, index_range=None, **kwargs):
+        calls.append(index_range)
+        return {"candidates": [{"student_id": str(student_id)}], "best_distance": 0.3, "margin": 0.2,
+                "is_match": True, "is_ambiguous": False, "scope": "room"}
+
+    async def get_student_by_id(requested_id):
+        return types.SimpleNamespace(id=requested_id, name="Ama Mensah", index_number="8551521")
+
+    monkeypatch.setattr(exam_rooms, "recognize_face_candidates", recognize_face_candidates)
+    monkeypatch.setattr(exam_rooms, "get_student_by_id", get_student_by_id)
+
+    response = client.post("/exam-room/recognize", json={"face_image": IMAGE, "room_code": "A1"})
+    assert response.status_code == 200
+    result = response.json()["data"][0]
+    assert result["status"] == "valid" and result["room_name"] == "Great Hall"
+    assert room == ["A1"]
+    assert calls == [("8551500", "8551599")]
+    assert room_log[0]["student_id"] == student_id
+
+def test_multi_face_route_returns_one_result_per_face(room, room_log, monkeypatch):
+    students = {str(uuid.uuid4()): "8551521", str(uuid.uuid4()): "8551700"}
+
+    async def recognize_faces_in_image(image_data, index_range=None, **kwargs):
+        return [
+            {"candidates": [{"student_id": student_id}], "best_distance": 0.3, "margin": 0.2, "is_match": True,
+             "is_ambiguous": False, "scope": "room", "face_location": [40, 100 * (n + 1), 140, 100 * n]}
+            for n, student_id in enumerate(students)
+        ]
+
+    async def get_student_by_id(student_id):
+        return types.SimpleNamespace(id=student_id, name="Student", index_number=students[str(student_id)])
+
+    monkeypatch.setattr(exam_rooms, "recognize_faces_in_image", recognize_faces_in_image)
+    monkeypatch.setattr(exam_rooms, "get_student_by_id", get_student_by_id)
+
+    response = client.post("/exam-room/recognize/multi", json={"face_image": IMAGE, "room_code": "A1"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 2
+    assert [face["face_location"] for face in body["data"]] == [[40, 100, 140, 0], [40, 200, 140, 100]]
+    assert [face["status"] for face in body["data"]] == ["valid", "invalid"]
+    assert len(room_log) == 2 and room == ["A1"]
+
+def test_multi_face_route_passes_on_too_many_faces(room, room_log, monkeypatch):
+    async def recognize_faces_in_image(image_data, **kwargs):
+        raise exam_rooms.HTTPException(status_code=400, detail="Too many faces detected (6). At most 5 can be recognized at once")
+
+    monkeypatch.setattr(exam_rooms, "recognize_faces_in_image", recognize_faces_in_image)
+    response = client.post("/exam-room/recognize/multi", json={"face_image": IMAGE, "room_code": "A1"})
+    assert response.status_code == 400
+    assert room_log == []
+
+def test_verify_unknown_index_number_is_404(room_log, monkeypatch):
+    async def get_student_by_index_number(index_number):
+        return None
+
+    async def verify_face(*args, **kwargs):
+        raise AssertionError("no face job for an unregistered index number")
+
+    monkeypatch.setattr(exam_rooms, "get_student_by_index_number", get_student_by_index_number)
+    monkeypatch.setattr(exam_rooms, "verify_face", verify_face)
+
+    response = client.post("/exam-room/verify", json={"face_image": IMAGE, "room_code": "A1", "index_number": "9999999"})
+    assert response.status_code == 404
+    assert "9999999" in response.json()["detail"]
+    assert room_log[0]["status"] == "invalid" and room_log[0]["index_number"] == "9999999"
+
+def test_stream_keeps_only_the_latest_frame_while_busy(room, room_log, monkeypatch):
+    """Frames arriving while one is being recognized are replaced by the newest; the rest count as dropped."""
+    first_started = threading.Event()
+    release = threading.Event()
+    processed = []
+
+    async def analyze_frame(frame, **kwargs):
+        processed.append(frame)
+        if frame == b"frame-1":
+            first_started.set()
+            while not release.is_set():
+                await asyncio.sleep(0.005)
+        return {"error": None, "face_locations": [(40, 140, 140, 40)], "face_encodings": [np.zeros(128)]}
+
+    async def match_embeddings(embeddings, **kwargs):
+        return [{"candidates": [], "best_distance": 0.9, "margin": None, "is_match": False,
+                 "is_ambiguous": False, "scope": "room"}]
+
+    monkeypatch.setattr(exam_rooms, "analyze_frame", analyze_frame)
+    monkeypatch.setattr(exam_rooms, "match_embeddings", match_embeddings)
+
+    with client.websocket_connect("/exam-room/stream/A1") as websocket:
+        websocket.send_bytes(b"frame-1")
+        assert first_started.wait(5)
+        for n in (2, 3, 4):
+            websocket.send_bytes(f"frame-{n}".encode())
+        # Give the receiver time to queue the frames before the first one finishes
+        threading.Event().wait(0.2)
+        release.set()
+
+        first, latest = websocket.receive_json(), websocket.receive_json()
+
+    assert first["frame"] == 1
+    assert (latest["frame"], latest["dropped_frames"]) == (4, 2)
+    assert processed == [b"frame-1", b"frame-4"]
+    assert first["track_id"] == latest["track_id"]
+    # One log row for the track when the stream closes
+    assert len(room_log) == 1
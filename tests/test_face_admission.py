@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from services.face_admission import AdmissionController, Deadline, FaceJobExpired, FaceQueueFull
+
+def test_rejects_when_class_queue_is_full():
+    """Jobs beyond the free slots wait up to the class limit; the next one is rejected with Retry-After."""
+    controller = AdmissionController(1, {"room": 1, "preview": 0}, initial_service_time=2.5)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def job(workload):
+            async with controller.admit(workload):
+                await release.wait()
+
+        running = asyncio.create_task(job("room"))
+        waiting = asyncio.create_task(job("room"))
+        await asyncio.sleep(0)
+        assert controller.queues["room"].waiting == 1
+
+        with pytest.raises(FaceQueueFull) as rejected:
+            async with controller.admit("room"):
+                pass
+        assert rejected.value.status_code == 503
+        assert rejected.value.headers["Retry-After"] == "5"
+
+        # A class with no waiting line is still turned away while every slot is busy
+        with pytest.raises(FaceQueueFull):
+            async with controller.admit("preview"):
+                pass
+
+        release.set()
+        await asyncio.gather(running, waiting)
+
+    asyncio.run(scenario())
+    stats = controller.stats()
+    assert stats["free_slots"] == 1
+    assert stats["classes"]["room"]["admitted"] == 2
+    assert stats["classes"]["room"]["rejected"] == 1
+    assert stats["classes"]["room"]["queue_depth"] == 0
+    assert stats["classes"]["preview"]["rejected"] == 1
+
+def test_rejects_when_estimated_wait_exceeds_budget():
+    controller = AdmissionController(1, {"batch": 100}, max_wait=1.0, initial_service_time=0.6)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def job():
+            async with controller.admit("batch"):
+                await release.wait()
+
+        tasks = [asyncio.create_task(job()) for _ in range(2)]
+        await asyncio.sleep(0)
+        # One running and one waiting: a third job would wait about two service times
+        with pytest.raises(FaceQueueFull):
+            async with controller.admit("batch"):
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_gives_up_its_place():
+    controller = AdmissionController(1, {"room": 10})
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def job():
+            async with controller.admit("room"):
+                await release.wait()
+
+        running = asyncio.create_task(job())
+        abandoned = asyncio.create_task(job())
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        await asyncio.sleep(0)
+        assert controller.queues["room"].waiting == 0
+
+        release.set()
+        await running
+        async with controller.admit("room"):
+            assert controller.stats()["free_slots"] == 0
+
+    asyncio.run(scenario())
+    assert controller.stats()["free_slots"] == 1
+
+def test_slots_go_to_rooms_first_and_round_robin_between_rooms():
+    """Previews wait behind room work; within the room level a busy room does not starve another one."""
+    controller = AdmissionController(1, {"room": 10, "registration": 10, "preview": 10})
+    started = []
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def job(name, workload, room_code=None):
+            async with controller.admit(workload, room_code):
+                started.append(name)
+                if name == "first":
+                    await gate.wait()
+
+        tasks = [asyncio.create_task(job("first", "registration"))]
+        await asyncio.sleep(0)
+        for name, workload, room_code in [
+            ("preview", "preview", None),
+            ("registration", "registration", None),
+            ("A1", "room", "A"), ("A2", "room", "A"), ("A3", "room", "A"),
+            ("B1", "room", "B"),
+        ]:
+            tasks.append(asyncio.create_task(job(name, workload, room_code)))
+            await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert started == ["first", "A1", "B1", "A2", "A3", "registration", "preview"]
+    stats = controller.stats()["classes"]
+    assert stats["room"]["priority"] < stats["registration"]["priority"] < stats["preview"]["priority"]
+    assert stats["preview"]["p50_wait_ms"] <= stats["preview"]["p99_wait_ms"]
+    assert stats["preview"]["p99_wait_ms"] >= stats["room"]["p99_wait_ms"]
+
+def test_abandoned_jobs_are_dropped_before_they_start():
+    """A job that expires while waiting, or whose client has gone, never takes a slot."""
+    controller = AdmissionController(1, {"room": 10})
+
+    async def disconnected():
+        return True
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def job(deadline=None):
+            async with controller.admit("room", deadline=deadline):
+                await release.wait()
+
+        running = asyncio.create_task(job())
+        await asyncio.sleep(0)
+        with pytest.raises(FaceJobExpired):
+            await job(Deadline(0.01))
+        with pytest.raises(FaceJobExpired):
+            await job(Deadline(-1))
+        release.set()
+        await running
+        with pytest.raises(FaceJobExpired):
+            await job(Deadline(10, disconnected))
+
+    asyncio.run(scenario())
+    stats = controller.stats()
+    assert stats["free_slots"] == 1
+    assert stats["classes"]["room"]["admitted"] == 1
+    assert stats["wasted_work"]["dropped_before_start"] == {"expired": 2, "disconnected": 1}
@@ -0,0 +1,48 @@
+import numpy as np
+from services.face_cache import ENTRY_OVERHEAD_BYTES, EmbeddingCache
+
+def analysis(faces=1):
+    return {
+        "error": None,
+        "face_locations": [(0, 10, 10, 0)] * faces,
+        "face_encodings": [np.zeros(128) for _ in range(faces)],
+        "image_dimensions": (100, 100),
+    }
+
+def test_keys_depend_on_bytes_and_options():
+    """Identical bytes share a key; different bytes or pipeline options do not."""
+    assert EmbeddingCache.make_key(b"frame", 800) == EmbeddingCache.make_key(b"frame", 800)
+    assert EmbeddingCache.make_key(b"frame", 800) != EmbeddingCache.make_key(b"frame", 640)
+    assert EmbeddingCache.make_key(b"frame") != EmbeddingCache.make_key(b"other")
+
+def test_hits_misses_and_read_only_embeddings():
+    """Lookups are counted and cached embeddings cannot be mutated by a caller."""
+    cache = EmbeddingCache(max_bytes=1024 * 1024)
+    assert cache.get("a") is None
+    cache.put("a", analysis())
+    cached = cache.get("a")
+    assert cached is not None
+    assert not cached["face_encodings"][0].flags.writeable
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_rate"] == 50.0
+
+def test_evicts_least_recently_used_within_budget():
+    """Entries are evicted oldest-use first once the memory budget is exceeded."""
+    size = EmbeddingCache.entry_size(analysis())
+    cache = EmbeddingCache(max_bytes=2 * size)
+    cache.put("a", analysis())
+    cache.put("b", analysis())
+    cache.get("a")
+    cache.put("c", analysis())
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.current_bytes == 2 * size
+    assert cache.evictions == 1
+
+    # An entry larger than the whole budget is not cached at all
+    cache.put("big", analysis(faces=10))
+    assert cache.get("big") is None
+    assert size > ENTRY_OVERHEAD_BYTES
@@ -0,0 +1,55 @@
+import asyncio
+import types
+from io import BytesIO
+from multiprocessing import shared_memory
+
+import pytest
+from PIL import Image
+
+from services import face_executor, face_pipeline
+from services.face_executor import create_pipeline_executor, run_pipeline_job
+
+def encode_image(width, height):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), (120, 90, 60)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+@pytest.fixture(scope="module")
+def process_executor():
+    executor = create_pipeline_executor("process", 1)
+    yield executor
+    executor.shutdown()
+
+@pytest.fixture
+def segments(monkeypatch):
+    """Names of the shared memory blocks run_pipeline_job creates."""
+    names = []
+
+    class RecordingSharedMemory(shared_memory.SharedMemory):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            names.append(self.name)
+
+    monkeypatch.setattr(face_executor, "shared_memory", types.SimpleNamespace(SharedMemory=RecordingSharedMemory))
+    return names
+
+def assert_unlinked(name):
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+def test_process_job_reads_the_image_from_shared_memory(process_executor, segments):
+    decoded = asyncio.run(run_pipeline_job(
+        face_pipeline.decode_image, encode_image(2000, 1500), 600, executor=process_executor
+    ))
+    assert decoded.error is None
+    assert decoded.original_size == (2000, 1500)
+    assert decoded.pixels.shape == (750, 1000, 3)
+    assert len(segments) == 1
+    assert_unlinked(segments[0])
+
+def test_failed_process_job_still_unlinks_its_segment(process_executor, segments):
+    # detect_faces expects a decoded array, so the worker raises on raw bytes
+    with pytest.raises(Exception):
+        asyncio.run(run_pipeline_job(face_pipeline.detect_faces, b"not pixels", executor=process_executor))
+    assert len(segments) == 1
+    assert_unlinked(segments[0])
@@ -0,0 +1,176 @@
+import asyncio
+import types
+
+import numpy as np
+import pytest
+
+from services import face_gallery as gallery_module
+from services.face_gallery import FaceGallery, apply_gallery_event, remove_gallery_student, refresh_gallery_student
+from services.face_index import encode_embedding
+from services.gallery_events import GalleryEvent
+
+def student_row(student_id, index_number, seed, updated_at):
+    vector = np.random.default_rng(seed).normal(size=128).astype(np.float32)
+    return {"id": student_id, "index_number": index_number, "face_embedding": [],
+            "face_embedding_b64": encode_embedding(vector), "updated_at": updated_at}
+
+class FakeStudentsTable:
+    """Just enough of the Supabase query builder for the gallery's paginated selects."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.selects = 0
+
+    def table(self, name):
+        assert name == "students"
+        return FakeQuery(self)
+
+class FakeQuery:
+    def __init__(self, table):
+        self.table = table
+        self.rows = list(table.rows)
+        self.start, self.end = 0, None
+        self.columns = None
+
+    def select(self, columns):
+        self.table.selects += 1
+        self.columns = [column.strip() for column in columns.split(",")]
+        return self
+
+    def gte(self, column, value):
+        self.rows = [row for row in self.rows if row[column] >= value]
+        return self
+
+    def eq(self, column, value):
+        self.rows = [row for row in self.rows if str(row[column]) == value]
+        return self
+
+    def order(self, column):
+        self.rows.sort(key=lambda row: row[column])
+        return self
+
+    def range(self, start, end):
+        self.start, self.end = start, end
+        return self
+
+    def execute(self):
+        end = None if self.end is None else self.end + 1
+        rows = [{column: row.get(column) for column in self.columns} for row in self.rows[self.start:end]]
+        return types.SimpleNamespace(data=rows)
+
+@pytest.fixture
+def students(monkeypatch):
+    table = FakeStudentsTable([
+        {"id": "s3", "index_number": "8551523", "face_embedding": [], "face_embedding_b64": None,
+         "updated_at": "2024-05-01T08:00:00"},
+        student_row("s1", "8551521", 1, "2024-05-01T09:00:00"),
+        student_row("s2", "8551522", 2, "2024-05-01T10:00:00"),
+    ])
+    monkeypatch.setattr(gallery_module, "supabase", table)
+    monkeypatch.setattr(gallery_module.settings, "FACE_EMBEDDING_FORMAT", "base64")
+    return table
+
+def test_full_load_indexes_students_with_embeddings(students):
+    gallery = FaceGallery()
+    assert asyncio.run(gallery.load()) == 2
+    assert gallery.is_loaded and len(gallery) == 2
+    assert gallery.watermark == "2024-05-01T10:00:00"
+    assert gallery.get_index_number("s2") == "8551522"
+    assert gallery.get_embedding("s3") is None
+
+def test_base64_mode_still_loads_rows_the_backfill_missed(students):
+    legacy = np.random.default_rng(4).normal(size=128).astype(np.float32)
+    students.rows.append({"id": "s4", "index_number": "8551524", "face_embedding": legacy.tolist(),
+                          "face_embedding_b64": None, "updated_at": "2024-05-01T07:00:00"})
+    gallery = FaceGallery()
+    assert asyncio.run(gallery.load()) == 3
+    assert np.allclose(gallery.get_embedding("s4"), legacy)
+
+def test_concurrent_first_requests_share_one_load(students):
+    gallery = FaceGallery()
+
+    async def scenario():
+        await asyncio.gather(*(gallery.ensure_loaded() for _ in range(5)))
+
+    asyncio.run(scenario())
+    assert students.selects == 1
+    assert len(gallery) == 2
+
+def test_delta_sync_without_changes_leaves_gallery_untouched(students):
+    """Rows at the watermark come back on every sync; they must not count as changes or invalidate rooms."""
+    gallery = FaceGallery()
+    asyncio.run(gallery.load())
+    room = gallery.room_snapshot("8551500", "8551599")
+    version = gallery._version
+
+    for _ in range(3):
+        assert asyncio.run(gallery.sync()) == 0
+    assert gallery._version == version
+    assert gallery.room_snapshot("8551500", "8551599") is room
+    assert len(gallery.snapshot().ids) == 2
+
+    students.rows.append(student_row("s1", "8551521", 7, "2024-05-01T11:00:00"))
+    assert asyncio.run(gallery.sync()) == 1
+    assert gallery._version == version + 1
+    assert len(gallery) == 2
+    assert gallery.watermark == "2024-05-01T11:00:00"
+
+def test_crud_hooks_refresh_and_remove_students(students, monkeypatch):
+    gallery = FaceGallery()
+    monkeypatch.setattr(gallery_module, "face_gallery", gallery)
+    monkeypatch.setattr(gallery_module, "change_feed", None)
+
+    refresh_gallery_student(student_row("s9", "8551529", 9, "2024-05-02T08:00:00"))
+    assert gallery.get_index_number("s9") == "8551529"
+    assert gallery.get_embedding("s9") is not None
+
+    refresh_gallery_student({"id": "s9", "index_number": "8551529", "face_embedding": [], "face_embedding_b64": None})
+    assert gallery.get_embedding("s9") is None
+
+    refresh_gallery_student(student_row("s9", "8551529", 9, "2024-05-02T09:00:00"))
+    remove_gallery_student("s9")
+    assert len(gallery) == 0
+    assert gallery.get_index_number("s9") is None
+
+def test_crud_refresh_does_not_move_the_sync_watermark(students, monkeypatch):
+    """A local write must not hide another worker's earlier write from the next delta sync."""
+    gallery = FaceGallery()
+    asyncio.run(gallery.load())
+    monkeypatch.setattr(gallery_module, "face_gallery", gallery)
+    monkeypatch.setattr(gallery_module, "change_feed", None)
+
+    other_worker = student_row("s5", "8551525", 5, "2024-05-01T10:00:05")
+    students.rows.append(other_worker)
+    local = student_row("s6", "8551526", 6, "2024-05-01T10:00:10")
+    students.rows.append(local)
+    refresh_gallery_student(local)
+    assert gallery.watermark == "2024-05-01T10:00:00"
+
+    asyncio.run(gallery.sync())
+    assert gallery.get_embedding("s5") is not None
+    assert gallery.watermark == "2024-05-01T10:00:10"
+
+def test_crud_only_worker_ignores_change_feed_events(monkeypatch):
+    gallery = FaceGallery()
+    monkeypatch.setattr(gallery_module, "face_gallery", gallery)
+    event = GalleryEvent(op="upsert", student_id="s7", index_number="8551527",
+                         embedding=encode_embedding(np.ones(128)), origin="other-worker")
+
+    monkeypatch.setattr(gallery_module.settings, "FACE_RECOGNITION_ENABLED", False)
+    apply_gallery_event(event)
+    assert len(gallery) == 0
+
+    monkeypatch.setattr(gallery_module.settings, "FACE_RECOGNITION_ENABLED", True)
+    apply_gallery_event(event)
+    assert gallery.get_index_number("s7") == "8551527"
+
+def test_room_snapshot_selects_students_by_index_number(students):
+    gallery = FaceGallery()
+    asyncio.run(gallery.load())
+    gallery.apply_rows([student_row("s4", "8551600", 4, None), student_row("s5", None, 5, None)])
+    assert sorted(gallery.room_snapshot("8551500", "8551599").ids) == ["s1", "s2"]
+
+    # A student moved out of the room's range leaves its sub-gallery
+    gallery.apply_rows([student_row("s2", "8551700", 2, None)])
+    assert list(gallery.room_snapshot("8551500", "8551599").ids) == ["s1"]
+    assert list(gallery.room_snapshot("8551600", "8551799").ids) == ["s4", "s2"]
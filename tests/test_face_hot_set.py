@@ -0,0 +1,39 @@
+import numpy as np
+
+from services.face_hot_set import RecentMatches
+
+def unit(seed):
+    vector = np.random.default_rng(seed).normal(size=128)
+    return (vector / np.linalg.norm(vector) * 0.6).astype(np.float32)
+
+def test_confident_recent_match_is_a_hit_per_room():
+    hot = RecentMatches(capacity=4, max_distance=0.4, min_margin=0.05)
+    hot.record("A", "s1", unit(1))
+    hot.record("A", "s2", unit(2))
+
+    query = unit(1) + np.float32(0.001)
+    assert hot.lookup("A", query)[0][0] == "s1"
+    # Other rooms keep their own recent students
+    assert hot.lookup("B", query) == [None]
+    # A stranger is not close enough to anyone recent
+    assert hot.lookup("A", unit(3)) == [None]
+    assert hot.stats()["hits"] == 1
+    assert hot.stats()["hit_rate"] == round(100 / 3, 2)
+
+def test_capacity_evicts_least_recent_and_stale_students_are_dropped():
+    hot = RecentMatches(capacity=2, max_distance=0.4, min_margin=0.05)
+    for seed in (1, 2, 3):
+        hot.record("A", f"s{seed}", unit(seed))
+    assert hot.lookup("A", unit(1)) == [None]
+    assert hot.lookup("A", unit(3))[0][0] == "s3"
+
+    assert hot.lookup("A", unit(3), is_current=lambda student_id: student_id != "s3") == [None]
+    assert hot.stats()["entries"] == 1
+
+def test_near_tie_between_recent_students_is_not_a_hit():
+    """Two recent students equally close to the face: leave it to the full gallery search."""
+    hot = RecentMatches(capacity=4, max_distance=0.4, min_margin=0.05)
+    base = unit(1)
+    hot.record("A", "s1", base)
+    hot.record("A", "twin", base + np.float32(0.002))
+    assert hot.lookup("A", base + np.float32(0.001)) == [None]
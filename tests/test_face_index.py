@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+from services.face_index import (
+    EMBEDDING_DIMENSION, FaceIndex, FaceMatcher, decode_embedding, encode_embedding, int8_scale, quantize
+)
+
+@pytest.fixture
+def gallery():
+    """Random unit-norm embeddings standing in for stored students."""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, EMBEDDING_DIMENSION))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_matcher_matches_exact_euclidean_search(gallery):
+    """Matcher top-k equals a direct Euclidean computation."""
+    matcher = FaceMatcher(gallery)
+    query = gallery[17] + 0.01
+    indices, distances = matcher.search(query, k=5)
+
+    expected = np.linalg.norm(gallery - query, axis=1)
+    assert indices.shape == (1, 5)
+    assert list(indices[0]) == list(np.argsort(expected)[:5])
+    assert np.allclose(distances[0], np.sort(expected)[:5], atol=1e-4)
+
+def test_matcher_batch_queries(gallery):
+    """Several queries are answered row by row in one call."""
+    matcher = FaceMatcher(gallery)
+    indices, distances = matcher.search(gallery[[3, 50, 199]], k=1)
+    assert list(indices[:, 0]) == [3, 50, 199]
+    assert np.allclose(distances[:, 0], 0.0, atol=1e-3)
+
+def test_matcher_clips_k_and_handles_empty_gallery(gallery):
+    """k larger than the gallery is clipped, and an empty gallery returns no candidates."""
+    indices, _ = FaceMatcher(gallery[:3]).search(gallery[0], k=10)
+    assert indices.shape == (1, 3)
+
+    empty = FaceMatcher(np.empty((0, EMBEDDING_DIMENSION), dtype=np.float32))
+    indices, distances = empty.search(gallery[0], k=1)
+    assert indices.shape == (1, 0)
+    assert distances.shape == (1, 0)
+
+def test_index_add_remove_and_replace(gallery):
+    """Writes are visible to queries without rebuilding the index."""
+    index = FaceIndex(initial_capacity=4)
+    for i in range(10):
+        index.add(f"student-{i}", gallery[i])
+    assert len(index) == 10
+    assert index.capacity >= 10
+    assert index.query(gallery[4], k=1)[0][0] == "student-4"
+
+    assert index.remove("student-4")
+    assert not index.remove("student-4")
+    assert index.query(gallery[4], k=1)[0][0] != "student-4"
+
+    # Replacing a student's embedding moves their match to the new vector
+    index.add("student-5", gallery[4])
+    assert index.query(gallery[4], k=1)[0][0] == "student-5"
+    assert len(index) == 9
+
+def test_index_compacts_tombstones(gallery):
+    """Enough removals trigger compaction while keeping every live student searchable."""
+    index = FaceIndex.from_vectors([f"s{i}" for i in range(100)], gallery[:100], min_compaction=8)
+    for i in range(0, 100, 2):
+        index.remove(f"s{i}")
+    assert index.tombstones < 50
+    assert len(index) == 50
+    for i in range(1, 100, 2):
+        assert index.query(gallery[i], k=1)[0][0] == f"s{i}"
+
+def test_snapshot_is_isolated_from_later_writes(gallery):
+    """A snapshot keeps answering from the state it captured."""
+    index = FaceIndex(initial_capacity=2)
+    index.add("a", gallery[0])
+    snapshot = index.snapshot()
+    index.remove("a")
+    index.add("b", gallery[0])
+    index.add("c", gallery[1])
+
+    ids, _ = snapshot.search(gallery[0], k=5)
+    assert list(ids[0]) == ["a"]
+    assert [student_id for student_id, _ in index.query(gallery[0], k=5)] == ["b", "c"]
+
+def test_snapshot_subset_searches_only_selected_rows(gallery):
+    """A roster subset answers only from its own rows."""
+    index = FaceIndex.from_vectors([f"s{i}" for i in range(100)], gallery[:100])
+    index.remove("s5")
+    snapshot = index.snapshot()
+    room = snapshot.subset([i for i in np.flatnonzero(snapshot.alive) if 10 <= i < 20])
+
+    assert len(room) == 10
+    ids, _ = room.search(gallery[15], k=1)
+    assert ids[0][0] == "s15"
+    ids, _ = room.search(gallery[50], k=3)
+    assert all(10 <= int(student_id[1:]) < 20 for student_id in ids[0])
+
+def test_embedding_base64_roundtrip(gallery):
+    """Embeddings survive base64 float32 storage and decode into a preallocated row."""
+    encoded = encode_embedding(gallery[5])
+    assert len(encoded) == 684
+    assert np.allclose(decode_embedding(encoded), gallery[5], atol=1e-6)
+
+    matrix = np.zeros((2, EMBEDDING_DIMENSION), dtype=np.float32)
+    decode_embedding(encoded, out=matrix[1])
+    assert np.allclose(matrix[1], gallery[5], atol=1e-6)
+    assert not matrix[0].any()
+
+def test_decode_embedding_rejects_malformed_values():
+    """Missing, non-base64 and wrong-length values decode to None."""
+    assert decode_embedding(None) is None
+    assert decode_embedding("") is None
+    assert decode_embedding("not base64!") is None
+    assert decode_embedding(encode_embedding(np.zeros(64))) is None
+
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_quantized_index_matches_exact_search(gallery, mode):
+    """The compressed first pass plus float32 re-rank returns the exact top-k and distances."""
+    ids = [f"s{i}" for i in range(len(gallery))]
+    exact = FaceIndex.from_vectors(ids, gallery)
+    quantized = FaceIndex.from_base(ids, gallery, quantization=mode, rerank=16)
+    quantized.remove("s3")
+    exact.remove("s3")
+    quantized.add("new", gallery[7] + 0.005)
+    exact.add("new", gallery[7] + 0.005)
+
+    queries = gallery[[3, 7, 50, 199]] + 0.01
+    for expected, actual in zip(exact.query_batch(queries, k=5), quantized.query_batch(queries, k=5)):
+        assert [student_id for student_id, _ in actual] == [student_id for student_id, _ in expected]
+        assert np.allclose([d for _, d in actual], [d for _, d in expected], atol=1e-5)
+
+def test_quantized_base_keeps_only_codes_in_memory(gallery):
+    """Re-ranking reads the base rows in place; private rows are never quantized."""
+    base = gallery.astype(np.float32)
+    index = FaceIndex.from_base([f"s{i}" for i in range(len(base))], base, quantization="int8")
+    index.add("new", base[0] + 0.01)
+    matcher = index.snapshot().matcher
+    assert matcher.base.codes.dtype == np.int8
+    assert np.shares_memory(matcher.base.matrix, base)
+    assert not hasattr(matcher.delta, "codes")
+    assert not hasattr(FaceIndex(quantization="int8"), "_codes")
+
+def test_int8_codes_stay_within_one_step(gallery):
+    """int8 codes reconstruct each component to within half a per-dimension step."""
+    scale = int8_scale(gallery)
+    codes = quantize(gallery, "int8", scale)
+    assert codes.dtype == np.int8
+    assert np.all(np.abs(codes * scale - gallery) <= scale / 2 + 1e-7)
+
+def test_unknown_quantization_mode_is_rejected():
+    with pytest.raises(ValueError):
+        FaceIndex(quantization="int4")
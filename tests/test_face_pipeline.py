@@ -0,0 +1,135 @@
+import types
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+from services import face_pipeline
+from services.face_pipeline import analyze_image, decode_image, detect_faces, scale_box
+
+def encode_image(width, height, format="JPEG"):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), (120, 90, 60)).save(buffer, format=format)
+    return buffer.getvalue()
+
+@pytest.fixture
+def fake_detector(monkeypatch):
+    """Stand-in for face_recognition that records the image sizes it is asked to search."""
+    seen = []
+
+    def face_locations(image, number_of_times_to_upsample=1, model="hog"):
+        height, width = image.shape[:2]
+        seen.append((width, height))
+        # One face covering the middle half of whatever image it is given
+        return [(height // 4, 3 * width // 4, 3 * height // 4, width // 4)]
+
+    def face_encodings(image, known_face_locations, num_jitters=1, model="small"):
+        return [np.zeros(128) for _ in known_face_locations]
+
+    fake = types.SimpleNamespace(face_locations=face_locations, face_encodings=face_encodings)
+    monkeypatch.setattr(face_pipeline, "face_recognition", fake, raising=False)
+    return seen
+
+def test_scale_box_clips_to_image():
+    """Scaled boxes stay inside the full-resolution image."""
+    assert scale_box((10, 90, 60, 5), 2.0, 1000, 1000) == (20, 180, 120, 10)
+    assert scale_box((10, 90, 60, 5), 5.0, 400, 250) == (50, 400, 250, 25)
+
+def test_detect_faces_downscales_and_maps_boxes_back(fake_detector):
+    """Detection runs on the reduced copy and boxes come back in full-resolution coordinates."""
+    image = np.zeros((3000, 4000, 3), dtype=np.uint8)
+    locations = detect_faces(image, max_dimension=800)
+
+    assert fake_detector == [(800, 600)]
+    assert locations == [(750, 3000, 2250, 1000)]
+
+def test_detect_faces_keeps_small_images_at_full_resolution(fake_detector):
+    """Images already within the limit, or a limit of 0, are searched as-is."""
+    image = np.zeros((300, 400, 3), dtype=np.uint8)
+    detect_faces(image, max_dimension=800)
+    detect_faces(image, max_dimension=0)
+    assert fake_detector == [(400, 300), (400, 300)]
+
+def test_decode_image_uses_jpeg_draft_scale():
+    """Large JPEGs decode at a reduced DCT scale that stays above the requested size."""
+    decoded = decode_image(encode_image(2000, 1500), max_dimension=600)
+    assert decoded.error is None
+    assert decoded.original_size == (2000, 1500)
+    assert decoded.pixels.shape == (750, 1000, 3)
+    assert decoded.scale == 2.0
+
+    full = decode_image(encode_image(2000, 1500, format="PNG"), max_dimension=600)
+    assert full.pixels.shape == (1500, 2000, 3)
+
+def test_decode_image_rejects_invalid_uploads():
+    """Validation errors are reported without decoding."""
+    assert decode_image(b"").error == "Empty image data provided"
+    assert decode_image(encode_image(40, 40)).error.startswith("Image dimensions too small")
+    assert decode_image(b"not an image").error.startswith("Invalid image format")
+
+def test_analyze_image_reports_boxes_in_upload_coordinates(fake_detector):
+    """Detection and encoding share one reduced decode; boxes are reported against the upload."""
+    analysis = analyze_image(encode_image(2000, 1500), decode_max_dimension=600)
+
+    assert fake_detector == [(1000, 750)]
+    assert analysis["image_dimensions"] == (2000, 1500)
+    assert analysis["face_locations"] == [(374, 1500, 1124, 500)]
+    assert len(analysis["face_encodings"]) == 1
+
+def test_analyze_image_skips_encoding_tracked_faces(fake_detector):
+    """Faces overlapping an already identified box are detected but not encoded."""
+    analysis = analyze_image(encode_image(400, 300), skip_boxes=[(75, 300, 225, 100)])
+    assert len(analysis["face_locations"]) == 1
+    assert analysis["face_encodings"] == [None]
+
+    analysis = analyze_image(encode_image(400, 300), skip_boxes=[(0, 40, 40, 0)])
+    assert analysis["face_encodings"][0] is not None
+
+def test_warm_up_models_runs_detector_and_encoder(fake_detector, monkeypatch):
+    """Warm-up exercises detection and encoding once, and reports missing models."""
+    assert face_pipeline.warm_up_models() is True
+    assert fake_detector == [(160, 160)]
+
+    monkeypatch.setattr(face_pipeline, "face_recognition", None)
+    monkeypatch.setattr(face_pipeline, "_models_error", "No module named 'face_recognition'")
+    assert face_pipeline.face_models_available() is False
+    assert face_pipeline.warm_up_models() is False
+
+def test_analyze_image_stops_at_the_deadline(fake_detector):
+    """Stages that would start after the deadline are skipped with DeadlineExceeded naming the stage."""
+    with pytest.raises(face_pipeline.DeadlineExceeded) as exceeded:
+        analyze_image(encode_image(640, 480), deadline=0.0)
+    assert exceeded.value.stage == "decode"
+    assert fake_detector == []
+
+def test_analyze_image_applies_profile_settings(monkeypatch):
+    """A profile's upsample, landmark model and jitters reach the detector and encoder."""
+    calls = []
+
+    def face_locations(image, number_of_times_to_upsample=1, model="hog"):
+        calls.append(("detect", image.shape[1], number_of_times_to_upsample))
+        return [(10, 90, 90, 10)]
+
+    def face_encodings(image, known_face_locations, num_jitters=1, model="small"):
+        calls.append(("encode", num_jitters, model))
+        return [np.zeros(128) for _ in known_face_locations]
+
+    fake = types.SimpleNamespace(face_locations=face_locations, face_encodings=face_encodings)
+    monkeypatch.setattr(face_pipeline, "face_recognition", fake, raising=False)
+
+    profile = face_pipeline.resolve_profile("enrollment", {"detection_max_dimension": 500})
+    analyze_image(encode_image(1000, 750), **profile._asdict())
+    assert calls == [("detect", 500, 1), ("encode", 5, "large")]
+
+    calls.clear()
+    analyze_image(encode_image(1000, 750), **face_pipeline.PIPELINE_PROFILES["fast"]._asdict())
+    assert calls == [("detect", 640, 0), ("encode", 1, "small")]
+
+def test_resolve_profile_rejects_unknown_names_and_fields():
+    with pytest.raises(ValueError):
+        face_pipeline.resolve_profile("accurate")
+    with pytest.raises(ValueError):
+        face_pipeline.resolve_profile("fast", {"jitters": 3})
+    with pytest.raises(ValueError):
+        face_pipeline.resolve_profile("fast", {"landmark_model": "medium"})
+    assert face_pipeline.resolve_profile("fast", {"upsample": 1}).upsample == 1
@@ -0,0 +1,179 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from services import face_recognition as recognition
+from services.face_admission import FaceQueueFull
+from services.face_gallery import FaceGallery
+from services.face_hot_set import RecentMatches
+
+def unit_vector(seed):
+    vector = np.random.default_rng(seed).normal(size=128).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+@pytest.fixture
+def gallery(monkeypatch):
+    """A loaded in-memory gallery of three students (8551521-8551523) and no recent matches."""
+    gallery = FaceGallery()
+    gallery.apply_rows([
+        {"id": f"s{n}", "index_number": f"855152{n}", "face_embedding": unit_vector(n).tolist()}
+        for n in (1, 2, 3)
+    ])
+    gallery._loaded = True
+    monkeypatch.setattr(recognition, "face_gallery", gallery)
+    monkeypatch.setattr(recognition, "recent_matches", RecentMatches(0, 0.45, 0.05))
+    return gallery
+
+@pytest.fixture
+def models(monkeypatch):
+    """Pretend the face models are installed; each test stubs the pipeline stages it needs."""
+    monkeypatch.setattr(recognition, "face_models_available", lambda: True)
+
+def test_verify_face_matches_and_rejects_against_the_claimed_student(models, monkeypatch):
+    reference = unit_vector(1)
+
+    async def lookup_embedding(student_id):
+        return reference
+
+    probes = iter([reference + 0.01, unit_vector(2)])
+
+    async def extract_face_embedding(image_data, workload, room_code, deadline):
+        assert workload == "room" and room_code == "A1"
+        return next(probes)
+
+    monkeypatch.setattr(recognition.face_gallery, "lookup_embedding", lookup_embedding)
+    monkeypatch.setattr(recognition, "extract_face_embedding", extract_face_embedding)
+
+    match = asyncio.run(recognition.verify_face(b"image", "s1", room_code="A1"))
+    assert match["is_match"] is True and match["distance"] < 0.2
+
+    mismatch = asyncio.run(recognition.verify_face(b"image", "s1", room_code="A1"))
+    assert mismatch["is_match"] is False and mismatch["distance"] > recognition.settings.FACE_RECOGNITION_THRESHOLD
+
+def test_verify_face_without_reference_skips_the_pipeline(models, monkeypatch):
+    async def lookup_embedding(student_id):
+        return None
+
+    async def extract_face_embedding(*args):
+        raise AssertionError("the image must not be processed without a reference embedding")
+
+    monkeypatch.setattr(recognition.face_gallery, "lookup_embedding", lookup_embedding)
+    monkeypatch.setattr(recognition, "extract_face_embedding", extract_face_embedding)
+
+    result = asyncio.run(recognition.verify_face(b"image", "s1"))
+    assert result == {"student_id": "s1", "distance": None, "is_match": False}
+
+def test_room_search_falls_back_to_the_whole_gallery(gallery):
+    """Faces are matched within the room's range first; one without a match there is searched globally."""
+    queries = np.vstack([unit_vector(1) + 0.01, unit_vector(3) + 0.01])
+    in_room, elsewhere = asyncio.run(recognition.match_embeddings(queries, k=2, index_range=("8551521", "8551522")))
+
+    assert in_room["scope"] == "room" and in_room["candidates"][0]["student_id"] == "s1"
+    assert [candidate["student_id"] for candidate in in_room["candidates"]] == ["s1", "s2"]
+    assert elsewhere["scope"] == "global" and elsewhere["is_match"]
+    assert elsewhere["candidates"][0]["student_id"] == "s3"
+    assert elsewhere["candidates"][0]["index_number"] == "8551523"
+
+def stub_analysis(monkeypatch, face_locations, face_encodings):
+    async def analyze(image_data, max_faces=None, **kwargs):
+        return {"error": None, "face_locations": face_locations, "face_encodings": face_encodings,
+                "image_dimensions": (640, 480)}
+
+    monkeypatch.setattr(recognition, "_analyze_face_image", analyze)
+
+def test_multi_face_results_are_ordered_left_to_right(models, gallery, monkeypatch):
+    # Detected right face first; each result must keep its own box
+    stub_analysis(monkeypatch, [(50, 600, 150, 500), (60, 200, 160, 100)], [unit_vector(2), unit_vector(1)])
+    faces = asyncio.run(recognition.recognize_faces_in_image(b"frame"))
+
+    assert [face["face_location"] for face in faces] == [[60, 200, 160, 100], [50, 600, 150, 500]]
+    assert [face["candidates"][0]["student_id"] for face in faces] == ["s1", "s2"]
+    assert all(face["is_match"] for face in faces)
+
+def test_multi_face_frame_without_faces_is_empty(models, gallery, monkeypatch):
+    stub_analysis(monkeypatch, [], [])
+    assert asyncio.run(recognition.recognize_faces_in_image(b"frame")) == []
+
+def test_multi_face_frame_with_too_many_faces_is_rejected(models, gallery, monkeypatch):
+    limit = recognition.settings.FACE_MULTI_MAX_FACES
+    stub_analysis(monkeypatch, [(10, 20 * n + 10, 20, 20 * n) for n in range(limit + 1)], [])
+    with pytest.raises(recognition.HTTPException) as rejected:
+        asyncio.run(recognition.recognize_faces_in_image(b"frame"))
+    assert rejected.value.status_code == 400
+    assert f"At most {limit}" in rejected.value.detail
+
+def test_batch_results_follow_input_order_with_per_image_errors(models, gallery, monkeypatch):
+    async def analyze(image_data, **kwargs):
+        if image_data == b"broken":
+            raise ValueError("decoder crashed")
+        analyses = {
+            b"invalid": {"error": "Invalid image format", "face_locations": [], "face_encodings": []},
+            b"empty": {"error": None, "face_locations": [], "face_encodings": []},
+        }
+        if image_data in analyses:
+            return analyses[image_data]
+        return {"error": None, "face_locations": [(10, 90, 90, 10)],
+                "face_encodings": [unit_vector(int(image_data[1:]))]}
+
+    monkeypatch.setattr(recognition, "_analyze_face_image", analyze)
+    results = asyncio.run(recognition.recognize_faces_batch([b"s2", b"broken", b"invalid", b"s1", b"empty"]))
+
+    assert [result["error"] for result in results] == [
+        None, "Failed to process the image", "Invalid image format", None, "No face detected in the image"
+    ]
+    assert results[0]["candidates"][0]["student_id"] == "s2"
+    assert results[3]["candidates"][0]["student_id"] == "s1"
+    assert results[1]["candidates"] == [] and not results[1]["is_match"]
+
+def test_batch_rejection_cancels_the_other_jobs(models, gallery, monkeypatch):
+    cancelled = []
+
+    async def analyze(image_data, **kwargs):
+        if image_data == b"rejected":
+            await asyncio.sleep(0)
+            raise FaceQueueFull("room", 2)
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(image_data)
+            raise
+
+    monkeypatch.setattr(recognition, "_analyze_face_image", analyze)
+    with pytest.raises(FaceQueueFull):
+        asyncio.run(recognition.recognize_faces_batch([b"queued-1", b"rejected", b"queued-2"]))
+    assert sorted(cancelled) == [b"queued-1", b"queued-2"]
+
+def candidates_for(monkeypatch, probe, k):
+    async def extract_face_embedding(image_data, workload, room_code, deadline):
+        return probe
+
+    monkeypatch.setattr(recognition, "extract_face_embedding", extract_face_embedding)
+    return asyncio.run(recognition.recognize_face_candidates(b"image", k=k))
+
+def test_clear_match_has_a_wide_margin(models, gallery, monkeypatch):
+    result = candidates_for(monkeypatch, unit_vector(2) + 0.01, k=2)
+    assert result["is_match"] and not result["is_ambiguous"]
+    assert result["candidates"][0]["student_id"] == "s2"
+    assert result["margin"] == pytest.approx(result["candidates"][1]["distance"] - result["best_distance"])
+    assert result["margin"] > recognition.settings.FACE_RECOGNITION_MIN_MARGIN
+
+def test_near_tie_is_ambiguous(models, gallery, monkeypatch):
+    # A second student almost identical to s1: the match is within threshold but too close to call
+    twin = unit_vector(1) + 0.002
+    gallery.apply_rows([{"id": "s4", "index_number": "8551524", "face_embedding": twin.tolist()}])
+    result = candidates_for(monkeypatch, unit_vector(1) + 0.01, k=1)
+    assert result["is_match"] and result["is_ambiguous"]
+    assert len(result["candidates"]) == 1
+    assert result["margin"] < recognition.settings.FACE_RECOGNITION_MIN_MARGIN
+
+def test_gallery_smaller_than_k_returns_every_student(models, gallery, monkeypatch):
+    result = candidates_for(monkeypatch, unit_vector(3), k=10)
+    assert [candidate["student_id"] for candidate in result["candidates"]][0] == "s3"
+    assert len(result["candidates"]) == 3
+    distances = [candidate["distance"] for candidate in result["candidates"]]
+    assert distances == sorted(distances)
+
+def test_summary_without_candidates_is_no_match():
+    summary = recognition._summarize_candidates(np.empty(0, dtype=object), np.empty(0), 3)
+    assert summary == {"candidates": [], "best_distance": None, "margin": None, "is_match": False, "is_ambiguous": False}
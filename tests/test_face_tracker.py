@@ -0,0 +1,75 @@
+from services.face_pipeline import box_iou
+from services.face_tracker import FaceTracker
+
+def shifted(box, dx):
+    top, right, bottom, left = box
+    return (top, right + dx, bottom, left + dx)
+
+FACE = (100, 300, 300, 100)
+
+def test_box_iou():
+    """Identical boxes overlap fully and disjoint boxes not at all."""
+    assert box_iou(FACE, FACE) == 1.0
+    assert box_iou(FACE, shifted(FACE, 500)) == 0.0
+    assert 0.5 < box_iou(FACE, shifted(FACE, 40)) < 1.0
+
+def test_moving_face_keeps_its_track():
+    """Small movements between frames continue the same track."""
+    tracker = FaceTracker(iou_threshold=0.3, max_age=2.0)
+    first, _ = tracker.update([FACE], now=0.0)
+    second, _ = tracker.update([shifted(FACE, 30)], now=0.1)
+    third, _ = tracker.update([shifted(FACE, 60)], now=0.2)
+
+    assert first[0] is second[0] is third[0]
+    assert third[0].hits == 3
+    assert third[0].box == shifted(FACE, 60)
+
+def test_each_face_gets_its_own_track():
+    """Overlapping assignment is one-to-one and far-away faces start new tracks."""
+    tracker = FaceTracker()
+    tracks, _ = tracker.update([FACE, shifted(FACE, 600)], now=0.0)
+    assert tracks[0].track_id != tracks[1].track_id
+
+    swapped, _ = tracker.update([shifted(FACE, 610), shifted(FACE, 10)], now=0.1)
+    assert swapped[0] is tracks[1]
+    assert swapped[1] is tracks[0]
+    assert len(tracker) == 2
+
+def test_tracks_expire_and_identified_boxes():
+    """Unseen tracks expire after max_age; only identified tracks are skipped for encoding."""
+    tracker = FaceTracker(max_age=1.0)
+    (track,), _ = tracker.update([FACE], now=0.0)
+    assert tracker.identified_boxes() == []
+    track.identified = True
+    assert tracker.identified_boxes() == [FACE]
+
+    tracks, expired = tracker.update([], now=1.5)
+    assert tracks == []
+    assert expired == [track]
+    assert len(tracker) == 0
+
+    tracker.update([FACE], now=2.0)
+    assert len(tracker.flush()) == 1
+    assert len(tracker) == 0
+
+def test_identified_track_ends_when_the_face_leaves():
+    """A new student stepping into the same spot must not inherit the previous student's identified track."""
+    tracker = FaceTracker(max_age=2.0)
+    (first,), _ = tracker.update([FACE], now=0.0)
+    first.identified = True
+
+    tracks, ended = tracker.update([], now=0.5)
+    assert tracks == [] and ended == [first]
+    tracker.update([], now=1.0)
+
+    (second,), _ = tracker.update([shifted(FACE, 10)], now=1.5)
+    assert second is not first
+    assert not second.identified
+    assert tracker.identified_boxes() == []
+
+def test_unidentified_track_survives_missed_detections():
+    tracker = FaceTracker(max_age=2.0)
+    (first,), _ = tracker.update([FACE], now=0.0)
+    tracker.update([], now=0.5)
+    (again,), _ = tracker.update([FACE], now=1.0)
+    assert again is first
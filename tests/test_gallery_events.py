@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from services.gallery_events import WORKER_ID, ChangeFeed, FileChangeFeed, GalleryEvent
+
+def test_event_json_roundtrip():
+    event = GalleryEvent(op="upsert", student_id="s1", index_number="8551521", embedding="AAAA", updated_at="t1")
+    assert GalleryEvent.from_json(event.to_json()) == event
+    assert event.origin == WORKER_ID
+
+def test_file_feed_delivers_other_workers_events(tmp_path):
+    """Events from another worker arrive within a few polls; this worker's own events are skipped."""
+    path = str(tmp_path / "events.jsonl")
+    received = []
+
+    async def scenario():
+        listener = FileChangeFeed(received.append, path, poll_interval=0.005)
+        sender = FileChangeFeed(lambda event: None, path, poll_interval=0.005)
+        tasks = [asyncio.create_task(listener.run()), asyncio.create_task(sender.run())]
+        await asyncio.sleep(0.02)
+
+        sender.publish(GalleryEvent(op="upsert", student_id="s1", embedding="AAAA", origin="other-worker"))
+        sender.publish(GalleryEvent(op="delete", student_id="s2", origin="other-worker"))
+        sender.publish(GalleryEvent(op="delete", student_id="own"))
+        for _ in range(200):
+            if len(received) == 2:
+                break
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.02)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return listener.stats(), sender.stats()
+
+    listener_stats, sender_stats = asyncio.run(scenario())
+    assert [(event.op, event.student_id) for event in received] == [("upsert", "s1"), ("delete", "s2")]
+    assert received[0].embedding == "AAAA"
+    assert sender_stats["published"] == 3
+    assert listener_stats["received"] == 2
+    assert listener_stats["last_lag_ms"] is not None
+
+def test_file_feed_skips_malformed_lines(tmp_path):
+    path = tmp_path / "events.jsonl"
+    received = []
+
+    async def scenario():
+        listener = FileChangeFeed(received.append, str(path), poll_interval=0.005)
+        task = asyncio.create_task(listener.run())
+        await asyncio.sleep(0.02)
+        with open(path, "a") as file:
+            file.write("not json\n")
+            file.write(GalleryEvent(op="delete", student_id="s3", origin="other-worker").to_json() + "\n")
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return listener.stats()
+
+    stats = asyncio.run(scenario())
+    assert [event.student_id for event in received] == ["s3"]
+    assert stats["failed"] == 1
+
+def test_incomplete_backend_cannot_be_built():
+    class NoSend(ChangeFeed):
+        backend = "none"
+
+    with pytest.raises(TypeError):
+        NoSend(lambda event: None)
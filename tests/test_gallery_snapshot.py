@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from services.face_index import EMBEDDING_DIMENSION, FaceIndex
+from services.gallery_snapshot import SnapshotError, read_snapshot, snapshot_generation, write_snapshot
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(50, EMBEDDING_DIMENSION))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def test_snapshot_roundtrip_is_memory_mapped(tmp_path, vectors):
+    """The matrix comes back as a read-only view of the file, with ids, index numbers and watermark."""
+    path = str(tmp_path / "gallery.snap")
+    ids = [f"s{i}" for i in range(len(vectors))]
+    write_snapshot(path, ids, vectors, {"s0": "8551521"}, "2025-08-03T12:00:00+00:00")
+
+    snapshot = read_snapshot(path)
+    assert snapshot.ids == ids
+    assert snapshot.index_numbers == {"s0": "8551521"}
+    assert snapshot.watermark == "2025-08-03T12:00:00+00:00"
+    assert np.array_equal(snapshot.matrix, vectors)
+    assert not snapshot.matrix.flags.writeable
+    assert isinstance(snapshot.matrix.base, np.memmap)
+
+def test_rewrite_replaces_file_without_disturbing_mapped_readers(tmp_path, vectors):
+    """A rename swaps in the new snapshot while an existing mapping keeps the old rows."""
+    path = str(tmp_path / "gallery.snap")
+    write_snapshot(path, ["a", "b"], vectors[:2], {}, None)
+    before = snapshot_generation(path)
+    old = read_snapshot(path)
+
+    write_snapshot(path, ["c"], vectors[2:3], {}, "w2")
+    assert snapshot_generation(path) != before
+    assert np.array_equal(old.matrix, vectors[:2])
+    assert read_snapshot(path).ids == ["c"]
+
+def test_empty_snapshot(tmp_path):
+    path = str(tmp_path / "gallery.snap")
+    write_snapshot(path, [], np.empty((0, EMBEDDING_DIMENSION)), {}, None)
+    assert read_snapshot(path).matrix.shape == (0, EMBEDDING_DIMENSION)
+
+def test_corrupt_snapshots_are_rejected(tmp_path, vectors):
+    path = tmp_path / "gallery.snap"
+    write_snapshot(str(path), ["a", "b"], vectors[:2], {}, None)
+    data = path.read_bytes()
+
+    path.write_bytes(data[:-10])
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(path))
+    path.write_bytes(b"NOTASNAP" + data[8:])
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(path))
+    with pytest.raises(FileNotFoundError):
+        read_snapshot(str(tmp_path / "missing.snap"))
+
+@pytest.mark.parametrize("quantization", ["none", "int8"])
+def test_index_over_mapped_base_layers_deltas(tmp_path, vectors, quantization):
+    """Searches over a mapped base plus later changes match an index built from scratch."""
+    path = str(tmp_path / "gallery.snap")
+    ids = [f"s{i}" for i in range(len(vectors))]
+    write_snapshot(path, ids, vectors, {}, None)
+    snapshot = read_snapshot(path)
+
+    layered = FaceIndex.from_base(snapshot.ids, snapshot.matrix, quantization=quantization)
+    expected = FaceIndex.from_vectors(ids, vectors)
+    for index in (layered, expected):
+        index.add("s4", vectors[9] + 0.001)
+        index.add("new", vectors[20] + 0.002)
+        index.remove("s9")
+
+    assert len(layered) == len(expected) == 50
+    assert "s9" not in layered and "new" in layered
+    assert np.allclose(layered.get("s4"), vectors[9] + 0.001)
+    queries = vectors[[4, 9, 20, 33]]
+    for actual, wanted in zip(layered.query_batch(queries, k=3), expected.query_batch(queries, k=3)):
+        assert [student_id for student_id, _ in actual] == [student_id for student_id, _ in wanted]
+        assert np.allclose([d for _, d in actual], [d for _, d in wanted], atol=1e-3)
+    # The mapped rows were never written
+    assert np.array_equal(read_snapshot(path).matrix, vectors)
+
+def test_room_subset_spans_base_and_delta(vectors):
+    index = FaceIndex.from_base([f"s{i}" for i in range(10)], vectors[:10])
+    index.add("new", vectors[30])
+    snapshot = index.snapshot()
+    rows = [row for row in np.flatnonzero(snapshot.alive) if snapshot.ids[row] in ("s2", "new")]
+    room = snapshot.subset(rows)
+    student_ids, _ = room.search(vectors[[2, 30]], k=1)
+    assert list(student_ids[:, 0]) == ["s2", "new"]
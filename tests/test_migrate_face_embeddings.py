@@ -0,0 +1,77 @@
+import sys
+import types
+
+import numpy as np
+
+import migrate_face_embeddings
+from services.face_gallery import GALLERY_PAGE_SIZE
+
+class FakeStudents:
+    """Students table supporting the backfill's filtered, keyset-paginated selects and updates."""
+
+    def __init__(self, rows):
+        self.rows = {row["id"]: row for row in rows}
+
+    def table(self, name):
+        return FakeQuery(self)
+
+class FakeQuery:
+    def __init__(self, table):
+        self.table = table
+        self.filters = []
+        self.update_values = None
+        self.row_limit = None
+
+    def select(self, columns):
+        return self
+
+    def is_(self, column, value):
+        self.filters.append(lambda row: row.get(column) is None)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row[column] > value)
+        return self
+
+    def eq(self, column, value):
+        assert column == "id"
+        self.row_id = value
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def update(self, values):
+        self.update_values = values
+        return self
+
+    def execute(self):
+        if self.update_values is not None:
+            self.table.rows[self.row_id].update(self.update_values)
+            return types.SimpleNamespace(data=[self.table.rows[self.row_id]])
+        rows = sorted(
+            (row for row in self.table.rows.values() if all(check(row) for check in self.filters)),
+            key=lambda row: row["id"],
+        )
+        return types.SimpleNamespace(data=[dict(row) for row in rows[:self.row_limit]])
+
+def test_backfill_converts_every_row_across_pages(monkeypatch):
+    """Rows without a usable embedding stay in the filter; they must not push later rows off the page."""
+    rng = np.random.default_rng(0)
+    rows = []
+    for n in range(5 * GALLERY_PAGE_SIZE):
+        embedding = [] if n % 10 == 0 else rng.normal(size=128).tolist()
+        rows.append({"id": f"{n:06d}", "face_embedding": embedding, "face_embedding_b64": None})
+    students = FakeStudents(rows)
+    monkeypatch.setattr(migrate_face_embeddings, "supabase", students)
+    monkeypatch.setattr(sys, "argv", ["migrate_face_embeddings.py"])
+
+    migrate_face_embeddings.main()
+
+    pending = [row for row in students.rows.values() if row["face_embedding_b64"] is None]
+    assert len(pending) == GALLERY_PAGE_SIZE // 2
+    assert all(row["face_embedding"] == [] for row in pending)